@@ -0,0 +1,24 @@
+import os
+import sys
+
+
+def _app_dir():
+    """程序所在目录：打包后为可执行文件所在目录，开发时为源码目录
+
+    PyInstaller 单文件版的 __file__ 位于退出时即被删除的临时目录，Nuitka 单文件版同理，
+    所以打包后必须按可执行文件定位。
+    """
+    if getattr(sys, 'frozen', False):
+        return os.path.dirname(os.path.abspath(sys.executable))
+    if '__compiled__' in globals():
+        return os.path.dirname(os.path.abspath(sys.argv[0]))
+    return os.path.dirname(os.path.abspath(__file__))
+
+
+# 注册表、备份、撤销日志、事务日志、缓存和日志文件都放在这里，与启动时的工作目录无关
+APP_DIR = _app_dir()
+
+
+def app_path(*parts):
+    """程序数据目录下的路径"""
+    return os.path.join(APP_DIR, *parts)
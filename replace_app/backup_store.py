@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import hashlib
+
+from transaction import Transaction, DEFAULT_JOURNAL_DIR
+from app_paths import app_path
+
+DEFAULT_BACKUP_DIR = app_path(".backups")
+
+
+class BackupStore:
+    """按内容哈希去重的备份仓库
+
+    objects/ 下保存 zlib 压缩后的文件内容（以 sha256 命名，相同内容只存一份），
+    manifests/ 下每次操作一个清单，记录各文件在操作前的内容哈希，可一步恢复。
+    """
+    def __init__(self, root=DEFAULT_BACKUP_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.manifests_dir = os.path.join(root, 'manifests')
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put(self, data):
+        """保存一段内容，返回其哈希；已存在时不重复写入"""
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if not os.path.exists(object_path):
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            temp_path = f"{object_path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(zlib.compress(data))
+            os.replace(temp_path, object_path)
+        return digest
+
+    def get(self, digest):
+        """读取哈希对应的内容"""
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def snapshot(self, paths, description=''):
+        """备份 paths 当前的内容并写入一份操作清单，返回操作 ID"""
+        files = []
+        for path in paths:
+            path = os.path.abspath(path)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    data = f.read()
+                files.append({'path': path, 'hash': self.put(data), 'size': len(data)})
+            else:
+                # 操作前不存在的文件，恢复时删除
+                files.append({'path': path, 'hash': None, 'size': 0})
+
+        now = time.time()
+        # 操作 ID 以毫秒时间戳开头，按文件名排序即为时间顺序
+        op_id = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:6]}"
+        manifest = {
+            'id': op_id,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'description': description,
+            'files': files,
+        }
+        os.makedirs(self.manifests_dir, exist_ok=True)
+        temp_path = os.path.join(self.manifests_dir, op_id + '.json.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        os.replace(temp_path, os.path.join(self.manifests_dir, op_id + '.json'))
+        return op_id
+
+    def load_manifest(self, op_id):
+        """读取操作清单"""
+        with open(os.path.join(self.manifests_dir, op_id + '.json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def list_operations(self):
+        """按时间倒序列出所有操作清单"""
+        if not os.path.isdir(self.manifests_dir):
+            return []
+        manifests = []
+        for name in sorted(os.listdir(self.manifests_dir), reverse=True):
+            if name.endswith('.json'):
+                try:
+                    manifests.append(self.load_manifest(name[:-5]))
+                except (OSError, ValueError):
+                    continue
+        return manifests
+
+    def restore(self, op_id, journal_dir=DEFAULT_JOURNAL_DIR, undo_log=None):
+        """把清单中的文件恢复到该操作之前的内容，返回恢复的文件数
+
+        恢复本身也是一次事务（操作前不存在的文件在同一事务中删除），并会先备份
+        当前内容；给出 undo_log 时恢复记入撤销日志，可以直接撤销。
+        """
+        manifest = self.load_manifest(op_id)
+        files = manifest['files']
+        self.snapshot([item['path'] for item in files], f"恢复 {op_id} 前的自动备份")
+
+        txn = Transaction(journal_dir, keep_backup=False)
+        try:
+            for item in files:
+                if item['hash'] is not None:
+                    txn.stage(item['path'], self.get(item['hash']))
+                elif os.path.exists(item['path']):
+                    txn.stage_delete(item['path'])
+        except BaseException:
+            txn.abort()
+            raise
+        undo_files = None
+        if undo_log is not None:
+            try:
+                undo_files = undo_log.prepare(txn)
+            except OSError:
+                pass  # 撤销日志只是辅助手段，无法记录时照常恢复
+        txn.commit()
+        if undo_files is not None:
+            try:
+                undo_log.record(f"恢复备份: {manifest['description']}", undo_files)
+            except OSError:
+                pass
+        return len(files)
+
+    def prune(self, keep=50):
+        """只保留最近 keep 次操作，并删除不再被引用的内容，返回删除的对象数"""
+        manifests = self.list_operations()
+        for manifest in manifests[keep:]:
+            os.remove(os.path.join(self.manifests_dir, manifest['id'] + '.json'))
+
+        referenced = {item['hash'] for manifest in manifests[:keep] for item in manifest['files']}
+        removed = 0
+        if not os.path.isdir(self.objects_dir):
+            return removed
+        for prefix in os.listdir(self.objects_dir):
+            prefix_dir = os.path.join(self.objects_dir, prefix)
+            for name in os.listdir(prefix_dir):
+                if prefix + name not in referenced:
+                    os.remove(os.path.join(prefix_dir, name))
+                    removed += 1
+        return removed
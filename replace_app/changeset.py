@@ -0,0 +1,55 @@
+import os
+import json
+
+from file_sync import file_digest, content_digest
+
+FIELD_FILE = '<文件>'  # 整个文件的变更
+
+
+def value_size(value):
+    return len(json.dumps(value, ensure_ascii=False).encode('utf-8', errors='surrogatepass'))
+
+
+class Change:
+    """一项变更：文件中的某个字段（或整个文件）从旧哈希变为新哈希"""
+    __slots__ = ('path', 'field', 'old_hash', 'new_hash', 'size')
+
+    def __init__(self, path, field, old_hash, new_hash, size):
+        self.path = path
+        self.field = field
+        self.old_hash = old_hash  # 原来不存在时为 None
+        self.new_hash = new_hash
+        self.size = size  # 新内容的字节数
+
+    @property
+    def changed(self):
+        return self.old_hash != self.new_hash
+
+    def describe(self):
+        old_hash = self.old_hash[:8] if self.old_hash else '无'
+        return f"{os.path.basename(self.path)} {self.field}: {old_hash} -> {self.new_hash[:8]} ({self.size} 字节)"
+
+
+class DryRunTransaction:
+    """与 Transaction 接口相同的预览事务：不写入任何文件，只把变更记录到结果中"""
+    def __init__(self, result):
+        self.result = result
+        self.entries = []
+
+    def stage(self, target, data, hunks=None):
+        self._record(target, content_digest(data), len(data))
+
+    def stage_copy(self, target, source):
+        self._record(target, file_digest(source), os.path.getsize(source))
+
+    def _record(self, target, new_hash, size):
+        target = os.path.abspath(target)
+        old_hash = file_digest(target) if os.path.exists(target) else None
+        self.entries.append({'target': target})
+        self.result.changes.append(Change(target, FIELD_FILE, old_hash, new_hash, size))
+
+    def commit(self):
+        return []
+
+    def abort(self):
+        self.entries = []
@@ -0,0 +1,362 @@
+"""命令行批量执行配置操作（不加载 PyQt5）
+
+用法:
+    python cli.py jobs.jsonl [--registry accounts.db | --config accounts_config.json] [--dry-run] [--no-backup]
+    python cli.py - < jobs.jsonl
+    python cli.py jobs.jsonl --batch
+    python cli.py --undo | --redo
+
+jobs.jsonl 每行一个 JSON 任务，例如:
+    {"op": "replace_equipment", "account": "大号", "current": "清醒者的奥丁勋章+4", "replace": "清醒者的奥丁勋章+5"}
+    {"op": "rewrite_equipment", "account": "大号", "rules": "rules.json"}
+    {"op": "copy_suit", "account": "大号", "source": "角色1", "suit": "打怪", "targets": ["角色2", "角色3"]}
+    {"op": "copy_default", "account": "大号", "source": "角色1"}
+    {"op": "copy_options", "account": "大号", "source": "角色1", "options": ["item_use", "item_filter"], "config_name": ""}
+    {"op": "set_difficulty", "account": "大号", "lua_files": ["a11f6f8b73d79273.lua"], "difficulty": "困难", "explore": "开启"}
+    {"op": "sync_lua", "account": "大号", "source": "角色1", "lua_files": ["a11f6f8b73d79273.lua"]}
+    {"op": "sync_suit", "account": "大号", "source": "角色1", "sections": ["装备", "超越"], "suits": ["存仓"]}
+
+targets 可以是配置名称或路径，省略时为账号下除源配置外的全部配置。
+accounts 把任务扩展到多个账号（"*" 表示全部账号），多个账号共用的目录只处理一次，例如:
+    {"op": "copy_default", "account": "大号", "accounts": "*", "source": "角色1"}
+每个任务输出一行 JSON 结果；任一任务失败时退出码为 1。
+--batch 把全部任务排入一个队列按顺序执行：后面的任务看到前面任务的结果，每个文件只读取、
+备份、写入一次，整批只产生一条撤销记录；任一任务失败时整批放弃，所有文件保持不变。
+--undo / --redo 撤销最近一次操作或重做最近一次撤销（与界面共用撤销日志），输出一行 JSON。
+"""
+import sys
+import copy
+import json
+import argparse
+
+from engine import (BatchEngine, OPTION_FIELDS, STATUS_UPDATED, STATUS_FAILED, STATUS_INVALID,
+                    load_equipment_suits, unique_targets, results_by_account)
+from transaction import recover as recover_transactions
+from registry import Registry, DEFAULT_REGISTRY_FILE, LEGACY_CONFIG_FILE
+from file_sync import set_digest_store
+from equip_rules import load_rules, parse_rules
+from undo_log import UndoError
+from op_queue import OperationQueue
+
+
+class JobError(ValueError):
+    """任务描述无效"""
+
+
+def load_accounts(config_file):
+    """读取 accounts_config.json 格式的文件，返回 {账号: {路径: 名称}}"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {name: account.get("configurations", {}) for name, account in data.get("accounts", {}).items()}
+
+
+def registry_accounts(registry):
+    """从注册表读取账号，返回 {账号: {路径: 名称}}"""
+    return {name: account["configurations"] for name, account in registry.accounts().items()}
+
+
+def _resolve(folders, ref):
+    """按名称或路径查找配置，返回 (路径, 名称)"""
+    if ref in folders:
+        return ref, folders[ref]
+    for path, name in folders.items():
+        if name == ref:
+            return path, name
+    raise JobError(f"找不到配置: {ref}")
+
+
+class JobRunner:
+    """把 JSON 任务翻译为 BatchEngine 调用"""
+    def __init__(self, accounts, engine=None, backup=True, dry_run=False):
+        self.accounts = accounts
+        self.engine = engine or BatchEngine()
+        self.backup = backup
+        self.dry_run = dry_run
+
+    def scope(self, job):
+        """任务涉及的账号：account 加上 accounts（"*" 表示全部账号）"""
+        names = [job["account"]] if "account" in job else []
+        extra = job.get("accounts", [])
+        names.extend(self.accounts if extra == "*" else extra)
+        if not names:
+            raise JobError("缺少 account")
+        for account in names:
+            if account not in self.accounts:
+                raise JobError(f"找不到账号: {account}")
+        return list(dict.fromkeys(names))
+
+    def folders(self, job):
+        """任务涉及的全部配置 {路径: 名称}，按账号顺序合并"""
+        folders = {}
+        for account in self.scope(job):
+            for path, name in self.accounts[account].items():
+                folders.setdefault(path, name)
+        return folders
+
+    def source(self, job):
+        if "source" not in job:
+            raise JobError("缺少 source")
+        return _resolve(self.folders(job), job["source"])
+
+    def targets(self, job, exclude=None):
+        folders = self.folders(job)
+        if job.get("targets"):
+            targets = [_resolve(folders, ref) for ref in job["targets"]]
+        else:
+            targets = list(folders.items())
+        return unique_targets(targets, exclude)
+
+    @staticmethod
+    def require(job, *keys):
+        missing = [key for key in keys if key not in job]
+        if missing:
+            raise JobError(f"缺少 {', '.join(missing)}")
+
+    def call(self, job):
+        """把任务翻译为 call(engine, **kwargs)，在给定的引擎上执行（供 OperationQueue 使用）"""
+        op = job.get("op")
+        if not hasattr(self, f"op_{op}"):
+            raise JobError(f"未知操作: {op}")
+
+        def bound(engine, **kwargs):
+            runner = copy.copy(self)
+            runner.engine = engine
+            return getattr(runner, f"op_{op}")(job, backup=self.backup, **kwargs)
+        return bound
+
+    def run(self, job):
+        """执行一个任务，返回结果列表"""
+        return self.call(job)(self.engine, dry_run=self.dry_run)
+
+    def op_replace_equipment(self, job, **kwargs):
+        self.require(job, "current", "replace")
+        return self.engine.replace_equipment(self.targets(job), job["current"], job["replace"], **kwargs)
+
+    def op_rewrite_equipment(self, job, **kwargs):
+        """rules 为规则文件路径或规则数组（格式见 equip_rules.load_rules）"""
+        self.require(job, "rules")
+        rules = load_rules(job["rules"]) if isinstance(job["rules"], str) else parse_rules(job["rules"])
+        return self.engine.rewrite_equipment(self.targets(job), rules, **kwargs)
+
+    def op_copy_suit(self, job, **kwargs):
+        self.require(job, "suit")
+        source_path, _ = self.source(job)
+        for suit in load_equipment_suits(source_path, self.engine.cache):
+            if suit.get("name") == job["suit"]:
+                break
+        else:
+            raise JobError(f"源配置中没有装备配置: {job['suit']}")
+        return self.engine.copy_equipment_suit(self.targets(job, source_path), suit["name"], suit["data"], **kwargs)
+
+    def op_copy_default(self, job, **kwargs):
+        source_path, _ = self.source(job)
+        return self.engine.copy_default_save(source_path, self.targets(job, source_path), **kwargs)
+
+    def op_copy_options(self, job, **kwargs):
+        self.require(job, "options")
+        source_path, _ = self.source(job)
+        fields = []
+        for option in job["options"]:
+            if option not in OPTION_FIELDS:
+                raise JobError(f"未知选项: {option}")
+            fields.extend(OPTION_FIELDS[option])
+        return self.engine.copy_options(source_path, self.targets(job, source_path), fields,
+                                        job.get("config_name", ''), **kwargs)
+
+    def op_set_difficulty(self, job, **kwargs):
+        self.require(job, "lua_files", "difficulty")
+        return self.engine.set_lua_difficulty(self.targets(job), job["lua_files"], job["difficulty"],
+                                              job.get("explore", "关闭"), **kwargs)
+
+    def op_sync_lua(self, job, **kwargs):
+        self.require(job, "lua_files")
+        source_path, _ = self.source(job)
+        return self.engine.sync_lua_files(source_path, self.targets(job, source_path), job["lua_files"], **kwargs)
+
+    def op_sync_suit(self, job, **kwargs):
+        """sections 为 装备/超越/其他/觉醒 或对应的顶层键；suits 省略时装备部分整体同步"""
+        self.require(job, "sections")
+        source_path, _ = self.source(job)
+        return self.engine.sync_suit_sections(source_path, self.targets(job, source_path), job["sections"],
+                                              job.get("suits"), **kwargs)
+
+
+def result_record(result):
+    record = {
+        'name': result.name,
+        'path': result.path,
+        'status': result.status,
+        'count': result.count,
+        'messages': result.messages,
+    }
+    if result.error:
+        record['error'] = result.error
+    if result.backup_id:
+        record['backup_id'] = result.backup_id
+    if result.changes:
+        record['changes'] = [
+            {'file': c.path, 'field': c.field, 'old_hash': c.old_hash, 'new_hash': c.new_hash, 'bytes': c.size}
+            for c in result.changes if c.changed
+        ]
+    return record
+
+
+def iter_jobs(stream):
+    """逐行读取 JSON 任务，跳过空行和 # 注释行，返回 (行号, 任务或错误)"""
+    for line_no, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            yield line_no, JobError(f"第 {line_no} 行不是有效的 JSON: {str(e)}")
+            continue
+        if not isinstance(job, dict):
+            yield line_no, JobError(f"第 {line_no} 行不是 JSON 对象")
+            continue
+        yield line_no, job
+
+
+def fill_record(record, results):
+    """把结果统计写入输出记录，返回是否全部成功"""
+    record['updated'] = sum(1 for r in results if r.status == STATUS_UPDATED)
+    record['failed'] = sum(1 for r in results if r.status == STATUS_FAILED)
+    record['invalid'] = sum(1 for r in results if r.status == STATUS_INVALID)
+    record['results'] = [result_record(r) for r in results]
+    return all(r.ok for r in results)
+
+
+def record_job(registry, runner, job, results):
+    """把任务记入操作历史：涉及多个账号时每个账号各记一条（只统计该账号的配置）"""
+    accounts = {account: runner.accounts[account] for account in runner.scope(job)}
+    grouped = results_by_account(results, accounts, job.get("account")) or {job.get("account"): []}
+    description = json.dumps(job, ensure_ascii=False)
+    for account, account_results in grouped.items():
+        backup_id = next((r.backup_id for r in account_results if r.backup_id), None)
+        registry.record_operation(account, description,
+                                  sum(1 for r in account_results if r.status == STATUS_UPDATED),
+                                  sum(1 for r in account_results if r.status == STATUS_FAILED), backup_id)
+
+
+def run_batch(runner, stream, registry, dry_run):
+    """--batch：全部任务排入一个队列，一次执行、一次提交，返回是否全部成功"""
+    ok = True
+    queue = OperationQueue(runner.engine)
+    queued = []  # [(行号, 任务)]，与队列中的操作一一对应
+    for line_no, job in iter_jobs(stream):
+        record = {'line': line_no}
+        if isinstance(job, Exception):
+            record['error'] = str(job)
+        else:
+            record['op'] = job.get("op")
+            try:
+                queue.add(runner.call(job), json.dumps(job, ensure_ascii=False))
+                queued.append((line_no, job))
+                continue
+            except JobError as e:
+                record['error'] = str(e)
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+        ok = False
+    if not ok:
+        print(json.dumps({'batch': len(queued), 'error': "任务文件有误，未执行任何任务"}, ensure_ascii=False),
+              flush=True)
+        return False
+
+    try:
+        outcomes = queue.execute(backup=runner.backup, dry_run=dry_run)
+    except (JobError, OSError, ValueError) as e:
+        print(json.dumps({'batch': len(queued), 'error': str(e)}, ensure_ascii=False), flush=True)
+        return False
+
+    for index, (line_no, job) in enumerate(queued):
+        record = {'line': line_no, 'op': job.get("op")}
+        if index >= len(outcomes):
+            record['error'] = "前面的任务失败，未执行"
+            ok = False
+        else:
+            results = outcomes[index][1]
+            ok = fill_record(record, results) and ok
+            if registry is not None and not dry_run:
+                record_job(registry, runner, job, results)
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+    return ok
+
+
+def step_undo_log(engine, redo=False):
+    """执行一次撤销或重做，返回退出码"""
+    record = {'op': 'redo' if redo else 'undo'}
+    try:
+        operation = engine.redo() if redo else engine.undo()
+    except (UndoError, OSError) as e:
+        record['error'] = str(e)
+        print(json.dumps(record, ensure_ascii=False), flush=True)
+        return 1
+    record['description'] = operation['description']
+    record['files'] = [item['path'] for item in operation['files']]
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按 JSON-lines 任务文件批量修改配置")
+    parser.add_argument('jobs', nargs='?', help="任务文件路径，- 表示从标准输入读取")
+    parser.add_argument('--undo', action='store_true', help="撤销最近一次操作")
+    parser.add_argument('--redo', action='store_true', help="重做最近一次撤销的操作")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_FILE, help="账号注册表（默认为程序目录下的 accounts.db）")
+    parser.add_argument('--config', help="改为从 accounts_config.json 格式的文件读取账号（不记录操作历史）")
+    parser.add_argument('--dry-run', action='store_true', help="只输出变更集，不写入文件")
+    parser.add_argument('--no-backup', action='store_true', help="不存入备份仓库")
+    parser.add_argument('--batch', action='store_true', help="全部任务排入一个队列，每个文件只写入一次")
+    args = parser.parse_args(argv)
+    if args.undo or args.redo:
+        if args.jobs or (args.undo and args.redo):
+            parser.error("--undo、--redo 不能与任务文件或彼此同时使用")
+        recover_transactions()
+        return step_undo_log(BatchEngine(), redo=args.redo)
+    if not args.jobs:
+        parser.error("缺少任务文件")
+
+    recover_transactions()
+    if args.config:
+        registry = None
+        accounts = load_accounts(args.config)
+    else:
+        registry = Registry(args.registry, legacy_file=LEGACY_CONFIG_FILE)
+        accounts = registry_accounts(registry)
+        set_digest_store(registry)
+    runner = JobRunner(accounts, backup=not args.no_backup, dry_run=args.dry_run)
+    stream = sys.stdin if args.jobs == '-' else open(args.jobs, 'r', encoding='utf-8')
+
+    ok = True
+    try:
+        if args.batch:
+            return 0 if run_batch(runner, stream, registry, args.dry_run) else 1
+        for line_no, job in iter_jobs(stream):
+            record = {'line': line_no}
+            if isinstance(job, Exception):
+                record['error'] = str(job)
+                ok = False
+            else:
+                record['op'] = job.get("op")
+                try:
+                    results = runner.run(job)
+                except (JobError, OSError, ValueError) as e:
+                    record['error'] = str(e)
+                    ok = False
+                else:
+                    ok = fill_record(record, results) and ok
+                    if registry is not None and not args.dry_run:
+                        record_job(registry, runner, job, results)
+            print(json.dumps(record, ensure_ascii=False), flush=True)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        if registry is not None:
+            set_digest_store(None)  # 写入未保存的文件哈希，不再引用已关闭的注册表
+            registry.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import os
+import json
+import marshal
+import hashlib
+import threading
+from collections import OrderedDict
+
+from save_codec import parse_save, detect_encoding, decode_value, to_gb2312
+from json_span import member_spans
+
+# 内存缓存上限（按文件字节数计）
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DISK_CACHE_VERSION = 3
+
+
+def value_digest(value):
+    """JSON 值的结构哈希：与键顺序、缩进、编码无关（A1A4、A1AA 按 gb2312 的字符计算）"""
+    text = to_gb2312(json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(',', ':')))
+    return hashlib.blake2b(text.encode('utf-8', errors='surrogatepass'), digest_size=16).hexdigest()
+
+
+def file_key(file_path):
+    """文件的身份标识：(mtime_ns, 大小, inode)，任一变化即视为文件已修改"""
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class Document:
+    """一次解析得到的文档：原始字节 + 解析结果 + 检测到的编码
+
+    data 由多个调用方共享，修改前请先复制。
+    """
+    def __init__(self, path, key, raw, data, encoding):
+        self.path = path
+        self.key = key
+        self.raw = raw
+        self.data = data
+        self.encoding = encoding
+        self._section_hashes = {}  # {顶层键: 结构哈希}，按需计算
+        self._errors = {}  # {Schema: 错误列表}，每个结构描述只校验一次
+
+    @property
+    def size(self):
+        return len(self.raw)
+
+    def section_hash(self, key):
+        """顶层键对应内容的结构哈希，键不存在时返回 None；结果随文档缓存"""
+        if not isinstance(self.data, dict) or key not in self.data:
+            return None
+        digest = self._section_hashes.get(key)
+        if digest is None:
+            digest = value_digest(self.data[key])
+            self._section_hashes[key] = digest
+        return digest
+
+    def validate(self, schema):
+        """按结构描述校验解析结果，返回错误信息列表；结果随文档缓存"""
+        errors = self._errors.get(schema)
+        if errors is None:
+            errors = schema.errors(self.data)
+            self._errors[schema] = errors
+        return errors
+
+
+class PartialDocument(Document):
+    """只解析了部分顶层键的文档：data 中只有请求的键，spans 为它们在 raw 中的字节范围
+
+    编码按整个文件的字节检测（与完整解析的结果相同），定位和解码各键时都使用该编码。
+    """
+    def __init__(self, path, key, raw, data, encoding, spans):
+        super().__init__(path, key, raw, data, encoding)
+        self.spans = spans
+        self.absent = frozenset()  # 已确认不在文档中的键
+
+
+class DocumentCache:
+    """Config.save / Default.save 的共享解析缓存
+
+    以 (路径, mtime, 大小, inode) 判断是否可复用，内存中按文件总字节数做 LRU 淘汰；
+    可选的磁盘层用 marshal 保存解析结果，冷启动时免去重新解析。
+    """
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, parse=parse_save):
+        self.max_bytes = max_bytes
+        self.disk_dir = None
+        self.parse = parse
+        self._entries = OrderedDict()  # {绝对路径: Document}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if disk_dir:
+            self.enable_disk(disk_dir)
+
+    def enable_disk(self, disk_dir):
+        """启用磁盘缓存层"""
+        os.makedirs(disk_dir, exist_ok=True)
+        self.disk_dir = disk_dir
+
+    def load(self, file_path):
+        """返回文件对应的 Document，文件未变化时复用已解析的结果"""
+        path = os.path.abspath(file_path)
+        key = file_key(path)
+        with self._lock:
+            doc = self._entries.get(path)
+            if doc is not None and doc.key == key and not isinstance(doc, PartialDocument):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return doc
+
+        if doc is not None and doc.key == key:
+            raw = doc.raw  # 只解析过部分键，字节仍可复用
+        else:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            # 读取期间文件可能被改写，以读取后的状态为准
+            key = file_key(path)
+
+        cached = self._load_disk(path, key)
+        if cached is None:
+            data, encoding = self.parse(raw)
+            self._save_disk(path, key, data, encoding)
+            self.misses += 1
+        else:
+            data, encoding = cached
+            self.disk_hits += 1
+
+        doc = Document(path, key, raw, data, encoding)
+        self._put(doc)
+        return doc
+
+    def load_sections(self, file_path, keys):
+        """只读取顶层对象中 keys 对应的值，返回 PartialDocument（data 中可能还有之前请求过的键）
+
+        其余内容按括号匹配跳过，解码和解析的开销只与所选部分的大小有关；
+        缓存中已有完整解析结果时直接取用其中的值。部分解析的结果（含各键的
+        字节范围和结构哈希）同样按 (路径, 文件标识) 缓存，之后请求其他键时合并。
+        """
+        path = os.path.abspath(file_path)
+        key = file_key(path)
+        with self._lock:
+            doc = self._entries.get(path)
+            if doc is not None and doc.key != key:
+                doc = None
+            if doc is not None:
+                self._entries.move_to_end(path)
+
+        if doc is None:
+            with open(path, 'rb') as f:
+                raw = f.read()
+            key = file_key(path)
+        elif not isinstance(doc, PartialDocument):
+            self.hits += 1
+            spans = member_spans(doc.raw, keys, doc.encoding)
+            data = {name: doc.data[name] for name in spans if isinstance(doc.data, dict) and name in doc.data}
+            partial = PartialDocument(path, key, doc.raw, data, doc.encoding, spans)
+            partial._section_hashes = doc._section_hashes
+            return partial
+        elif all(name in doc.spans or name in doc.absent for name in keys):
+            self.hits += 1
+            return doc
+        else:
+            raw = doc.raw
+
+        known = doc.spans if doc is not None else {}
+        missing = [name for name in keys if name not in known and (doc is None or name not in doc.absent)]
+        # 编码只在第一次读取时检测一次，之后合并其他键时沿用
+        encoding = doc.encoding if doc is not None else detect_encoding(raw)
+        new_spans = member_spans(raw, missing, encoding)
+        spans = dict(known, **new_spans)
+        data = dict(doc.data) if doc is not None else {}
+        for name, (start, end) in new_spans.items():
+            data[name] = json.loads(decode_value(raw[start:end], encoding))
+        partial = PartialDocument(path, key, raw, data, encoding, spans)
+        partial.absent = (doc.absent if doc is not None else frozenset()) | frozenset(set(missing) - set(new_spans))
+        if doc is not None:
+            partial._section_hashes = dict(doc._section_hashes)
+        self.misses += 1
+        self._put(partial, replace_full=False)
+        return partial
+
+    def invalidate(self, file_path):
+        """移除指定文件的缓存"""
+        path = os.path.abspath(file_path)
+        with self._lock:
+            doc = self._entries.pop(path, None)
+            if doc is not None:
+                self._total_bytes -= doc.size
+
+    def clear(self):
+        """清空内存缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _put(self, doc, replace_full=True):
+        with self._lock:
+            old = self._entries.get(doc.path)
+            if not replace_full and old is not None and old.key == doc.key \
+                    and not isinstance(old, PartialDocument):
+                return  # 其他线程已缓存了完整解析结果
+            old = self._entries.pop(doc.path, None)
+            if old is not None:
+                self._total_bytes -= old.size
+            if doc.size > self.max_bytes:
+                return
+            self._entries[doc.path] = doc
+            self._total_bytes += doc.size
+            # 超出上限时淘汰最久未使用的文档
+            while self._total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._total_bytes -= evicted.size
+
+    def _disk_path(self, path):
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, name + '.bin')
+
+    def _load_disk(self, path, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(path), 'rb') as f:
+                version, cached_path, cached_key, data, encoding = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != DISK_CACHE_VERSION or cached_path != path or tuple(cached_key) != key:
+            return None
+        return data, encoding
+
+    def _save_disk(self, path, key, data, encoding):
+        if not self.disk_dir:
+            return
+        disk_path = self._disk_path(path)
+        temp_path = f"{disk_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                marshal.dump((DISK_CACHE_VERSION, path, key, data, encoding), f)
+            os.replace(temp_path, disk_path)
+        except (OSError, ValueError):
+            # 磁盘缓存只是加速手段，失败时忽略
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+# GUI、引擎共用的缓存实例
+shared_cache = DocumentCache()
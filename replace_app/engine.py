@@ -0,0 +1,719 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from doc_cache import shared_cache, value_digest
+from save_codec import encode_value
+from json_span import (array_elements, object_members, find_span, line_indent,
+                       detect_style, dumps_value, diff_patches, append_members, apply_patches)
+from transaction import Transaction, TransactionError, DEFAULT_JOURNAL_DIR
+from backup_store import BackupStore
+from undo_log import UndoLog, patch_hunks
+from equip_index import shared_index
+from equip_rules import Rule, RuleSet, RULE_EXACT
+from file_sync import same_content, flush_digests
+from changeset import Change, DryRunTransaction, value_size
+from lua_settings import LuaSettings, KEY_DIFFICULTY, KEY_EXPLORE
+from schema import CONFIG_SCHEMA, DEFAULT_SCHEMA, DIY_SUIT_SCHEMA
+from suit_sync import SectionSync, DIY_SUIT_FILE
+
+# 线程池默认并发数（文件读写为主，略高于CPU核数即可）
+DEFAULT_MAX_WORKERS = min(16, (os.cpu_count() or 4) + 4)
+
+STATUS_UPDATED = 'updated'
+STATUS_UNCHANGED = 'unchanged'
+STATUS_SKIPPED = 'skipped'
+STATUS_FAILED = 'failed'
+STATUS_CANCELLED = 'cancelled'
+STATUS_INVALID = 'invalid'  # 目标文件格式无效，已排除（不影响其他目标）
+
+# 功能4可复制的字段：(字段名, 显示名称)
+OPTION_FIELDS = {
+    'item_use': [("item_use_data", "吃药")],
+    'item_buff': [("item_buff_data", "buff药")],
+    'skill_buff': [("skill_buff_data", "buff技能")],
+    'filter_pick1': [("item_filter_pick_data_1", "额外模糊拾取")],
+    'filter_pick2': [("item_filter_pick_data_2", "额外模糊过滤")],
+    'filter_throw1': [("item_filter_throw_data_1", "额外模糊丢弃")],
+    'filter_throw2': [("item_filter_throw_data_2", "额外模糊保留")],
+    'diy_trigger': [("diytrigger", "DIY指令")],
+    'pet_build': [("pet_build", "智能联合宠物技能")],
+    'item_disassemble': [("item_filter_disassemble", "物品分解")],
+    'item_filter': [
+        ("item_filter_1", "物品设置1"),
+        ("item_filter_2", "物品设置2"),
+        ("item_filter_3", "物品设置3"),
+        ("item_filter_4", "物品设置4"),
+    ],
+    'store_items': [("store_items", "存取材料")],
+}
+
+
+class TargetResult:
+    """单个目标配置的执行结果"""
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.status = STATUS_UNCHANGED
+        self.count = 0  # 更新的条目数（装备数、字段数、文件数）
+        self.skip_count = 0  # 内容已相同而跳过的文件数
+        self.error_count = 0
+        self.messages = []
+        self.error = None
+        self.backup_id = None  # 操作前内容在备份仓库中的操作 ID
+        self.changes = []  # [Change]，预览时由任务和预览事务填写
+
+    def log(self, message):
+        """记录一条日志，由GUI或CLI统一输出"""
+        self.messages.append(message)
+
+    def change(self, path, field, old_value, new_value):
+        """记录字段级变更（old_value 为 None 表示原来不存在）"""
+        old_hash = None if old_value is None else value_digest(old_value)
+        self.changes.append(Change(os.path.abspath(path), field, old_hash,
+                                   value_digest(new_value), value_size(new_value)))
+
+    def fail(self, message):
+        """标记为失败"""
+        self.status = STATUS_FAILED
+        self.error = message
+        self.log(message)
+
+    def invalid(self, file_path, errors):
+        """标记为格式无效：该目标不写入、不备份，其他目标照常执行"""
+        self.status = STATUS_INVALID
+        self.error = f"错误: {self.name} 的 {os.path.basename(file_path)} 格式无效，已跳过"
+        self.log(self.error)
+        for error in errors:
+            self.log(f"  {error}")
+
+    @property
+    def ok(self):
+        return self.status not in (STATUS_FAILED, STATUS_CANCELLED, STATUS_INVALID)
+
+
+def _path_key(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def unique_targets(targets, exclude=None):
+    """合并目标配置：同一目录（多个账号共用时）只保留第一次出现的 (path, name)，并排除 exclude 目录"""
+    seen = set()
+    if exclude:
+        seen.add(_path_key(exclude))
+    unique = []
+    for path, name in targets:
+        key = _path_key(path)
+        if key in seen:
+            continue
+        seen.add(key)
+        unique.append((path, name))
+    return unique
+
+
+def results_by_account(results, accounts, default=None):
+    """按账号分组结果：accounts 为 {账号: 配置路径集合}，返回 {账号: [TargetResult]}（按 accounts 顺序）
+
+    多个账号共用的目录计入每个账号；不属于任何账号的结果计入 default。
+    """
+    owners = {}
+    for account, paths in accounts.items():
+        for path in paths:
+            owners.setdefault(_path_key(path), []).append(account)
+    grouped = {}
+    for result in results:
+        for account in owners.get(_path_key(result.path), [default]):
+            grouped.setdefault(account, []).append(result)
+    order = {account: position for position, account in enumerate(accounts)}
+    return dict(sorted(grouped.items(), key=lambda item: order.get(item[0], len(order))))
+
+
+def load_default_save(file_path, cache=shared_cache):
+    """读取 Default.save 文件（经由文档缓存），返回 Document
+
+    编码在解码时一次识别并随文档缓存，读取过程不会改写文件。
+    """
+    try:
+        return cache.load(file_path)
+    except json.JSONDecodeError:
+        raise ValueError(f"文件 {file_path} 不是有效的 JSON 格式")
+    except Exception as e:
+        raise ValueError(f"读取文件 {file_path} 时出错: {str(e)}")
+
+
+def load_default_sections(file_path, keys, cache=shared_cache):
+    """只读取 Default.save 中 keys 对应的顶层值，返回 PartialDocument（不存在的键不在 data 中）"""
+    try:
+        return cache.load_sections(file_path, keys)
+    except json.JSONDecodeError:
+        raise ValueError(f"文件 {file_path} 不是有效的 JSON 格式")
+    except Exception as e:
+        raise ValueError(f"读取文件 {file_path} 时出错: {str(e)}")
+
+
+def read_default_save(file_path, cache=shared_cache, keys=None):
+    """读取 Default.save 文件，返回 (数据, 编码)；给出 keys 时只解析这些顶层键"""
+    if keys is not None:
+        doc = load_default_sections(file_path, keys, cache)
+    else:
+        doc = load_default_save(file_path, cache)
+    return doc.data, doc.encoding
+
+
+def read_config_raw(file_path, cache=shared_cache):
+    """读取 Config.save（经由文档缓存），返回 (原始字节, 数据, 编码)，供按字节范围打补丁使用"""
+    doc = cache.load(file_path)
+    return doc.raw, doc.data, doc.encoding
+
+
+def load_valid_document(result, file_path, schema, cache=shared_cache, keys=None):
+    """读取目标文件并按结构描述校验
+
+    无法解析或格式不符时把 result 标记为无效并返回 None，否则返回 Document。
+    给出 keys 时只读取并校验这些顶层键（返回 PartialDocument）。
+    """
+    try:
+        doc = cache.load(file_path) if keys is None else cache.load_sections(file_path, keys)
+    except ValueError as e:
+        result.invalid(file_path, [f"无法解析: {str(e)}"])
+        return None
+    errors = doc.validate(schema)
+    if errors:
+        result.invalid(file_path, errors)
+        return None
+    return doc
+
+
+def load_valid_source(file_path, schema, cache=shared_cache, keys=None):
+    """读取并校验源文件，格式无效时抛出 ValueError；给出 keys 时只读取并校验这些顶层键"""
+    if keys is not None:
+        doc = load_default_sections(file_path, keys, cache)
+    else:
+        doc = load_default_save(file_path, cache)
+    errors = doc.validate(schema)
+    if errors:
+        raise ValueError(f"源文件 {file_path} 格式无效: {'; '.join(errors)}")
+    return doc
+
+
+def load_equipment_suits(config_path, cache=shared_cache):
+    """读取配置目录下 Config.save 中的全部装备配置，返回 diysuit_item 列表"""
+    config_file = os.path.join(config_path, "Config.save")
+    if not os.path.exists(config_file):
+        raise FileNotFoundError(f"{config_file} 不存在")
+    return cache.load(config_file).data.get("diysuit_item", [])
+
+
+class BatchEngine:
+    """批量操作引擎：把目标配置分发到有界线程池中并返回每个目标的结果"""
+    def __init__(self, max_workers=None, cache=None, journal_dir=DEFAULT_JOURNAL_DIR, backup_store=None, index=None,
+                 undo_log=None):
+        self.max_workers = max_workers or DEFAULT_MAX_WORKERS
+        self.cache = cache or shared_cache
+        self.journal_dir = journal_dir
+        self.backups = backup_store or BackupStore()
+        self.index = index or shared_index
+        self.undo_log = undo_log or UndoLog(journal_dir=journal_dir)
+
+    def run(self, task, targets, progress=None, backup=True, description='', dry_run=False, cancel=None):
+        """对每个 (path, name) 目标执行 task(result, txn)
+
+        task 只把新内容暂存到事务 txn 中；全部目标成功后统一提交，
+        任一目标失败则所有目标都不做修改。格式无效的目标（STATUS_INVALID）
+        在暂存之前就被排除，不会被备份或写入，也不影响其他目标。backup 为真时提交前把所有
+        将被改写的文件存入备份仓库（同一次操作一份清单）。提交成功后把各文件的
+        逆补丁记入撤销日志，可用 undo / redo 撤销和重做。
+        dry_run 为真时每个目标使用预览事务，只在 result.changes 中记录变更，
+        不写入、不备份任何文件。cancel 为 threading.Event，置位后尚未开始的
+        目标不再执行，整个操作放弃提交。
+        progress(result, done, total) 在调用线程中按完成顺序回调，
+        返回的结果列表与去重后的 targets 顺序一致（同一目录只处理一次）。
+        """
+        results = [TargetResult(path, name) for path, name in unique_targets(targets)]
+        if not results:
+            return results
+
+        if dry_run:
+            self.run_tasks(task, results, DryRunTransaction, progress, cancel)
+            return results
+        txn = Transaction(self.journal_dir, keep_backup=False)
+        self.run_tasks(task, results, lambda result: txn, progress, cancel)
+        return self.commit(results, txn, backup, description, cancel)
+
+    def run_tasks(self, task, results, txn_for, progress=None, cancel=None):
+        """在线程池中对每个结果执行 task(result, txn_for(result))，progress 按完成顺序回调"""
+        workers = min(self.max_workers, len(results))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(self._run_one, task, result, txn_for(result), cancel): result
+                       for result in results}
+            for done, future in enumerate(as_completed(futures), 1):
+                result = futures[future]
+                if progress:
+                    progress(result, done, len(results))
+        flush_digests()  # 本批新计算的文件哈希一次写入注册表
+
+    def commit(self, results, txn, backup=True, description='', cancel=None):
+        """根据各目标的结果提交或放弃事务 txn（规则见 run），返回 results"""
+        if cancel is not None and cancel.is_set():
+            # 取消时已暂存的内容全部放弃，保持所有目标不变
+            txn.abort()
+            for result in results:
+                result.count = 0
+                if result.status not in (STATUS_FAILED, STATUS_INVALID):
+                    result.status = STATUS_CANCELLED
+                    result.log(f"已取消: {result.name} 未做修改")
+            return results
+
+        failed = [r for r in results if r.status == STATUS_FAILED]
+        if failed:
+            txn.abort()
+            names = ", ".join(r.name for r in failed)
+            for result in results:
+                result.count = 0  # 暂存的修改已全部放弃
+                if result.status == STATUS_UPDATED:
+                    result.fail(f"已回滚: {names} 处理失败，{result.name} 未做修改")
+            return results
+
+        if backup and txn.entries:
+            try:
+                backup_id = self.backups.snapshot([entry['target'] for entry in txn.entries], description)
+            except OSError as e:
+                txn.abort()
+                for result in results:
+                    result.count = 0
+                    if result.status == STATUS_UPDATED:
+                        result.fail(f"错误: 备份失败，{result.name} 未做修改: {str(e)}")
+                return results
+            for result in results:
+                if result.status == STATUS_UPDATED:
+                    result.backup_id = backup_id
+
+        try:
+            undo_files = self.undo_log.prepare(txn)
+        except OSError:
+            undo_files = None  # 撤销日志只是辅助手段，无法记录时照常提交
+        try:
+            txn.commit()
+        except TransactionError as e:
+            for result in results:
+                result.count = 0
+                if result.status == STATUS_UPDATED:
+                    result.fail(f"错误: {result.name} {str(e)}")
+            return results
+
+        undo_id = None
+        if undo_files is not None:
+            try:
+                undo_id = self.undo_log.record(description, undo_files)
+            except OSError:
+                pass
+        if undo_id is None:
+            for result in results:
+                if result.status == STATUS_UPDATED:
+                    result.log(f"警告: {result.name} 的修改未记入撤销日志，只能通过恢复备份撤回")
+        return results
+
+    def undo(self):
+        """撤销最近一次操作（按逆补丁原地改写），返回该操作的记录"""
+        op = self.undo_log.undo()
+        for item in op['files']:
+            self.cache.invalidate(item['path'])
+        return op
+
+    def redo(self):
+        """重做最近一次撤销的操作，返回该操作的记录"""
+        op = self.undo_log.redo()
+        for item in op['files']:
+            self.cache.invalidate(item['path'])
+        return op
+
+    def restore(self, op_id):
+        """把备份仓库中操作 op_id 修改过的文件恢复到该操作之前，返回恢复的文件数（可撤销）"""
+        count = self.backups.restore(op_id, self.journal_dir, self.undo_log)
+        for item in self.backups.load_manifest(op_id)['files']:
+            self.cache.invalidate(item['path'])
+        return count
+
+    # 任务读取文件内容的入口（批量模式下会先看到队列中前面的操作暂存的内容）
+
+    def _read_bytes(self, file_path):
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def _same_content(self, source, target):
+        return same_content(source, target)
+
+    def _indexed(self, config_file):
+        """装备索引中是否有该文件的最新记录"""
+        return self.index.contains(config_file)
+
+    @staticmethod
+    def _run_one(task, result, txn, cancel=None):
+        if cancel is not None and cancel.is_set():
+            result.status = STATUS_CANCELLED
+            return result
+        try:
+            task(result, txn)
+        except Exception as e:
+            result.fail(f"错误: {result.name} 处理失败: {str(e)}")
+        return result
+
+    def count_equipment(self, targets, equip_name):
+        """统计目标配置中装备出现的位置，返回 (配置数, 槽位数)，只重新解析有变化的文件"""
+        return self.index.count(equip_name, [path for path, _ in targets])
+
+    def count_rewrites(self, targets, rules):
+        """统计规则集会改写的装备位置，返回 (配置数, 槽位数)"""
+        matches = self.index.match(lambda name: rules.rewrite(name) is not None, [path for path, _ in targets])
+        return len({folder for folder, _, _ in matches}), len(matches)
+
+    def replace_equipment(self, targets, current_equip, replace_equip, backup=True, progress=None, dry_run=False, cancel=None):
+        """功能1: 替换目标配置中的指定装备（只有一条精确规则的 rewrite_equipment）"""
+        rules = RuleSet([Rule(RULE_EXACT, current_equip, replace_equip)])
+        return self.rewrite_equipment(targets, rules, backup, progress, dry_run, cancel,
+                                      description=f"替换装备 {current_equip} -> {replace_equip}")
+
+    def rewrite_equipment(self, targets, rules, backup=True, progress=None, dry_run=False, cancel=None, description=''):
+        """按规则集改写目标配置中的装备名称
+
+        每个配置只读取、改写一次，一遍遍历同时应用所有规则；先用装备索引
+        筛出含有会被改写的装备的配置，其余配置不读取。
+        """
+        targets = unique_targets(targets)
+
+        def task(result, txn):
+            config_file = os.path.join(result.path, "Config.save")
+            if not os.path.exists(config_file):
+                result.status = STATUS_SKIPPED
+                result.log(f"跳过: {result.name} 没有Config.save文件")
+                return
+
+            doc = load_valid_document(result, config_file, CONFIG_SCHEMA, self.cache)
+            if doc is None:
+                return
+            raw, config_data, encoding = doc.raw, doc.data, doc.encoding
+            # 只改写匹配装备所在槽位的字符串，其余字节保持不变
+            patches = []
+            encoded = {}  # {新名称: 编码后的 JSON 字符串}
+            suit_spans = None
+            for index, item in enumerate(config_data.get("diysuit_item", [])):
+                if "data" in item and isinstance(item["data"], dict):
+                    slots = []
+                    for equip_id, equip_name in item["data"].items():
+                        new_value = rules.rewrite(equip_name)
+                        if new_value is not None:
+                            slots.append((equip_id, new_value))
+                        elif rules.error(equip_name):
+                            result.log(f"警告: {result.name} 的 {item.get('name', '')}/{equip_id} 未改写，"
+                                       f"{rules.error(equip_name)}")
+                    if not slots:
+                        continue
+                    if suit_spans is None:
+                        suit_spans = array_elements(raw, find_span(raw, ["diysuit_item"], encoding=encoding)[0])
+                    data_start = find_span(raw, ["data"], start=suit_spans[index][0], encoding=encoding)[0]
+                    slot_spans = object_members(raw, data_start, encoding)
+                    for equip_id, new_value in slots:
+                        start, end = slot_spans[equip_id]
+                        new_bytes = encoded.get(new_value)
+                        if new_bytes is None:
+                            new_bytes = encoded[new_value] = encode_value(json.dumps(new_value, ensure_ascii=False), encoding)
+                        patches.append((start, end, new_bytes))
+                        result.change(config_file, f"{item.get('name', '')}/{equip_id}", item["data"][equip_id], new_value)
+                        result.count += 1
+
+            if result.count:
+                txn.stage(config_file, apply_patches(raw, patches), patch_hunks(raw, patches))
+                if backup:
+                    result.log(f"已备份文件: {config_file}")
+                result.status = STATUS_UPDATED
+                result.log(f"成功: 已在 {result.name} 中替换了 {result.count} 处装备")
+
+        # 规则无法应用的装备所在的配置也要处理，以便在结果中报告原因
+        matches = self.index.match(lambda name: rules.rewrite(name) is not None or rules.error(name) is not None,
+                                   [path for path, _ in targets])
+        owners = {folder for folder, _, _ in matches}
+        # 已索引且不含待改写装备的目标直接跳过；缺少或无法解析 Config.save 的目标仍交给 task 报告
+        matched = [(path, name) for path, name in targets
+                   if os.path.abspath(path) in owners
+                   or not self._indexed(os.path.join(path, "Config.save"))]
+        results = iter(self.run(task, matched, progress, backup, description or f"改写装备: {rules.describe()}",
+                                dry_run, cancel))
+        matched = set(matched)
+        return [next(results) if target in matched else TargetResult(*target) for target in targets]
+
+    def copy_equipment_suit(self, targets, suit_name, suit_data, backup=True, progress=None, dry_run=False, cancel=None):
+        """功能2: 将装备配置 suit_name 的 data 复制到目标配置（不存在则新增）
+
+        已有同名装备配置时只改写 data 中不同的槽位，其余字节保持原样。
+        """
+        def task(result, txn):
+            target_file = os.path.join(result.path, "Config.save")
+            if not os.path.exists(target_file):
+                result.status = STATUS_SKIPPED
+                return
+
+            doc = load_valid_document(result, target_file, CONFIG_SCHEMA, self.cache)
+            if doc is None:
+                return
+            raw, target_data, encoding = doc.raw, doc.data, doc.encoding
+
+            if "diysuit_item" not in target_data:
+                result.status = STATUS_SKIPPED
+                result.log(f"配置 {result.name} 中没有diysuit_item数据")
+                return
+
+            style = detect_style(raw)
+            suits_start, suits_end = find_span(raw, ["diysuit_item"], encoding=encoding)
+            suit_spans = array_elements(raw, suits_start)
+            for index, item in enumerate(target_data["diysuit_item"]):
+                if item.get("name") == suit_name:
+                    # 只替换该装备配置的 data 节点
+                    start, end = find_span(raw, ["data"], start=suit_spans[index][0], encoding=encoding)
+                    patches = diff_patches(raw, start, end, item.get("data"), suit_data, style, encoding)
+                    if not patches:
+                        result.status = STATUS_SKIPPED
+                        result.skip_count = 1
+                        result.log(f"跳过: {result.name} 的装备配置 {suit_name} 与源配置相同")
+                        return
+                    result.change(target_file, f"diysuit_item/{suit_name}", item.get("data"), suit_data)
+                    result.log(f"成功更新配置: {result.name}")
+                    break
+            else:
+                new_suit = {"name": suit_name, "data": suit_data}
+                if suit_spans:
+                    # 追加到最后一个装备配置之后
+                    last_end = suit_spans[-1][1]
+                    indent = line_indent(raw, suit_spans[-1][0])
+                    data = b',' + (style.newline + indent).encode('ascii') + dumps_value(new_suit, style, indent, encoding)
+                    patches = [(last_end, last_end, data)]
+                else:
+                    new_suits = dumps_value([new_suit], style, line_indent(raw, suits_start), encoding)
+                    patches = [(suits_start, suits_end, new_suits)]
+                result.change(target_file, f"diysuit_item/{suit_name}", None, suit_data)
+                result.log(f"成功新增配置: {result.name}")
+
+            txn.stage(target_file, apply_patches(raw, patches), patch_hunks(raw, patches))
+            if backup:
+                result.log(f"已备份文件: {target_file}")
+            result.status = STATUS_UPDATED
+            result.count = 1
+
+        return self.run(task, targets, progress, backup, f"复制装备配置 {suit_name}", dry_run, cancel)
+
+    def sync_suit_sections(self, source_path, targets, sections, suit_names=None, backup=True, progress=None,
+                           dry_run=False, cancel=None):
+        """将源配置 diy.suit 中的指定部分（装备/超越/其他/觉醒）同步到目标配置
+
+        源文件只解析一次，各目标并行按字节范围改写，未涉及的内容保持原样。
+        sections、suit_names 的含义见 suit_sync.SectionSync。
+        """
+        source_file = os.path.join(source_path, DIY_SUIT_FILE)
+        if not os.path.exists(source_file):
+            raise FileNotFoundError(f"{source_path} 中没有{DIY_SUIT_FILE}文件")
+        plan = SectionSync(load_valid_source(source_file, DIY_SUIT_SCHEMA, self.cache), sections, suit_names)
+
+        def task(result, txn):
+            target_file = os.path.join(result.path, DIY_SUIT_FILE)
+            if not os.path.exists(target_file):
+                result.status = STATUS_SKIPPED
+                result.log(f"跳过: {result.name} 没有{DIY_SUIT_FILE}文件")
+                return
+
+            doc = load_valid_document(result, target_file, DIY_SUIT_SCHEMA, self.cache)
+            if doc is None:
+                return
+            patches = plan.patches(doc, result)
+            if not patches:
+                result.log(f"跳过: {result.name} 的 {plan.describe()} 与源配置相同")
+                return
+
+            txn.stage(target_file, apply_patches(doc.raw, patches), patch_hunks(doc.raw, patches))
+            if backup:
+                result.log(f"已备份文件: {target_file}")
+            result.status = STATUS_UPDATED
+            result.count = len(result.changes)  # 同步的部分数
+            result.log(f"成功: 已同步 {plan.describe()} 到 {result.name}")
+
+        return self.run(task, unique_targets(targets, source_path), progress, backup,
+                        f"从 {source_path} 同步{DIY_SUIT_FILE}: {plan.describe()}", dry_run, cancel)
+
+    def copy_default_save(self, source_path, targets, backup=True, progress=None, dry_run=False, cancel=None):
+        """功能3: 复制源配置的 Default.save 到目标配置，内容已相同的目标不复制"""
+        source_file = os.path.join(source_path, "Default.save")
+        if not os.path.exists(source_file):
+            raise FileNotFoundError(f"{source_path} 中没有Default.save文件")
+        load_valid_source(source_file, DEFAULT_SCHEMA, self.cache)
+
+        def task(result, txn):
+            target_file = os.path.join(result.path, "Default.save")
+            if self._same_content(source_file, target_file):
+                result.status = STATUS_SKIPPED
+                result.skip_count = 1
+                result.log(f"跳过: {result.name} 的Default.save与源配置相同")
+                return
+            if os.path.exists(target_file) and backup:
+                result.log(f"已备份文件: {target_file}")
+
+            txn.stage_copy(target_file, source_file)
+            result.status = STATUS_UPDATED
+            result.count = 1
+            result.log(f"成功: 已将配置复制到 {result.name}")
+
+        return self.run(task, targets, progress, backup, f"从 {source_path} 复制Default.save", dry_run, cancel)
+
+    def copy_options(self, source_path, targets, fields, config_name='', backup=True, progress=None, dry_run=False, cancel=None):
+        """功能4: 将源配置 Default.save 中的选定字段复制到目标配置
+
+        fields 为 [(字段名, 显示名称)]；config_name 非空时写入 [配置名称].json
+        并同步覆盖目标的 Default.save。按顶层字段的结构哈希比较，与源配置
+        相同的字段不计入更新，所有字段都相同的目标不写入、不备份。
+        源文件和目标文件都只解析选定的顶层字段，目标按字节范围替换这些字段，
+        其余内容原样保留。
+        """
+        source_file = os.path.join(source_path, "Default.save")
+        if not os.path.exists(source_file):
+            raise FileNotFoundError(f"{source_path} 中没有Default.save文件")
+        keys = [field for field, _ in fields]
+        source_doc = load_valid_source(source_file, DEFAULT_SCHEMA, self.cache, keys)
+        source_data = source_doc.data
+        file_name = f"{config_name}.json" if config_name else "Default.save"
+
+        def task(result, txn):
+            target_file = os.path.join(result.path, file_name)
+            default_target_file = os.path.join(result.path, "Default.save")
+            if not os.path.exists(target_file):
+                result.status = STATUS_SKIPPED
+                result.log(f"跳过: {result.name} 没有 {file_name} 文件")
+                return
+
+            target_doc = load_valid_document(result, target_file, DEFAULT_SCHEMA, self.cache, keys)
+            if target_doc is None:
+                return
+            raw, encoding = target_doc.raw, target_doc.encoding
+            style = detect_style(raw)
+            patches = []
+            missing = {}  # 目标中没有的字段，统一追加到末尾
+
+            for field, field_name in fields:
+                if field in source_data:
+                    if target_doc.section_hash(field) == source_doc.section_hash(field):
+                        result.skip_count += 1
+                        continue
+                    result.change(target_file, field, target_doc.data.get(field), source_data[field])
+                    if field in target_doc.spans:
+                        start, end = target_doc.spans[field]
+                        patches.extend(diff_patches(raw, start, end, target_doc.data[field], source_data[field],
+                                                    style, encoding))
+                    else:
+                        missing[field] = source_data[field]
+                    result.count += 1
+                    result.log(f"已更新: {result.name} 的 {field_name} 配置")
+
+            if not result.count:
+                if result.skip_count:
+                    result.log(f"跳过: {result.name} 的选定选项与源配置相同")
+                return
+
+            if missing:
+                patches.append(append_members(raw, missing, style, encoding))
+            data = apply_patches(raw, patches)
+            txn.stage(target_file, data, patch_hunks(raw, patches))
+            if backup:
+                result.log(f"已备份文件: {target_file}")
+            if config_name:
+                txn.stage(default_target_file, data)
+                if backup and os.path.exists(default_target_file):
+                    result.log(f"已备份文件: {default_target_file}")
+            result.status = STATUS_UPDATED
+
+        names = ", ".join(field_name for _, field_name in fields)
+        return self.run(task, targets, progress, backup, f"从 {source_path} 复制选项: {names}", dry_run, cancel)
+
+    def set_lua_settings(self, targets, lua_files, values, insert_after=None, missing_ok=True,
+                         backup=True, progress=None, description='', dry_run=False, cancel=None):
+        """功能5: 在多个目标配置的多个 Lua 文件中一次写入多个设置
+
+        每个文件只解析、改写一次，未改动的内容保持原样；值已相同的文件不写入。
+        missing_ok 为真时目标中不存在的 Lua 文件直接跳过，否则视为失败。
+        """
+        def task(result, txn):
+            for lua_file in lua_files:
+                lua_file_path = os.path.join(result.path, lua_file)
+                if not os.path.exists(lua_file_path):
+                    if not missing_ok:
+                        result.fail(f"Lua文件 {lua_file} 不存在!")
+                        return
+                    result.log(f"跳过: {result.name} 中没有 {lua_file}")
+                    continue
+
+                settings = LuaSettings.from_bytes(self._read_bytes(lua_file_path))
+                new_text, changed, missing = settings.update(values, insert_after)
+                if missing:
+                    result.log(f"警告: {result.name} 的 {lua_file} 中未找到: {', '.join(missing)}")
+                if not changed:
+                    continue
+
+                for key in changed:
+                    result.change(lua_file_path, key, settings.get(key), values[key])
+                txn.stage(lua_file_path, settings.encode(new_text))
+                if backup:
+                    result.log(f"已备份Lua文件: {lua_file}")
+                result.count += 1
+                result.log(f"成功: 已更新 {result.name} 中 {lua_file} 的 {', '.join(changed)}")
+
+            if result.count:
+                result.status = STATUS_UPDATED
+
+        return self.run(task, targets, progress, backup, description, dry_run, cancel)
+
+    def set_lua_difficulty(self, targets, lua_files, difficulty, explore, backup=True, progress=None, dry_run=False, cancel=None):
+        """功能5: 修改 Lua 文件中的副本难度和探索设置（缺少探索设置时插入到难度之后）"""
+        explore_value = "开启" if explore == "开启" else "关闭"
+        values = {KEY_DIFFICULTY: difficulty, KEY_EXPLORE: explore_value}
+        description = f"{len(lua_files)} 个Lua文件难度改为 {difficulty}，探索{explore_value}"
+        return self.set_lua_settings(
+            targets, lua_files, values, {KEY_EXPLORE: KEY_DIFFICULTY},
+            missing_ok=len(unique_targets(targets)) * len(lua_files) > 1,
+            backup=backup, progress=progress, description=description, dry_run=dry_run, cancel=cancel,
+        )
+
+    def sync_lua_files(self, source_path, targets, lua_files, backup=True, progress=None, dry_run=False, cancel=None):
+        """功能6: 将源配置中的 Lua 文件同步到目标配置
+
+        先比较大小和内容哈希，只复制内容不同的文件。源文件不存在或无法读取时
+        只跳过该文件并计入 error_count，不影响该目标的其他文件和其他目标。
+        """
+        def task(result, txn):
+            result.log(f"正在同步到配置: {result.name}")
+            for lua_file in lua_files:
+                try:
+                    source_file_path = os.path.join(source_path, lua_file)
+                    target_file_path = os.path.join(result.path, lua_file)
+
+                    if not os.path.exists(source_file_path):
+                        result.log(f"错误: 源文件 {lua_file} 不存在")
+                        result.error_count += 1
+                        continue
+
+                    if self._same_content(source_file_path, target_file_path):
+                        result.skip_count += 1
+                        continue
+
+                    if backup and os.path.exists(target_file_path):
+                        result.log(f"已备份目标文件: {lua_file}")
+
+                    txn.stage_copy(target_file_path, source_file_path)
+                    result.log(f"成功: 已同步 {lua_file} 到 {result.name}")
+                    result.count += 1
+                except Exception as e:
+                    result.log(f"错误: 同步 {lua_file} 到 {result.name} 失败: {str(e)}")
+                    result.error_count += 1
+
+            if result.error_count == 0:
+                result.log(f"完成: 已成功同步 {result.count} 个Lua文件到配置 {result.name}，{result.skip_count} 个已相同")
+            else:
+                result.log(f"完成: 同步到 {result.name}: {result.count} 个成功, "
+                           f"{result.skip_count} 个已相同, {result.error_count} 个失败")
+            if result.count:
+                result.status = STATUS_UPDATED
+
+        return self.run(task, targets, progress, backup, f"从 {source_path} 同步 {len(lua_files)} 个Lua文件", dry_run, cancel)
@@ -0,0 +1,182 @@
+import os
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from doc_cache import shared_cache, file_key
+from save_codec import to_gb2312
+from app_paths import app_path
+
+DEFAULT_INDEX_FILE = app_path(".equip_index.json")
+INDEX_VERSION = 2
+
+
+def normalize_string(s):
+    """标准化字符串，统一处理特殊字符"""
+    # 将英文点(·)统一替换为中文点(・)，GBK 的破折号(—)替换为 gb2312 的(―)
+    return to_gb2312(s)
+
+
+def _suit_slots(data):
+    """列出 Config.save 中所有装备所在位置：[(标准化名称, 装备配置名, 槽位)]"""
+    slots = []
+    for item in data.get("diysuit_item", []):
+        if isinstance(item, dict) and isinstance(item.get("data"), dict):
+            for slot, equip_name in item["data"].items():
+                if isinstance(equip_name, str) and equip_name:
+                    slots.append((normalize_string(equip_name), item.get("name", ""), slot))
+    return slots
+
+
+class EquipmentIndex:
+    """装备名称 -> (配置目录, 装备配置名, 槽位) 的倒排索引
+
+    以 Config.save 的 (mtime, 大小, inode) 判断是否需要重建，每次只重新解析
+    发生变化的文件；索引保存在磁盘上，下次启动时直接复用。
+    """
+    def __init__(self, index_file=DEFAULT_INDEX_FILE, cache=shared_cache, max_workers=8):
+        self.index_file = index_file
+        self.cache = cache
+        self.max_workers = max_workers
+        self._files = {}  # {Config.save 绝对路径: {'key': [...], 'slots': [[名称, 装备配置名, 槽位]]}}
+        self._names = {}  # {标准化名称: {Config.save 绝对路径: [(装备配置名, 槽位)]}}
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.index_file or not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return  # 索引文件损坏时重新建立
+        if saved.get('version') != INDEX_VERSION:
+            return
+        for path, entry in saved.get('files', {}).items():
+            self._set_file(path, entry['key'], entry['slots'])
+
+    def save(self):
+        """把索引写入磁盘"""
+        if not self.index_file:
+            return
+        with self._lock:
+            saved = {'version': INDEX_VERSION, 'files': dict(self._files)}
+        temp_path = self.index_file + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(saved, f, ensure_ascii=False)
+        os.replace(temp_path, self.index_file)
+
+    def _remove_file(self, path):
+        entry = self._files.pop(path, None)
+        if entry is None:
+            return
+        for name, _, _ in entry['slots']:
+            owners = self._names.get(name)
+            if owners is not None:
+                owners.pop(path, None)
+                if not owners:
+                    del self._names[name]
+
+    def _set_file(self, path, key, slots):
+        self._remove_file(path)
+        self._files[path] = {'key': list(key), 'slots': [list(slot) for slot in slots]}
+        for name, suit_name, slot in slots:
+            self._names.setdefault(name, {}).setdefault(path, []).append((suit_name, slot))
+
+    def refresh(self, folders):
+        """更新 folders 中各 Config.save 的索引，返回重新解析的文件数"""
+        with self._lock:
+            self._load()
+            stale = []
+            for folder in folders:
+                path = os.path.abspath(os.path.join(folder, "Config.save"))
+                try:
+                    key = list(file_key(path))
+                except OSError:
+                    self._remove_file(path)
+                    continue
+                entry = self._files.get(path)
+                if entry is None or entry['key'] != key:
+                    stale.append(path)
+
+        if not stale:
+            return 0
+
+        def parse(path):
+            try:
+                doc = self.cache.load(path)
+            except (OSError, ValueError):
+                return path, None, None
+            return path, doc.key, _suit_slots(doc.data)
+
+        workers = min(self.max_workers, len(stale))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parsed = list(pool.map(parse, stale))
+
+        with self._lock:
+            for path, key, slots in parsed:
+                if key is None:
+                    # 无法解析的文件不进入索引，替换时由引擎逐个报告
+                    self._remove_file(path)
+                else:
+                    self._set_file(path, key, slots)
+        try:
+            self.save()
+        except OSError:
+            pass  # 索引只是加速手段，保存失败时下次重新建立
+        return len(stale)
+
+    def contains(self, config_file):
+        """Config.save 是否已在索引中"""
+        with self._lock:
+            self._load()
+            return os.path.abspath(config_file) in self._files
+
+    def lookup(self, equip_name, folders=None):
+        """返回装备所在位置 [(配置目录, 装备配置名, 槽位)]，folders 非空时只在其中查找"""
+        if folders is not None:
+            self.refresh(folders)
+            wanted = {os.path.abspath(folder) for folder in folders}
+        with self._lock:
+            self._load()
+            owners = self._names.get(normalize_string(equip_name), {})
+            matches = []
+            for path, slots in owners.items():
+                folder = os.path.dirname(path)
+                if folders is not None and folder not in wanted:
+                    continue
+                matches.extend((folder, suit_name, slot) for suit_name, slot in slots)
+        return matches
+
+    def match(self, predicate, folders=None):
+        """返回标准化名称满足 predicate 的装备所在位置 [(配置目录, 装备配置名, 槽位)]
+
+        每个不同的名称只调用一次 predicate，与槽位数量无关。
+        """
+        if folders is not None:
+            self.refresh(folders)
+            wanted = {os.path.abspath(folder) for folder in folders}
+        with self._lock:
+            self._load()
+            names = [(name, owners) for name, owners in self._names.items() if predicate(name)]
+            matches = []
+            for name, owners in names:
+                for path, slots in owners.items():
+                    folder = os.path.dirname(path)
+                    if folders is not None and folder not in wanted:
+                        continue
+                    matches.extend((folder, suit_name, slot) for suit_name, slot in slots)
+        return matches
+
+    def count(self, equip_name, folders=None):
+        """返回 (包含该装备的配置数, 槽位总数)"""
+        matches = self.lookup(equip_name, folders)
+        return len({folder for folder, _, _ in matches}), len(matches)
+
+
+# GUI、引擎共用的索引实例
+shared_index = EquipmentIndex()
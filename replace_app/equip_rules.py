@@ -0,0 +1,182 @@
+import re
+import json
+
+from equip_index import normalize_string
+
+RULE_EXACT = 'exact'  # 名称完全相同
+RULE_PREFIX = 'prefix'  # 名称以 match 开头，替换该前缀
+RULE_REGEX = 'regex'  # 正则匹配，replace 中 {1}、{name} 引用分组，{1+1}、{1-1} 对数字分组加减
+RULE_KINDS = (RULE_EXACT, RULE_PREFIX, RULE_REGEX)
+
+_TEMPLATE_TOKEN = re.compile(r'\{\{|\}\}|\{(\w+)([+-]\d+)?\}')
+
+
+def _compile_template(pattern, template):
+    """把 replace 模板编译为 expand(match) 函数"""
+    parts = []  # 字符串为原样文本，(分组, 增量) 为分组引用
+    pos = 0
+    for token in _TEMPLATE_TOKEN.finditer(template):
+        parts.append(template[pos:token.start()])
+        pos = token.end()
+        if token.group(0) in ('{{', '}}'):
+            parts.append(token.group(0)[0])
+            continue
+        group = token.group(1)
+        if group.isdigit():
+            group = int(group)
+            missing = group > pattern.groups
+        else:
+            missing = group not in pattern.groupindex
+        if missing:
+            raise ValueError(f"替换模板 {template} 引用了不存在的分组 {group}")
+        parts.append((group, int(token.group(2)) if token.group(2) else None))
+    parts.append(template[pos:])
+    parts = [part for part in parts if part != '']
+
+    def expand(match):
+        text = []
+        for part in parts:
+            if isinstance(part, str):
+                text.append(part)
+                continue
+            group, delta = part
+            value = match.group(group) or ''
+            if delta is not None:
+                if not value.isdigit():
+                    raise ValueError(f"分组 {group} 的值 {value} 不是数字，无法加减")
+                value = str(int(value) + delta)
+            text.append(value)
+        return ''.join(text)
+    return expand
+
+
+class Rule:
+    """一条装备改写规则"""
+    __slots__ = ('kind', 'match', 'replace')
+
+    def __init__(self, kind, match, replace):
+        if kind not in RULE_KINDS:
+            raise ValueError(f"未知规则类型: {kind}")
+        if not match:
+            raise ValueError("规则缺少 match")
+        self.kind = kind
+        self.match = match
+        self.replace = replace
+
+    def describe(self):
+        return f"{self.kind}: {self.match} -> {self.replace}"
+
+
+class RuleSet:
+    """编译后的规则集：每个装备名称一次查找得到改写结果
+
+    名称和规则都先统一标准化；精确规则合并为一个字典，前缀规则合并为一个
+    正则（长前缀优先），正则规则按顺序尝试。优先级为 精确 > 前缀 > 正则，
+    每个名称只改写一次（不会连续套用多条规则），结果按名称缓存。
+    正则规则匹配但模板无法展开（如对非数字分组加减）时该规则不生效，
+    继续尝试后面的规则，原因可由 error(name) 取得。
+    """
+    def __init__(self, rules):
+        self.rules = list(rules)
+        self._exact = {}
+        self._prefixes = {}
+        self._regexes = []
+        for rule in self.rules:
+            match = normalize_string(rule.match)
+            replace = normalize_string(rule.replace)
+            if rule.kind == RULE_EXACT:
+                self._exact.setdefault(match, replace)
+            elif rule.kind == RULE_PREFIX:
+                self._prefixes.setdefault(match, replace)
+            else:
+                try:
+                    pattern = re.compile(match)
+                except re.error as e:
+                    raise ValueError(f"规则 {rule.describe()} 的正则表达式无效: {str(e)}")
+                self._regexes.append((rule, pattern, _compile_template(pattern, replace)))
+        self._prefix_pattern = None
+        if self._prefixes:
+            prefixes = sorted(self._prefixes, key=len, reverse=True)
+            self._prefix_pattern = re.compile('|'.join(re.escape(prefix) for prefix in prefixes))
+        self._memo = {}  # {标准化名称: 新名称或 None}
+        self._errors = {}  # {标准化名称: 规则无法应用的原因}
+
+    def __len__(self):
+        return len(self.rules)
+
+    def _apply(self, name):
+        """返回 (新名称, 错误信息)"""
+        replace = self._exact.get(name)
+        if replace is not None:
+            return replace, None
+        if self._prefix_pattern is not None:
+            match = self._prefix_pattern.match(name)
+            if match:
+                return self._prefixes[match.group(0)] + name[match.end():], None
+        error = None
+        for rule, pattern, expand in self._regexes:
+            try:
+                new_name, count = pattern.subn(expand, name, count=1)
+            except ValueError as e:
+                error = error or f"规则 {rule.describe()} 无法应用: {str(e)}"
+                continue
+            if count:
+                return new_name, None
+        return name, error
+
+    def rewrite(self, name):
+        """返回改写后的标准化名称；没有规则匹配或结果不变时返回 None"""
+        if not isinstance(name, str):
+            return None
+        key = normalize_string(name)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        new_name, error = self._apply(key)
+        result = new_name if new_name != key else None
+        if error is not None:
+            self._errors[key] = error
+        self._memo[key] = result
+        return result
+
+    def error(self, name):
+        """名称因模板无法展开而未被改写时返回原因，否则返回 None"""
+        if not isinstance(name, str):
+            return None
+        self.rewrite(name)
+        return self._errors.get(normalize_string(name))
+
+    def describe(self):
+        if len(self.rules) == 1:
+            return self.rules[0].describe()
+        return f"{len(self.rules)} 条规则"
+
+
+def parse_rules(items):
+    """从 [{"type": ..., "match": ..., "replace": ...}] 生成 RuleSet，type 默认为 exact"""
+    if not isinstance(items, list):
+        raise ValueError("规则文件应为 JSON 数组")
+    rules = []
+    for index, item in enumerate(items, 1):
+        if not isinstance(item, dict) or not isinstance(item.get("match"), str) \
+                or not isinstance(item.get("replace"), str):
+            raise ValueError(f"第 {index} 条规则应包含字符串 match 和 replace")
+        try:
+            rules.append(Rule(item.get("type", RULE_EXACT), item["match"], item["replace"]))
+        except ValueError as e:
+            raise ValueError(f"第 {index} 条规则无效: {str(e)}")
+    return RuleSet(rules)
+
+
+def load_rules(rule_file):
+    """读取 JSON 规则文件并编译，例如:
+
+        [
+            {"type": "exact", "match": "清醒者的奥丁勋章+4", "replace": "清醒者的奥丁勋章+5"},
+            {"type": "prefix", "match": "旧套装・", "replace": "新套装・"},
+            {"type": "regex", "match": "^(.+)\\\\+(\\\\d+)$", "replace": "{1}+{2+1}"}
+        ]
+    """
+    with open(rule_file, 'r', encoding='utf-8') as f:
+        return parse_rules(json.load(f))
@@ -0,0 +1,107 @@
+import os
+import shutil
+import hashlib
+import threading
+
+from doc_cache import file_key
+
+_CHUNK_SIZE = 1024 * 1024
+
+# 文件内容哈希缓存：{绝对路径: (文件标识, 哈希)}，源文件同步到多个目标时只计算一次
+_digests = {}
+_digests_lock = threading.Lock()
+_digest_store = None  # 持久化的哈希记录（提供 get_digest / put_digests），跨会话复用
+_pending_digests = {}  # 新计算、尚未写入持久化记录的哈希 {绝对路径: (文件标识, 哈希)}
+
+
+def set_digest_store(store):
+    """设置持久化哈希记录（如 registry.Registry），传 None 取消；切换前写入未保存的哈希"""
+    global _digest_store
+    flush_digests()
+    _digest_store = store
+
+
+def flush_digests():
+    """把新计算的哈希一次写入持久化记录（一个事务），批量操作结束后调用"""
+    with _digests_lock:
+        pending = dict(_pending_digests)
+        _pending_digests.clear()
+    if pending and _digest_store is not None:
+        _digest_store.put_digests([(path, key, digest) for path, (key, digest) in pending.items()])
+
+
+def content_digest(data):
+    """计算一段内容的哈希（与 file_digest 结果可直接比较）"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def file_digest(file_path):
+    """计算文件内容的 blake2b 哈希，文件未变化时直接复用上次的结果"""
+    path = os.path.abspath(file_path)
+    key = file_key(path)
+    with _digests_lock:
+        cached = _digests.get(path)
+    if cached is None and _digest_store is not None:
+        cached = _digest_store.get_digest(path)
+    if cached is not None and cached[0] == key:
+        with _digests_lock:
+            _digests[path] = cached
+        return cached[1]
+
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_CHUNK_SIZE), b''):
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _digests_lock:
+        _digests[path] = (key, digest)
+        if _digest_store is not None:
+            _pending_digests[path] = (key, digest)
+    return digest
+
+
+def same_content(source, target):
+    """两个文件内容是否相同：先比较大小，大小相同时再比较哈希"""
+    try:
+        if os.path.getsize(source) != os.path.getsize(target):
+            return False
+    except OSError:
+        return False
+    return file_digest(source) == file_digest(target)
+
+
+def _kernel_copy(source_fd, target_fd, size):
+    """在内核中复制文件内容，不支持时返回 False"""
+    copy_range = getattr(os, 'copy_file_range', None)
+    sendfile = getattr(os, 'sendfile', None)
+    for copy in (copy_range, sendfile):
+        if copy is None:
+            continue
+        offset = 0
+        try:
+            while offset < size:
+                if copy is copy_range:
+                    sent = copy(source_fd, target_fd, size - offset)
+                else:
+                    sent = copy(target_fd, source_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError:
+            if offset:
+                raise
+            continue  # 该文件系统不支持，换下一种方式
+        if offset == size:
+            return True
+        if offset:
+            raise OSError(f"复制中断: 只写入了 {offset}/{size} 字节")
+    return False
+
+
+def copy_file(source, target):
+    """复制文件内容和元数据（同 shutil.copy2），优先使用 copy_file_range / sendfile"""
+    size = os.path.getsize(source)
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        if not _kernel_copy(src.fileno(), dst.fileno(), size):
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+    shutil.copystat(source, target)
@@ -1,21 +1,45 @@
+import time
+_START_TIME = time.perf_counter()  # 启动计时起点（在导入 PyQt5 之前）
+
 import sys
 import json
 import os
-import shutil
 import ctypes
 import subprocess
+import threading
+from collections import deque
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QWidget, 
                             QPushButton, QListWidget, QFileDialog, QLabel, 
                             QInputDialog, QListWidgetItem, QHBoxLayout, 
                             QMessageBox, QGroupBox, QComboBox, QCheckBox,
                             QLineEdit, QFormLayout, QDialog, QDialogButtonBox,
                             QGridLayout, QStyledItemDelegate, QScrollArea,
-                            QFrame, QListView, QStyle, QStylePainter, QStyleOptionComboBox)
-from PyQt5.QtCore import Qt, QSize, QEvent
+                            QFrame, QListView, QStyle, QStylePainter, QStyleOptionComboBox,
+                            QProgressBar)
+from PyQt5.QtCore import (Qt, QSize, QEvent, QTimer, QAbstractListModel, QModelIndex, QFileSystemWatcher,
+                          QObject, QRunnable, QThreadPool, pyqtSignal)
 from PyQt5.QtGui import QFont, QColor, QPalette, QIcon, QStandardItemModel, QStandardItem, QCursor
 from pathlib import Path
+from engine import (BatchEngine, OPTION_FIELDS, STATUS_UPDATED, STATUS_FAILED, STATUS_CANCELLED, STATUS_INVALID,
+                    load_equipment_suits, unique_targets, results_by_account)
+from doc_cache import shared_cache
+from transaction import recover as recover_transactions
+from lua_settings import read_dungeon_settings
+from lua_catalog import LuaCatalog, same_folder
+from op_log import LogBuffer, open_log_file, DEFAULT_CAPACITY, DEFAULT_LOG_FILE
+from op_queue import OperationQueue
+from registry import Registry, DEFAULT_REGISTRY_FILE, LEGACY_CONFIG_FILE
+from app_paths import app_path
+from file_sync import set_digest_store
+from equip_rules import Rule, RuleSet, RULE_EXACT, load_rules
+from suit_sync import SECTIONS as SUIT_SECTIONS, DEFAULT_ITEM_SUITS
 
-CONFIG_FILE = "accounts_config.json"
+# 以下路径都在程序数据目录中（见 app_paths），与启动时的工作目录无关
+CONFIG_FILE = LEGACY_CONFIG_FILE  # 旧版配置文件，首次启动时导入注册表
+REGISTRY_FILE = DEFAULT_REGISTRY_FILE  # 账号和配置目录的注册表
+CACHE_DIR = app_path(".doc_cache")  # 解析结果的磁盘缓存目录
+LOG_FILE = DEFAULT_LOG_FILE  # 按大小轮转的结构化日志文件
+LOG_FLUSH_INTERVAL_MS = 100  # 日志视图最多每秒刷新 10 次
 
 def resource_path(relative_path):
     """动态获取资源路径（同时支持开发环境和打包后环境）"""
@@ -38,6 +62,8 @@ def resource_path(relative_path):
 
 
 class CheckableComboBox(QComboBox):
+    _style = None  # 所有实例共用的样式表，第一次创建时生成
+
     def __init__(self, parent=None):
         super(CheckableComboBox, self).__init__(parent)
         self.setView(QListView(self))
@@ -45,8 +71,19 @@ class CheckableComboBox(QComboBox):
         self.setModel(QStandardItemModel(self))
         
         # 配置基本属性
+        self.setStyleSheet(self.style_sheet())
+        self._popup_open = False
+        self._display_text = "请选择..."
+        
+        # 连接信号
+        self.model().itemChanged.connect(self._update_display_text)
+
+    @classmethod
+    def style_sheet(cls):
+        if cls._style is not None:
+            return cls._style
         down = Path(resource_path('down.png')).as_posix()
-        style = f"""
+        cls._style = f"""
             QComboBox {{
                 combobox-popup: 0;
                 font-family: PingFang SC;
@@ -95,12 +132,7 @@ class CheckableComboBox(QComboBox):
                 color: white;
             }}
         """
-        self.setStyleSheet(style)
-        self._popup_open = False
-        self._display_text = "请选择..."
-        
-        # 连接信号
-        self.model().itemChanged.connect(self._update_display_text)
+        return cls._style
         
     def eventFilter(self, obj, event):
         # 处理下拉列表中选项的鼠标释放事件
@@ -198,6 +230,60 @@ class StyledComboBoxDelegate(QStyledItemDelegate):
         option.font.setPointSize(10)
         super().paint(painter, option, index)
 
+class EngineJobSignals(QObject):
+    """EngineJob 的信号：QRunnable 不是 QObject，信号放在单独的对象上"""
+    target_done = pyqtSignal(object, int, int)
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class EngineJob(QRunnable):
+    """在 QThreadPool 中执行一次引擎操作，通过信号回报每个目标的进度和最终结果"""
+    def __init__(self, call, dry_run=False):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.call = call
+        self.dry_run = dry_run
+        self.cancel_event = threading.Event()
+        self.signals = EngineJobSignals()
+
+    def run(self):
+        try:
+            results = self.call(progress=self.signals.target_done.emit, cancel=self.cancel_event, dry_run=self.dry_run)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(results)
+
+class LogListModel(QAbstractListModel):
+    """日志列表模型：最新的日志在最上面，超出容量时丢弃最旧的日志"""
+    def __init__(self, capacity=DEFAULT_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._rows = deque()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and index.isValid():
+            return self._rows[index.row()]
+        return None
+
+    def prepend(self, lines):
+        """批量插入一组日志（按时间顺序），一次通知视图"""
+        lines = lines[-self.capacity:]
+        if not lines:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(lines) - 1)
+        self._rows.extendleft(lines)
+        self.endInsertRows()
+        overflow = len(self._rows) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), self.capacity, len(self._rows) - 1)
+            for _ in range(overflow):
+                self._rows.pop()
+            self.endRemoveRows()
+
 class AccountDialog(QDialog):
     """账号管理对话框"""
     def __init__(self, parent=None):
@@ -309,67 +395,22 @@ class FolderSelectorApp(QMainWindow):
         # 添加下面这行代码设置窗口图标
         icon = resource_path('icon.png')
         self.setWindowIcon(QIcon(icon))
-        down = Path(resource_path('down.png')).as_posix()
-        self.select_style = f"""
-            QComboBox {{
-                combobox-popup: 0;
-                font-family: PingFang SC;
-                font-size: 14px;
-                padding: 5px 8px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                min-height: 28px;
-                font-weight: bold;
-            }}
-            QComboBox:hover {{
-                border: 1px solid #aaa;
-            }}
-            QComboBox::drop-down {{
-                subcontrol-origin: padding;
-                subcontrol-position: top right;
-                width: 20px;
-                border-left-width: 1px;
-                border-left-color: #ddd;
-                border-left-style: solid;
-                border-top-right-radius: 4px;
-                border-bottom-right-radius: 4px;
-            }}
-            QComboBox::down-arrow {{
-                image: url({down});
-                width: 14px;
-                height: 14px;
-            }}
-            QComboBox QAbstractItemView {{
-                font-family: PingFang SC;
-                font-size: 13px;
-                padding: 8px;
-                border: 1px solid #ddd;
-                border-radius: 4px;
-                background: white;
-                selection-background-color: #5c9eff;
-                selection-color: white;
-                outline: 0;
-                margin: 0;
-            }}
-            QComboBox QAbstractItemView::item {{
-                height: 30px;
-            }}
-            QComboBox QAbstractItemView::item:hover {{
-                background-color: #5c9eff; 
-                color: white;
-            }}
-        """
+        self.select_style = CheckableComboBox.style_sheet()  # 单选下拉框与多选下拉框共用同一份样式表
+        started = time.perf_counter()
         self.init_settings()
+        recovery_message = self.recover_journal()  # 必须在读取注册表和任何配置之前
         self.init_data()
+        data_done = time.perf_counter()
         self.init_ui()
+        ui_done = time.perf_counter()
+        if recovery_message:
+            self.log_operation(recovery_message)
+        self.report_startup_time(started, data_done, ui_done)
 
     def init_settings(self):
         """初始化设置"""
         self.setWindowTitle("多配置管理器")
         self.setGeometry(100, 100, 1200, 700)
-        self.encoding_backup = ''
-        self.encoding_format = ''
-        self.encoding_source = ''
     
     def init_data(self):
         """初始化数据"""
@@ -378,7 +419,24 @@ class FolderSelectorApp(QMainWindow):
         self.current_account = None  # 当前账号
         self.folders = {}  # 存储文件夹数据：{path: name}
         self.equipment_configs = {}  # 存储装备配置数据
-        self.load_config()  # 加载保存的配
+        self.equipment_rules = None  # 功能1从规则文件加载的 RuleSet
+        self.dry_run = False  # 预览模式：功能只计算变更集，不写入文件
+        self.preview_callback = None  # 预览完成后接收变更集的回调
+        self.current_job = None  # 正在线程池中执行的操作
+        self.job_done_callback = None
+        self.engine = BatchEngine()  # 批量操作引擎（线程池）
+        self.operation_queue = OperationQueue(self.engine)  # 批量模式下排队的操作
+        try:
+            log_file = open_log_file(LOG_FILE)
+        except OSError:
+            log_file = None  # 无法写日志文件时只在界面显示
+        self.log_buffer = LogBuffer(logger=log_file)
+        try:
+            shared_cache.enable_disk(CACHE_DIR)
+        except OSError:
+            pass  # 无法创建磁盘缓存时只使用内存缓存
+        self.registry = None
+        self.load_config()  # 加载保存的配置
         # 文件名映射关系
         self.filename_mapping = {
             "a11f6f8b73d79273": "普累罗麻",
@@ -411,6 +469,33 @@ class FolderSelectorApp(QMainWindow):
             '000aaccac0f4305c': "艾乌加蒙剧场",
             '46d09fe1bda4c623': "深渊之境",
         }
+        # 各配置目录的 .lua 文件目录，目录变化时由文件系统监视使缓存失效
+        self.lua_catalog = LuaCatalog(self.filename_mapping)
+        self.lua_watcher = QFileSystemWatcher(self)
+        self.lua_watcher.directoryChanged.connect(self.on_lua_folder_changed)
+    
+    def report_startup_time(self, started, data_done, ui_done):
+        """记录启动各阶段耗时（毫秒）"""
+        def ms(begin, end):
+            return f"{(end - begin) * 1000:.0f} ms"
+        now = time.perf_counter()
+        self.log_operation(
+            f"启动耗时: 模块加载 {ms(_START_TIME, started)}，数据 {ms(started, data_done)}，"
+            f"界面 {ms(data_done, ui_done)}，合计 {ms(_START_TIME, now)}"
+        )
+
+    def recover_journal(self):
+        """处理上次异常退出时未完成的写入事务，返回需要记录的日志（没有时为 None）
+
+        在界面和日志创建之前调用，日志由调用方在界面创建后记录。
+        """
+        try:
+            count = recover_transactions()
+        except OSError as e:
+            return f"警告: 恢复未完成的事务失败: {str(e)}"
+        if count:
+            return f"已恢复 {count} 个未完成的写入事务"
+        return None
     
     def init_ui(self):
         """初始化用户界面"""
@@ -511,6 +596,10 @@ class FolderSelectorApp(QMainWindow):
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(15)
         
+        # 执行结果（进度、取消、汇总）
+        summary_group = self.create_summary_group()
+        layout.addWidget(summary_group)
+        
         # 日志显示区域
         log_group = self.create_log_group()
         layout.addWidget(log_group)
@@ -560,11 +649,11 @@ class FolderSelectorApp(QMainWindow):
         if self.current_account:
             self.account_combo.setCurrentText(self.current_account)
         self.account_combo.currentTextChanged.connect(self.change_account)
-        layout.addWidget(self.account_combo, 70)
+        layout.addWidget(self.account_combo, 55)
         
         # 账号管理按钮
         self.manage_accounts_btn = QPushButton("管理账号")
-        self.manage_accounts_btn.setStyleSheet("""
+        button_style = """
             QPushButton {
                 padding: 5px 10px;
                 font-family: PingFang SC;
@@ -578,9 +667,20 @@ class FolderSelectorApp(QMainWindow):
             QPushButton:hover {
                 background: #4d8ce5;
             }
-        """)
+        """
+        self.manage_accounts_btn.setStyleSheet(button_style)
         self.manage_accounts_btn.clicked.connect(self.manage_accounts)
-        layout.addWidget(self.manage_accounts_btn, 30)
+        layout.addWidget(self.manage_accounts_btn, 25)
+        
+        # 导入/导出 accounts_config.json 格式的账号配置
+        import_btn = QPushButton("导入")
+        import_btn.setStyleSheet(button_style)
+        import_btn.clicked.connect(self.import_config)
+        layout.addWidget(import_btn, 10)
+        export_btn = QPushButton("导出")
+        export_btn.setStyleSheet(button_style)
+        export_btn.clicked.connect(self.export_config)
+        layout.addWidget(export_btn, 10)
         
         group.setLayout(layout)
         return group
@@ -683,32 +783,25 @@ class FolderSelectorApp(QMainWindow):
         self.function_combo.addItem("4. 替换指定配置选项")
         self.function_combo.addItem("5. 更改难度")
         self.function_combo.addItem("6. 同步Lua文件")
+        self.function_combo.addItem("7. 同步diy.suit配置")
         self.function_combo.currentIndexChanged.connect(self.on_function_changed)
         self.function_layout.addWidget(self.function_combo)
         
-        # 功能1的输入控件容器
-        self.function1_container = self.create_function1_widget()
-        self.function_layout.addWidget(self.function1_container)
-        
-        # 功能2的输入控件容器
-        self.function2_container = self.create_function2_widget()
-        self.function_layout.addWidget(self.function2_container)
-        
-        # 功能3的输入控件容器
-        self.function3_container = self.create_function3_widget()
-        self.function_layout.addWidget(self.function3_container)
-        
-        # 功能4的输入控件容器
-        self.function4_container = self.create_function4_widget()
-        self.function_layout.addWidget(self.function4_container)
-        
-        # 功能5的输入控件容器
-        self.function5_container = self.create_function5_widget()
-        self.function_layout.addWidget(self.function5_container)
+        # 各功能的输入控件在第一次选择该功能时才创建（见 function_container）
+        self.function_builders = {
+            1: self.create_function1_widget,
+            2: self.create_function2_widget,
+            3: self.create_function3_widget,
+            4: self.create_function4_widget,
+            5: self.create_function5_widget,
+            6: self.create_function6_widget,
+            7: self.create_function7_widget,
+        }
+        self.function_containers = {}
         
-        # 功能6的输入控件容器
-        self.function6_container = self.create_function6_widget()
-        self.function_layout.addWidget(self.function6_container)
+        # 作用范围：把操作同时应用到其他账号的全部配置
+        self.scope_container = self.create_scope_widget()
+        self.function_layout.addWidget(self.scope_container)
         
         # 添加执行按钮
         self.execute_button = QPushButton("执行选定功能")
@@ -743,6 +836,119 @@ class FolderSelectorApp(QMainWindow):
         """)
         self.backup_checkbox.hide()
         self.function_layout.addWidget(self.backup_checkbox)
+
+        # 执行前先以预览模式计算变更集
+        self.preview_checkbox = QCheckBox("执行前预览变更")
+        self.preview_checkbox.setChecked(True)
+        self.preview_checkbox.setStyleSheet("""
+            QCheckBox {
+                font-family: PingFang SC;
+                font-size: 12px;
+            }
+        """)
+        self.preview_checkbox.hide()
+        self.function_layout.addWidget(self.preview_checkbox)
+
+        # 批量模式：执行时只加入队列，之后每个文件只读写、备份一次
+        self.batch_checkbox = QCheckBox("批量模式（加入队列，稍后一次执行）")
+        self.batch_checkbox.setStyleSheet("""
+            QCheckBox {
+                font-family: PingFang SC;
+                font-size: 12px;
+            }
+        """)
+        self.batch_checkbox.hide()
+        self.function_layout.addWidget(self.batch_checkbox)
+
+        self.preview_button = QPushButton("预览变更")
+        self.preview_button.setStyleSheet("""
+            QPushButton {
+                padding: 8px 10px;
+                font-family: PingFang SC;
+                font-size: 14px;
+                background: #17a2b8;
+                color: white;
+                border: none;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background: #138496;
+            }
+        """)
+        self.preview_button.clicked.connect(self.preview_function)
+        self.preview_button.hide()
+        self.function_layout.addWidget(self.preview_button)
+        
+        # 从备份仓库恢复某次操作之前的内容
+        self.restore_button = QPushButton("恢复备份")
+        self.restore_button.setStyleSheet("""
+            QPushButton {
+                padding: 8px 10px;
+                font-family: PingFang SC;
+                font-size: 14px;
+                background: #6c757d;
+                color: white;
+                border: none;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background: #5a6268;
+            }
+        """)
+        self.restore_button.clicked.connect(self.restore_backup)
+        self.function_layout.addWidget(self.restore_button)
+
+        # 撤销/重做：按撤销日志中的逆补丁改写，只涉及改动过的字节
+        undo_layout = QHBoxLayout()
+        self.undo_button = QPushButton("撤销")
+        self.redo_button = QPushButton("重做")
+        for button in (self.undo_button, self.redo_button):
+            button.setStyleSheet("""
+                QPushButton {
+                    padding: 8px 10px;
+                    font-family: PingFang SC;
+                    font-size: 14px;
+                    background: #6c757d;
+                    color: white;
+                    border: none;
+                    border-radius: 4px;
+                }
+                QPushButton:hover {
+                    background: #5a6268;
+                }
+            """)
+            undo_layout.addWidget(button)
+        self.undo_button.clicked.connect(lambda: self.step_undo_log(redo=False))
+        self.redo_button.clicked.connect(lambda: self.step_undo_log(redo=True))
+        self.function_layout.addLayout(undo_layout)
+
+        # 批量模式的队列
+        queue_layout = QHBoxLayout()
+        self.run_queue_button = QPushButton("执行队列 (0)")
+        self.clear_queue_button = QPushButton("清空队列")
+        for button in (self.run_queue_button, self.clear_queue_button):
+            button.setStyleSheet("""
+                QPushButton {
+                    padding: 8px 10px;
+                    font-family: PingFang SC;
+                    font-size: 14px;
+                    background: #6c757d;
+                    color: white;
+                    border: none;
+                    border-radius: 4px;
+                }
+                QPushButton:hover {
+                    background: #5a6268;
+                }
+                QPushButton:disabled {
+                    background: #adb5bd;
+                }
+            """)
+            button.setEnabled(False)
+            queue_layout.addWidget(button)
+        self.run_queue_button.clicked.connect(self.execute_queue)
+        self.clear_queue_button.clicked.connect(self.clear_queue)
+        self.function_layout.addLayout(queue_layout)
         
         group.setLayout(self.function_layout)
         return group
@@ -778,6 +984,33 @@ class FolderSelectorApp(QMainWindow):
     
         layout.addRow("当前装备:", self.current_equipment_input)
         layout.addRow("替换装备:", self.replace_equipment_input)
+
+        # 规则文件：一次应用多条改写规则（精确、前缀、正则），可与上面的装备名称同时使用
+        rule_layout = QHBoxLayout()
+        self.rule_file_input = QLineEdit()
+        self.rule_file_input.setReadOnly(True)
+        self.rule_file_input.setPlaceholderText("可选，JSON 规则文件")
+        self.rule_file_input.setStyleSheet("""
+            QLineEdit {
+                padding: 5px;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+            }
+        """)
+        rule_layout.addWidget(self.rule_file_input)
+        rule_button = QPushButton("选择...")
+        rule_button.clicked.connect(self.choose_rule_file)
+        rule_layout.addWidget(rule_button)
+        clear_rule_button = QPushButton("清除")
+        clear_rule_button.clicked.connect(self.clear_rule_file)
+        rule_layout.addWidget(clear_rule_button)
+        layout.addRow("规则文件:", rule_layout)
+
+        # 输入完成后通过装备索引统计匹配数量
+        self.equipment_match_label = QLabel("")
+        self.equipment_match_label.setStyleSheet("color: #666;")
+        layout.addRow("", self.equipment_match_label)
+        self.current_equipment_input.editingFinished.connect(self.update_equipment_match_count)
         
         container.setLayout(layout)
         container.hide()
@@ -1010,12 +1243,14 @@ class FolderSelectorApp(QMainWindow):
                 background: #5a6268;
             }
         """)
-        self.refresh_lua_btn.clicked.connect(self.refresh_lua_files)
+        self.refresh_lua_btn.clicked.connect(self.rescan_lua_files)
         layout.addWidget(self.refresh_lua_btn)
         
         # Lua文件列表
-        layout.addWidget(QLabel("2. Lua文件列表:"))
+        layout.addWidget(QLabel("2. Lua文件列表（可多选）:"))
         self.lua_list_widget = QListWidget()
+        self.lua_list_widget.setSelectionMode(QListWidget.ExtendedSelection)
+        self.lua_list_widget.currentItemChanged.connect(self.read_lua_difficulty)
         self.lua_list_widget.setAlternatingRowColors(True)
         self.lua_list_widget.setStyleSheet("""
             QListWidget {
@@ -1054,11 +1289,105 @@ class FolderSelectorApp(QMainWindow):
         self.explore_combo.setStyleSheet(self.select_style)
         self.explore_combo.addItems(["关闭", "开启"])
         layout.addWidget(self.explore_combo)
+
+        # 批量模式：同一设置一次应用到多个配置
+        layout.addWidget(QLabel("5. 同时应用到（可多选，不选则只修改目标配置）:"))
+        self.bulk_difficulty_combo = CheckableComboBox()
+        layout.addWidget(self.bulk_difficulty_combo)
         
         container.setLayout(layout)
         container.hide()
         return container
     
+    def create_function7_widget(self):
+        """创建功能7的控件 - 同步diy.suit中的装备/超越/其他/觉醒配置"""
+        container = QWidget()
+        layout = QVBoxLayout()
+        layout.setSpacing(10)
+
+        # 源配置选择
+        layout.addWidget(QLabel("1. 源配置:"))
+        self.source_suit_combo = QComboBox()
+        self.source_suit_combo.setItemDelegate(StyledComboBoxDelegate(self.source_suit_combo))
+        self.source_suit_combo.setPlaceholderText("选择源配置")
+        self.source_suit_combo.setStyleSheet(self.select_style)
+        layout.addWidget(self.source_suit_combo)
+
+        # 目标配置选择（多选）
+        layout.addWidget(QLabel("2. 目标配置:"))
+        self.target_suit_combo = CheckableComboBox()
+        layout.addWidget(self.target_suit_combo)
+
+        # 要同步的部分
+        layout.addWidget(QLabel("3. 同步内容:"))
+        section_layout = QHBoxLayout()
+        self.suit_section_checks = {}
+        for label in SUIT_SECTIONS:
+            checkbox = QCheckBox(label)
+            section_layout.addWidget(checkbox)
+            self.suit_section_checks[label] = checkbox
+        layout.addLayout(section_layout)
+
+        # 装备部分只同步指定名称的装备配置
+        layout.addWidget(QLabel("4. 装备部分同步的装备配置（逗号分隔，留空则整体同步）:"))
+        self.suit_names_input = QLineEdit(", ".join(DEFAULT_ITEM_SUITS))
+        self.suit_names_input.setStyleSheet("""
+            QLineEdit {
+                padding: 5px;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+            }
+        """)
+        layout.addWidget(self.suit_names_input)
+
+        container.setLayout(layout)
+        container.hide()
+        return container
+
+    def create_scope_widget(self):
+        """创建账号作用范围选择控件"""
+        container = QWidget()
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 10, 0, 0)
+        layout.addWidget(QLabel("同时应用到其他账号（可多选，不选则只修改当前账号）:"))
+        self.scope_combo = CheckableComboBox()
+        layout.addWidget(self.scope_combo)
+        container.setLayout(layout)
+        container.hide()
+        self.update_scope_combo()
+        return container
+
+    def update_scope_combo(self):
+        """用当前账号以外的账号填充作用范围下拉框，保留仍存在的勾选"""
+        checked = set(self.scope_combo.checkedData())
+        self.scope_combo.clear()
+        for account in self.accounts:
+            if account == self.current_account:
+                continue
+            self.scope_combo.addItem(account)
+            if account in checked:
+                item = self.scope_combo.model().item(self.scope_combo.model().rowCount() - 1)
+                item.setCheckState(Qt.Checked)
+
+    def scope_accounts(self):
+        """返回勾选的其他账号名称"""
+        return [account for account in self.scope_combo.checkedData() if account in self.accounts]
+
+    def scope_targets(self, target_configs, target_name, exclude=None):
+        """把勾选账号的全部配置并入目标配置
+
+        多个账号共用的目录只保留一次，exclude（源配置）不作为目标；
+        返回 ([(path, name)], 显示名称)。
+        """
+        accounts = self.scope_accounts()
+        targets = list(target_configs)
+        for account in accounts:
+            targets.extend(self.accounts[account].get("configurations", {}).items())
+        targets = unique_targets(targets, exclude)
+        if accounts:
+            target_name = f"{target_name} 及账号 {', '.join(accounts)} 的全部配置（共 {len(targets)} 个）"
+        return targets, target_name
+
     def create_function6_widget(self):
         """创建功能6的控件 - 同步Lua文件"""
         container = QWidget()
@@ -1094,7 +1423,7 @@ class FolderSelectorApp(QMainWindow):
                 background: #5a6268;
             }
         """)
-        self.refresh_sync_lua_btn.clicked.connect(self.refresh_sync_lua_files)
+        self.refresh_sync_lua_btn.clicked.connect(self.rescan_sync_lua_files)
         layout.addWidget(self.refresh_sync_lua_btn)
         
         # Lua文件列表（多选）
@@ -1155,6 +1484,64 @@ class FolderSelectorApp(QMainWindow):
         for checkbox in checkboxes:
             checkbox.setChecked(state == Qt.Checked)
 
+    def create_summary_group(self):
+        """创建执行结果组：进度条、取消按钮和结果汇总"""
+        group = QGroupBox("执行结果")
+        group.setStyleSheet("""
+            QGroupBox {
+                font-family: PingFang SC;
+                font-size: 14px;
+                font-weight: bold;
+                border: 1px solid #ddd;
+                border-radius: 4px;
+                margin-top: 10px;
+                padding-top: 15px;
+            }
+            QGroupBox::title {
+                subcontrol-origin: margin;
+                left: 10px;
+            }
+        """)
+        layout = QVBoxLayout()
+
+        progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%v/%m")
+        progress_layout.addWidget(self.progress_bar)
+
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setStyleSheet("""
+            QPushButton {
+                padding: 4px 10px;
+                font-family: PingFang SC;
+                font-size: 12px;
+                background: #dc3545;
+                color: white;
+                border: none;
+                border-radius: 4px;
+            }
+            QPushButton:hover {
+                background: #c82333;
+            }
+            QPushButton:disabled {
+                background: #ccc;
+            }
+        """)
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.cancel_job)
+        progress_layout.addWidget(self.cancel_button)
+        layout.addLayout(progress_layout)
+
+        self.summary_label = QLabel("尚未执行操作")
+        self.summary_label.setWordWrap(True)
+        self.summary_label.setStyleSheet("color: #666;")
+        layout.addWidget(self.summary_label)
+
+        group.setLayout(layout)
+        return group
+
     def create_log_group(self):
         """创建日志组（带滚动条）"""
         group = QGroupBox("操作日志")
@@ -1175,31 +1562,32 @@ class FolderSelectorApp(QMainWindow):
         """)
         layout = QVBoxLayout()
         
-        # 创建滚动区域
-        scroll_area = QScrollArea()
-        scroll_area.setWidgetResizable(True)
-        scroll_area.setFrameShape(QFrame.NoFrame)
-        
-        # 创建日志内容部件
-        log_content = QWidget()
-        log_content.setStyleSheet("background: #f8f9fa;")
-        log_layout = QVBoxLayout(log_content)
-        log_layout.setContentsMargins(10, 10, 10, 10)
-        
-        self.log_label = QLabel("等待执行操作...")
-        self.log_label.setStyleSheet("""
-            font-family: PingFang SC;
-            font-size: 12px;
-            color: #666;
+        # 日志视图只绘制可见的行，新日志由定时器按固定频率批量刷新
+        self.log_model = LogListModel(self.log_buffer.capacity, self)
+        self.log_model.prepend(["等待执行操作..."])
+        self.log_view = QListView()
+        self.log_view.setModel(self.log_model)
+        self.log_view.setWordWrap(True)
+        self.log_view.setLayoutMode(QListView.Batched)
+        self.log_view.setBatchSize(100)
+        self.log_view.setEditTriggers(QListView.NoEditTriggers)
+        self.log_view.setSelectionMode(QListView.ExtendedSelection)
+        self.log_view.setStyleSheet("""
+            QListView {
+                font-family: PingFang SC;
+                font-size: 12px;
+                color: #666;
+                background: #f8f9fa;
+                border: none;
+                padding: 10px;
+            }
         """)
-        self.log_label.setWordWrap(True)
-        self.log_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-        log_layout.addWidget(self.log_label)
-        log_layout.addStretch()
-        
-        # 设置滚动区域的内容
-        scroll_area.setWidget(log_content)
-        layout.addWidget(scroll_area)
+        layout.addWidget(self.log_view)
+
+        self.log_timer = QTimer(self)
+        self.log_timer.setInterval(LOG_FLUSH_INTERVAL_MS)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start()
         
         group.setLayout(layout)
         return group
@@ -1226,119 +1614,125 @@ class FolderSelectorApp(QMainWindow):
     #     except Exception as e:
     #         raise ValueError(f"读取文件 {file_path} 时出错: {str(e)}")
     
-    def read_default_save(self, file_path):
-        """读取 Default.save 文件，自动检测编码（GB2312 或 Windows-1252）"""
+    def load_config(self):
+        """从注册表加载配置（第一次启动时导入旧的 accounts_config.json）"""
         try:
-            # 优先尝试 GB2312 解码
-            self.encoding_backup = 'gb2312'
-            with open(file_path, 'r', encoding='gb2312') as f:
-                return json.load(f)
-        except UnicodeDecodeError:
-            self.encoding_backup = 'gb2312'
-            try:
-                # 如果 GB2312 失败，尝试强制读取 gb2312
-                with open(file_path, 'r', encoding='gb2312', errors='ignore') as f:
-                    content = f.read()
-
-                # 写入 tmp 文件
-                temp_filename = file_path + '.tmp'
-                with open(temp_filename, 'w', encoding='gb2312') as f:
-                    f.write(content)
-                # 替换原文件
-                os.replace(temp_filename, file_path)
-                
-                # 重新读取出来
-                with open(file_path, 'r', encoding='gb2312') as f:
-                    return json.load(f)
-            except Exception as e:
-                raise ValueError(f"无法解码文件 {file_path}: {str(e)}")
-        except json.JSONDecodeError:
-            raise ValueError(f"文件 {file_path} 不是有效的 JSON 格式")
+            self.registry = Registry(REGISTRY_FILE, legacy_file=CONFIG_FILE)
+            self.accounts = self.registry.accounts()
         except Exception as e:
-            raise ValueError(f"读取文件 {file_path} 时出错: {str(e)}")
+            QMessageBox.warning(self, "警告", f"加载配置文件失败: {str(e)}")
+            return
+        set_digest_store(self.registry)  # 文件哈希跨会话复用
 
-    def write_default_save(self, file_path, data):
-        """写入 Default.save 文件，使用检测到的编码"""
+        # 如果有账号数据，默认选择第一个账号
+        if self.accounts:
+            self.current_account = next(iter(self.accounts.keys()))
+            self.folders = self.accounts[self.current_account].get("configurations", {})
+            self.function4_config_name = self.accounts[self.current_account].get("function4_config_name", '')
+    
+    def save_config(self, method, *args):
+        """把一项修改写入注册表，例如 save_config('add_folder', 账号, 路径, 名称)"""
+        if self.registry is None:
+            return
         try:
-            with open(file_path, 'w', encoding=self.encoding_format) as f:
-                json.dump(data, f, indent=4, ensure_ascii=False)
+            getattr(self.registry, method)(*args)
         except Exception as e:
-            raise ValueError(f"写入文件 {file_path} 时出错: {str(e)}")
-    
-    def load_config(self):
-        """从文件加载配置"""
-        if os.path.exists(CONFIG_FILE):
-            try:
-                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.accounts = data.get("accounts", {})
-                    
-                    # 如果有账号数据，默认选择第一个账号
-                    if self.accounts:
-                        self.current_account = next(iter(self.accounts.keys()))
-                        self.folders = self.accounts[self.current_account].get("configurations", {})
-                        self.function4_config_name = self.accounts[self.current_account].get("function4_config_name", '')
-            except Exception as e:
-                QMessageBox.warning(self, "警告", f"加载配置文件失败: {str(e)}")
-    
-    def save_config(self):
-        """保存配置到文件"""
+            QMessageBox.critical(self, "错误", f"保存配置文件失败: {str(e)}")
+
+    def import_config(self):
+        """从 accounts_config.json 格式的文件导入账号（与现有账号合并）"""
+        if self.registry is None:
+            return
+        file_path, _ = QFileDialog.getOpenFileName(self, "导入账号配置", "", "JSON 文件 (*.json)")
+        if not file_path:
+            return
+        try:
+            count = self.registry.import_json(file_path)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"导入失败: {str(e)}")
+            return
+        self.accounts = self.registry.accounts()
+        if self.current_account not in self.accounts:
+            self.current_account = next(iter(self.accounts.keys()), None)
+        self.account_combo.clear()
+        self.account_combo.addItems(self.accounts.keys())
         if self.current_account:
-            # 更新当前账号的配置
-            self.accounts[self.current_account] = {
-                "configurations": self.folders,
-                "count": len(self.folders),
-                'function4_config_name': self.function4_config_name,
-            }
-        
-        data = {
-            "accounts": self.accounts
-        }
-        
+            self.account_combo.setCurrentText(self.current_account)
+            self.change_account(self.current_account)
+        self.log_operation(f"已从 {file_path} 导入 {count} 个账号")
+
+    def export_config(self):
+        """把全部账号导出为 accounts_config.json 格式"""
+        if self.registry is None:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出账号配置", CONFIG_FILE, "JSON 文件 (*.json)")
+        if not file_path:
+            return
         try:
-            # 使用json.dumps手动序列化，然后替换换行符为LF
-            json_str = json.dumps(data, indent=4, ensure_ascii=False)
-            # 将CRLF换行符替换为LF
-            json_str = json_str.replace('\r\n', '\n')
-            
-            with open(CONFIG_FILE, 'w', encoding='utf-8', newline='\n') as f:
-                f.write(json_str)
+            self.registry.export_json(file_path)
         except Exception as e:
-            QMessageBox.critical(self, "错误", f"保存配置文件失败: {str(e)}")
-    
+            QMessageBox.critical(self, "错误", f"导出失败: {str(e)}")
+            return
+        self.log_operation(f"已导出账号配置到 {file_path}")
+    
+    def function_container(self, index):
+        """返回功能的输入控件容器，第一次访问时创建并放到功能下拉菜单下方"""
+        container = self.function_containers.get(index)
+        if container is None:
+            started = time.perf_counter()
+            container = self.function_builders[index]()
+            self.function_layout.insertWidget(1, container)
+            self.function_containers[index] = container
+            self.log_operation(f"创建功能{index}面板: {(time.perf_counter() - started) * 1000:.0f} ms")
+        return container
+
+    def update_config_combos(self):
+        """配置列表变化后刷新已创建的功能2、3、4面板中的下拉菜单"""
+        updaters = {
+            2: self.update_source_config_combo,
+            3: self.update_default_config_combos,
+            4: self.update_option_config_combos,
+        }
+        for index, update in updaters.items():
+            if index in self.function_containers:
+                update()
+
     def on_function_changed(self, index):
         """当功能选择发生变化时"""
-        # 隐藏所有功能容器
-        self.function1_container.hide()
-        self.function2_container.hide()
-        self.function3_container.hide()
-        self.function4_container.hide()
-        self.function5_container.hide()
-        self.function6_container.hide()
+        # 隐藏已创建的功能容器
+        for container in self.function_containers.values():
+            container.hide()
+        if index in self.function_builders:
+            self.function_container(index).show()
         self.execute_button.show()
+        self.scope_container.show()
         self.backup_checkbox.show()
+        self.preview_checkbox.show()
+        self.batch_checkbox.show()
+        self.preview_button.show()
         
         # 根据选择显示对应的容器
         if index == 1:  # 替换所有配置的指定装备
-            self.function1_container.show()
             self.update_equipment_config_combos()
         elif index == 2:  # 替换其他配置的指定装备配置
-            self.function2_container.show()
             self.update_source_config_combo()
         elif index == 3:  # 复制默认设置到所选配置中
-            self.function3_container.show()
             self.update_default_config_combos()
         elif index == 4:  # 替换指定配置选项
-            self.function4_container.show()
             self.update_option_config_combos()
         elif index == 5:  # 更改难度
-            self.function5_container.show()
             self.update_difficulty_config_combos()
         elif index == 6:  # 同步Lua文件
-            self.function6_container.show()
             self.update_sync_config_combos()
+        elif index == 7:  # 同步diy.suit配置
+            self.update_suit_config_combos()
         else:
+            # 没有选择功能时不显示作用范围和执行相关的控件
+            self.scope_container.hide()
             self.backup_checkbox.hide()
+            self.preview_checkbox.hide()
+            self.batch_checkbox.hide()
+            self.preview_button.hide()
             self.execute_button.hide()
 
     def update_option_config_combos(self):
@@ -1417,15 +1811,29 @@ class FolderSelectorApp(QMainWindow):
     def update_difficulty_config_combos(self):
         """更新功能5的下拉菜单"""
         self.target_difficulty_combo.clear()
+        self.bulk_difficulty_combo.clear()
         
         for path, name in self.folders.items():
             self.target_difficulty_combo.addItem(name, path)
+            self.bulk_difficulty_combo.addItem(name, path)
         
         # 默认选中第一个配置并自动刷新Lua文件
         if self.target_difficulty_combo.count() > 0:
             self.target_difficulty_combo.setCurrentIndex(0)
             self.refresh_lua_files()
     
+    def update_suit_config_combos(self):
+        """更新功能7的下拉菜单"""
+        self.source_suit_combo.clear()
+        self.target_suit_combo.clear()
+
+        for path, name in self.folders.items():
+            self.source_suit_combo.addItem(name, path)
+            self.target_suit_combo.addItem(name, path)
+        # 默认选中第一个配置
+        if self.source_suit_combo.count() > 0:
+            self.source_suit_combo.setCurrentIndex(0)
+
     def update_sync_config_combos(self):
         """更新功能6的下拉菜单"""
         self.source_sync_combo.clear()
@@ -1568,24 +1976,23 @@ class FolderSelectorApp(QMainWindow):
             return
             
         try:
-            with open(config_file, 'r', encoding='gb2312') as f:
-                suit_data = json.load(f)
-                diysuit_items = suit_data.get("diysuit_item", [])
-                
-                if not diysuit_items:
-                    self.log_operation(f"警告: {selected_path} 中没有找到diysuit_item配置")
-                    QMessageBox.warning(self, "警告", "该配置中没有找到diysuit_item数据")
-                    return
-                
-                for index, item in enumerate(diysuit_items, 1):
-                    config_name = item.get("name", f"未命名配置_{index}")
-                    self.equipment_configs[f"config_{index}"] = {
-                        "name": config_name,
-                        "data": item.get("data")
-                    }
-                    self.equipment_config_combo.addItem(config_name, f"config_{index}")
-                
-                self.log_operation(f"成功加载 {len(diysuit_items)} 个装备配置")
+            # 经由共享文档缓存读取，文件未变化时不会重复解析
+            diysuit_items = load_equipment_suits(selected_path)
+            
+            if not diysuit_items:
+                self.log_operation(f"警告: {selected_path} 中没有找到diysuit_item配置")
+                QMessageBox.warning(self, "警告", "该配置中没有找到diysuit_item数据")
+                return
+            
+            for index, item in enumerate(diysuit_items, 1):
+                config_name = item.get("name", f"未命名配置_{index}")
+                self.equipment_configs[f"config_{index}"] = {
+                    "name": config_name,
+                    "data": item.get("data")
+                }
+                self.equipment_config_combo.addItem(config_name, f"config_{index}")
+            
+            self.log_operation(f"成功加载 {len(diysuit_items)} 个装备配置")
         except json.JSONDecodeError:
             self.log_operation(f"错误: {config_file} 不是有效的JSON文件")
             QMessageBox.critical(self, "错误", "Config.save文件格式错误，不是有效的JSON")
@@ -1610,11 +2017,13 @@ class FolderSelectorApp(QMainWindow):
             deleted_accounts = set(self.accounts.keys()) - set(new_accounts)
             for account in deleted_accounts:
                 del self.accounts[account]
+                self.save_config('remove_account', account)
             
-            # 检查是否有新账号添加
-            added_accounts = set(new_accounts) - set(self.accounts.keys())
+            # 检查是否有新账号添加（按对话框中的顺序）
+            added_accounts = [account for account in new_accounts if account not in self.accounts]
             for account in added_accounts:
-                self.accounts[account] = {"configurations": {}, "count": 0}
+                self.accounts[account] = {"configurations": {}, "count": 0, "function4_config_name": ''}
+                self.save_config('add_account', account)
             
             # 更新账号下拉菜单
             self.account_combo.clear()
@@ -1627,137 +2036,93 @@ class FolderSelectorApp(QMainWindow):
                     self.account_combo.setCurrentText(self.current_account)
                     self.folders = self.accounts[self.current_account]["configurations"]
                     self.function4_config_name = self.accounts[self.current_account]["function4_config_name"]
-                    self.config_name_input.setText(self.function4_config_name)
+                    if 4 in self.function_containers:
+                        self.config_name_input.setText(self.function4_config_name)
                     self.update_list_widget()
                 else:
                     self.current_account = None
                     self.folders = {}
                     self.update_list_widget()
-            
-            # 保存配置
-            self.save_config()
-    
+            self.update_scope_combo()
+    
+    def populate_lua_list(self, list_widget, folder):
+        """从 .lua 文件目录渲染列表，保留仍存在的选中项，返回文件数"""
+        selected = {item.data(Qt.UserRole) for item in list_widget.selectedItems()}
+        entries = self.lua_catalog.entries(folder)
+        list_widget.clear()
+        if not entries:
+            list_widget.addItem("未找到.lua文件")
+            return 0
+        for lua_file, display_name in entries:
+            item = QListWidgetItem(display_name)
+            item.setData(Qt.UserRole, lua_file)  # 存储原始文件名
+            list_widget.addItem(item)
+            if lua_file in selected:
+                item.setSelected(True)
+        return len(entries)
+
     def refresh_lua_files(self):
         """刷新Lua文件列表"""
-        self.lua_list_widget.clear()
-        
         selected_path = self.target_difficulty_combo.currentData()
         if not selected_path:
+            self.lua_list_widget.clear()
             return
             
         try:
-            # 获取目标配置路径下的所有.lua文件
-            lua_files = []
-            for file in os.listdir(selected_path):
-                if file.endswith('.lua'):
-                    lua_files.append(file)
-            
-            if not lua_files:
-                self.lua_list_widget.addItem("未找到.lua文件")
-                return
-            
-            # 将有映射关系的文件排在前面，没有映射关系的文件排在后面
-            mapped_files = []
-            unmapped_files = []
-            
-            for lua_file in lua_files:
-                file_name_without_ext = lua_file.replace('.lua', '')
-                if file_name_without_ext in self.filename_mapping:
-                    mapped_files.append(lua_file)
-                else:
-                    unmapped_files.append(lua_file)
-            
-            # 分别排序
-            mapped_files.sort()
-            unmapped_files.sort()
-            
-            # 合并列表：有映射的文件在前，无映射的文件在后
-            lua_files = mapped_files + unmapped_files
-            
-            for lua_file in lua_files:
-                # 获取文件名（不含.lua后缀）
-                file_name_without_ext = lua_file.replace('.lua', '')
-                
-                # 使用映射关系解码文件名
-                decoded_name = self.filename_mapping.get(file_name_without_ext, file_name_without_ext)
-                
-                if decoded_name != file_name_without_ext:
-                    display_name = f"{decoded_name} ({lua_file})"
-                else:
-                    display_name = lua_file
-                
-                item = QListWidgetItem(display_name)
-                item.setData(Qt.UserRole, lua_file)  # 存储原始文件名
-                self.lua_list_widget.addItem(item)
-                
-            # 设置Lua文件选择信号连接
-            self.lua_list_widget.currentItemChanged.connect(self.read_lua_difficulty)
-            
-            self.log_operation(f"已加载 {len(lua_files)} 个Lua文件")
-            
+            count = self.populate_lua_list(self.lua_list_widget, selected_path)
+            if count:
+                self.log_operation(f"已加载 {count} 个Lua文件")
         except Exception as e:
+            self.lua_list_widget.clear()
             self.log_operation(f"刷新Lua文件列表出错: {str(e)}")
             QMessageBox.warning(self, "警告", f"读取Lua文件列表失败: {str(e)}")
     
     def refresh_sync_lua_files(self):
         """刷新功能6的Lua文件列表"""
-        self.sync_lua_list_widget.clear()
-        
         source_path = self.source_sync_combo.currentData()
         if not source_path:
+            self.sync_lua_list_widget.clear()
             QMessageBox.warning(self, "警告", "请先选择源配置!")
             return
             
         try:
-            # 获取源配置路径下的所有.lua文件
-            lua_files = []
-            for file in os.listdir(source_path):
-                if file.endswith('.lua'):
-                    lua_files.append(file)
-            
-            if not lua_files:
-                self.sync_lua_list_widget.addItem("未找到.lua文件")
-                return
-            
-            # 将有映射关系的文件排在前面，没有映射关系的文件排在后面
-            mapped_files = []
-            unmapped_files = []
-            
-            for lua_file in lua_files:
-                file_name_without_ext = lua_file.replace('.lua', '')
-                if file_name_without_ext in self.filename_mapping:
-                    mapped_files.append(lua_file)
-                else:
-                    unmapped_files.append(lua_file)
-            
-            # 分别排序
-            mapped_files.sort()
-            unmapped_files.sort()
-            
-            # 合并列表：有映射的文件在前，无映射的文件在后
-            lua_files = mapped_files + unmapped_files
-            
-            for lua_file in lua_files:
-                # 获取文件名（不含.lua后缀）
-                file_name_without_ext = lua_file.replace('.lua', '')
-                
-                # 使用映射关系解码文件名
-                decoded_name = self.filename_mapping.get(file_name_without_ext, file_name_without_ext)
-                
-                if decoded_name != file_name_without_ext:
-                    display_name = f"{decoded_name} ({lua_file})"
-                else:
-                    display_name = lua_file
-                
-                item = QListWidgetItem(display_name)
-                item.setData(Qt.UserRole, lua_file)  # 存储原始文件名
-                self.sync_lua_list_widget.addItem(item)
-                
-            self.log_operation(f"已加载 {len(lua_files)} 个Lua文件")
-            
+            count = self.populate_lua_list(self.sync_lua_list_widget, source_path)
+            if count:
+                self.log_operation(f"已加载 {count} 个Lua文件")
         except Exception as e:
+            self.sync_lua_list_widget.clear()
             self.log_operation(f"刷新Lua文件列表出错: {str(e)}")
             QMessageBox.warning(self, "警告", f"读取Lua文件列表失败: {str(e)}")
+
+    def rescan_lua_files(self):
+        """重新扫描功能5目标配置的Lua文件"""
+        self.lua_catalog.invalidate(self.target_difficulty_combo.currentData())
+        self.refresh_lua_files()
+
+    def rescan_sync_lua_files(self):
+        """重新扫描功能6源配置的Lua文件"""
+        self.lua_catalog.invalidate(self.source_sync_combo.currentData())
+        self.refresh_sync_lua_files()
+
+    def watch_lua_folders(self):
+        """监视当前账号的全部配置目录"""
+        watched = self.lua_watcher.directories()
+        if watched:
+            self.lua_watcher.removePaths(watched)
+        folders = [path for path in self.folders if os.path.isdir(path)]
+        if folders:
+            self.lua_watcher.addPaths(folders)
+
+    def on_lua_folder_changed(self, folder):
+        """配置目录内容变化：使缓存失效，正在显示该目录的列表重新渲染"""
+        self.lua_catalog.invalidate(folder)
+        try:
+            if 5 in self.function_containers and same_folder(folder, self.target_difficulty_combo.currentData()):
+                self.populate_lua_list(self.lua_list_widget, folder)
+            if 6 in self.function_containers and same_folder(folder, self.source_sync_combo.currentData()):
+                self.populate_lua_list(self.sync_lua_list_widget, folder)
+        except OSError as e:
+            self.log_operation(f"刷新Lua文件列表出错: {str(e)}")
     
     def on_source_sync_changed(self):
         """源配置变化时自动刷新Lua文件列表"""
@@ -1776,22 +2141,17 @@ class FolderSelectorApp(QMainWindow):
             
         try:
             lua_file = selected_lua_item.data(Qt.UserRole)
+            if not lua_file:
+                return  # "未找到.lua文件" 提示项
             lua_file_path = os.path.join(selected_path, lua_file)
             
             if not os.path.exists(lua_file_path):
                 return
             
-            # 读取Lua文件内容
-            with open(lua_file_path, 'r', encoding='gbk', errors='ignore') as f:
-                lua_content = f.read()
+            # 一次解析读取难度和探索设置
+            current_difficulty, explore_value = read_dungeon_settings(lua_file_path)
             
-            # 查找难度设置
-            import re
-            pattern = r'副本难度\s*=\s*([^\n\r]+)'
-            match = re.search(pattern, lua_content)
-            
-            if match:
-                current_difficulty = match.group(1).strip()
+            if current_difficulty is not None:
                 # 确保难度值在有效范围内
                 valid_difficulties = ["剧情", "简单", "普通", "困难", "炼狱"]
                 if current_difficulty not in valid_difficulties:
@@ -1810,12 +2170,7 @@ class FolderSelectorApp(QMainWindow):
                 self.difficulty_combo.setCurrentIndex(2)  # 默认普通
                 self.log_operation(f"{lua_file} 中未找到难度设置，使用默认值")
             
-            # 查找探索设置
-            explore_pattern = r'探索副本\s*=\s*([^\n\r]+)'
-            explore_match = re.search(explore_pattern, lua_content)
-            
-            if explore_match:
-                explore_value = explore_match.group(1).strip()
+            if explore_value is not None:
                 # 转换为下拉菜单选项
                 if explore_value.lower() in ["true", "开启", "on", "1"]:
                     self.explore_combo.setCurrentText("开启")
@@ -1838,8 +2193,10 @@ class FolderSelectorApp(QMainWindow):
             self.current_account = account_name
             self.folders = self.accounts[account_name].get("configurations", {})
             self.function4_config_name = self.accounts[account_name].get("function4_config_name", '')
-            self.config_name_input.setText(self.function4_config_name)
+            if 4 in self.function_containers:
+                self.config_name_input.setText(self.function4_config_name)
             self.update_list_widget()
+            self.update_scope_combo()
             self.log_operation(f"切换到账号: {account_name}")
     
     def add_folder(self):
@@ -1876,12 +2233,10 @@ class FolderSelectorApp(QMainWindow):
 
         # 如果当前显示的是功能2或3或4，更新下拉菜单
         if self.function_combo.currentIndex() in (2, 3, 4):
-            self.update_source_config_combo()
-            self.update_default_config_combos()
-            self.update_option_config_combos()
+            self.update_config_combos()
 
         # 自动保存配置
-        self.save_config()
+        self.save_config('add_folder', self.current_account, folder, name)
     
     def decode_gbk_hex(self, name):
         """解码GBK十六进制编码的字符串"""
@@ -1961,12 +2316,10 @@ class FolderSelectorApp(QMainWindow):
         
         # 如果当前显示的是功能2或3或4，更新下拉菜单
         if self.function_combo.currentIndex() in (2, 3, 4):
-            self.update_source_config_combo()
-            self.update_default_config_combos()
-            self.update_option_config_combos()
+            self.update_config_combos()
             
         # 自动保存配置
-        self.save_config()
+        self.save_config('rename_folder', self.current_account, path, name)
     
     def remove_folder(self):
         """移除列表中选中的文件夹"""
@@ -1996,16 +2349,15 @@ class FolderSelectorApp(QMainWindow):
         
         # 如果当前显示的是功能2或3或4，更新下拉菜单
         if self.function_combo.currentIndex() in (2, 3, 4):
-            self.update_source_config_combo()
-            self.update_default_config_combos()
-            self.update_option_config_combos()
+            self.update_config_combos()
             
         # 自动保存配置
-        self.save_config()
+        self.save_config('remove_folder', self.current_account, path)
     
     def update_list_widget(self):
         """更新列表部件显示"""
         self.list_widget.clear()
+        self.watch_lua_folders()
         
         for path, name in self.folders.items():
             # 创建自定义部件
@@ -2019,123 +2371,214 @@ class FolderSelectorApp(QMainWindow):
             self.list_widget.addItem(item)
             self.list_widget.setItemWidget(item, item_widget)
     
-    def normalize_string(self, s):
-        """标准化字符串，统一处理特殊字符"""
-        # 将中文点(・)和英文点(·)统一替换为中文点
-        return s.replace('・', '・').replace('·', '・')
-    
-    def execute_function(self):
-        """执行选定的功能"""
+    def selected_function_index(self):
+        """检查账号、配置和功能选择，返回选定的功能序号，无效时返回 None"""
         if not self.current_account:
             QMessageBox.warning(self, "警告", "请先选择或创建一个账号!")
-            return
+            return None
             
         if not self.folders:
             QMessageBox.warning(self, "警告", "请先添加配置文件夹!")
-            return
+            return None
         
         selected_function = self.function_combo.currentIndex()
         if selected_function == 0:  # "请选择功能..."
             QMessageBox.warning(self, "警告", "请先选择一个功能!")
+            return None
+        return selected_function
+
+    def run_selected_function(self, selected_function):
+        """根据选择的功能调用相应的方法"""
+        handlers = {
+            1: self.execute_function1,
+            2: self.execute_function2,
+            3: self.execute_function3,
+            4: self.execute_function4,
+            5: self.execute_function5,
+            6: self.execute_function6,
+            7: self.execute_function7,
+        }
+        return handlers[selected_function]()
+
+    def preview_changes(self, selected_function, on_changes):
+        """以预览模式在线程池中运行功能，完成后以有变化的 Change 列表调用 on_changes(changes)
+
+        输入无效时不会启动预览，也不会调用 on_changes。
+        """
+        self.dry_run = True
+        self.preview_callback = on_changes
+        try:
+            self.run_selected_function(selected_function)
+        finally:
+            self.dry_run = False
+            self.preview_callback = None
+
+    def finish_preview(self, results, on_changes):
+        """记录预览得到的变更集，再交给 on_changes 处理"""
+        changes = []
+        for result in results:
+            if result.status == STATUS_FAILED:
+                self.log_operation(f"预览: {result.error}")
+                continue
+            if result.status == STATUS_INVALID:
+                # 格式无效的目标不会被修改，列出具体原因
+                for message in result.messages:
+                    self.log_operation(f"预览: {message}")
+                continue
+            for change in result.changes:
+                if change.changed:
+                    changes.append(change)
+                    self.log_operation(f"预览: {result.name} {change.describe()}")
+        files = {change.path for change in changes}
+        self.log_operation(f"预览: 共 {len(files)} 个文件将被修改")
+        self.show_summary(f"预览完成: {len(files)} 个文件将被修改")
+        on_changes(changes)
+
+    def preview_function(self):
+        """只预览选定功能将产生的变更，不写入任何文件"""
+        selected_function = self.selected_function_index()
+        if selected_function is None:
             return
-        
-        # 根据选择的功能调用相应的方法
+
+        def show(changes):
+            files = {change.path for change in changes}
+            QMessageBox.information(self, "预览", f"将修改 {len(files)} 个文件，共 {len(changes)} 处变更\n详细变更见操作日志")
+
         try:
-            if selected_function == 1:
-                self.execute_function1()
-            elif selected_function == 2:
-                self.execute_function2()
-            elif selected_function == 3:
-                self.execute_function3()
-            elif selected_function == 4:
-                self.execute_function4()
-            elif selected_function == 5:
-                self.execute_function5()
-            elif selected_function == 6:
-                self.execute_function6()
+            self.preview_changes(selected_function, show)
         except Exception as e:
-            self.log_operation(f"执行过程中出错: {str(e)}")
-            QMessageBox.critical(self, "错误", f"执行过程中出错: {str(e)}")
+            self.log_operation(f"预览过程中出错: {str(e)}")
+            QMessageBox.critical(self, "错误", f"预览过程中出错: {str(e)}")
+
+    def execute_function(self):
+        """执行选定的功能"""
+        selected_function = self.selected_function_index()
+        if selected_function is None:
+            return
+
+        def confirm(changes):
+            # 预览完成后：没有变化时不执行，有变化时确认后再执行
+            if not changes:
+                QMessageBox.information(self, "提示", "目标配置已是最新，没有需要修改的内容")
+                return
+            files = {change.path for change in changes}
+            reply = QMessageBox.question(
+                self, "确认", f"将修改 {len(files)} 个文件，共 {len(changes)} 处变更，是否继续?",
+                QMessageBox.Yes | QMessageBox.No
+            )
+            if reply == QMessageBox.Yes:
+                run()
+
+        def run():
+            try:
+                self.run_selected_function(selected_function)
+            except Exception as e:
+                self.log_operation(f"执行过程中出错: {str(e)}")
+                QMessageBox.critical(self, "错误", f"执行过程中出错: {str(e)}")
+
+        if not self.preview_checkbox.isChecked():
+            run()
+            return
+        try:
+            self.preview_changes(selected_function, confirm)
+        except Exception as e:
+            self.log_operation(f"预览过程中出错: {str(e)}")
+            QMessageBox.critical(self, "错误", f"预览过程中出错: {str(e)}")
     
-    def execute_function1(self):
-        """功能1: 替换所有配置的指定装备"""
+    def choose_rule_file(self):
+        """选择并编译功能1的规则文件"""
+        file_path, _ = QFileDialog.getOpenFileName(self, "选择规则文件", "", "JSON 文件 (*.json)")
+        if not file_path:
+            return
+        try:
+            self.equipment_rules = load_rules(file_path)
+        except (OSError, ValueError) as e:
+            QMessageBox.critical(self, "错误", f"读取规则文件失败: {str(e)}")
+            return
+        self.rule_file_input.setText(file_path)
+        self.log_operation(f"已加载规则文件: {file_path}（{len(self.equipment_rules)} 条规则）")
+        self.update_equipment_match_count()
+
+    def clear_rule_file(self):
+        self.equipment_rules = None
+        self.rule_file_input.clear()
+        self.update_equipment_match_count()
+
+    def equipment_rule_set(self):
+        """合并规则文件和输入框中的装备名称，返回 (RuleSet, 描述)；都没有时返回 (None, '')"""
+        rules = list(self.equipment_rules.rules) if self.equipment_rules else []
+        descriptions = [f"规则文件中的 {len(rules)} 条规则"] if rules else []
         current_equip = self.current_equipment_input.text().strip()
-        replace_equip = self.replace_equipment_input.text().strip()
+        if current_equip:
+            replace_equip = self.replace_equipment_input.text().strip()
+            # 输入框中的装备优先于规则文件
+            rules.insert(0, Rule(RULE_EXACT, current_equip, replace_equip))
+            descriptions.insert(0, f"{current_equip} -> {replace_equip}")
+        if not rules:
+            return None, ''
+        return RuleSet(rules), "，".join(descriptions)
+
+    def execute_function1(self):
+        """功能1: 替换所有配置的指定装备（可同时应用规则文件中的多条规则）"""
+        rules, rule_name = self.equipment_rule_set()
 
-        if not current_equip:
-            QMessageBox.warning(self, "警告", "请输入当前装备和替换装备名称!")
+        if rules is None:
+            QMessageBox.warning(self, "警告", "请输入当前装备和替换装备名称，或选择规则文件!")
             return
 
-        # 获取选中的目标配置
-        model = self.target_equipment_combo.model()
-        all_config_selected = model.item(0).checkState() == Qt.Checked
-        
-        if all_config_selected:
-            target_configs = list(self.folders.items())
-            target_name = "所有配置"
-        else:
-            target_configs = []
-            for i in range(1, model.rowCount()):
-                item = model.item(i)
-                if item.checkState() == Qt.Checked:
-                    target_configs.append((item.data(), item.text()))
-            target_name = ", ".join([name for path, name in target_configs])
+        # 获取选中的目标配置（并入其他账号）
+        target_configs, target_name = self.scope_targets(*self.selected_equipment_targets())
         
         if not target_configs:
             QMessageBox.warning(self, "警告", "请至少选择一个目标配置!")
             return
 
-        self.log_operation(f"执行: 在{target_name}中替换装备 {current_equip} -> {replace_equip}")
-        
-        # 实际替换逻辑
-        try:
-            updated_files = 0
-            total_updated = 0
-            
-            for path, name in target_configs:
-                config_file = os.path.join(path, "Config.save")
-                if not os.path.exists(config_file):
-                    self.log_operation(f"跳过: {name} 没有Config.save文件")
-                    continue
-                
-                # 备份原文件
-                if self.backup_checkbox.isChecked():
-                    self.backup_file(config_file)
-                
-                # 读取配置文件
-                with open(config_file, 'r', encoding='gb2312') as f:
-                    config_data = json.load(f)
-                
-                # 替换装备
-                if "diysuit_item" in config_data:
-                    updated = False
-                    for item in config_data["diysuit_item"]:
-                        if "data" in item and isinstance(item["data"], dict):
-                            for equip_id, equip_name in item["data"].items():
-                                # 修改这里，直接比较字符串，不进行任何处理
-                                if self.normalize_string(equip_name) == self.normalize_string(current_equip):
-                                    item["data"][equip_id] = self.normalize_string(replace_equip)
-                                    total_updated += 1
-                                    updated = True
-                    
-                    if updated:
-                        # 写入更新后的文件
-                        with open(config_file, 'w', encoding='gb2312') as f:
-                            json.dump(config_data, f, indent=4, ensure_ascii=False)
-                        updated_files += 1
-                        self.log_operation(f"成功: 已在 {name} 中替换了装备")
-            
-            QMessageBox.information(self, "完成", 
-                f"已在 {updated_files}/{len(self.folders)} 个配置文件中完成替换\n"
-                f"共更新了 {total_updated} 处装备数据")
-            
-        except json.JSONDecodeError:
-            self.log_operation("错误: 配置文件不是有效的JSON格式")
-            QMessageBox.critical(self, "错误", "遇到无效的JSON配置文件")
-        except Exception as e:
-            self.log_operation(f"错误: {str(e)}")
-            QMessageBox.critical(self, "错误", f"替换装备时出错: {str(e)}")
+        self.log_operation(f"执行: 在{target_name}中替换装备 {rule_name}")
+        matched = {}
+
+        def call(engine, **kwargs):
+            # 匹配统计要解析所有目标，和替换一起在线程池中执行
+            matched['counts'] = engine.count_rewrites(target_configs, rules)
+            return engine.rewrite_equipment(
+                target_configs, rules, backup=backup, description=f"替换装备 {rule_name}", **kwargs)
+
+        def finish(results):
+            if 'counts' in matched:
+                config_count, slot_count = matched['counts']
+                self.log_operation(f"匹配: {config_count} 个配置中共 {slot_count} 处装备")
+            updated_files = sum(1 for r in results if r.status == STATUS_UPDATED)
+            total_updated = sum(r.count for r in results)
+            self.report_results(
+                results,
+                f"已在 {updated_files}/{len(target_configs)} 个配置文件中完成替换\n"
+                f"共更新了 {total_updated} 处装备数据"
+            )
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(call, finish)
     
+    def selected_equipment_targets(self):
+        """返回功能1选中的目标配置 ([(path, name)], 显示名称)"""
+        model = self.target_equipment_combo.model()
+        if model.rowCount() and model.item(0).checkState() == Qt.Checked:
+            return list(self.folders.items()), "所有配置"
+        target_configs = []
+        for i in range(1, model.rowCount()):
+            item = model.item(i)
+            if item.checkState() == Qt.Checked:
+                target_configs.append((item.data(), item.text()))
+        return target_configs, ", ".join([name for path, name in target_configs])
+
+    def update_equipment_match_count(self):
+        """统计当前装备和规则在选中配置中的匹配数量（只重新解析有变化的文件）"""
+        rules, _ = self.equipment_rule_set()
+        target_configs, _ = self.selected_equipment_targets()
+        if rules is None or not target_configs:
+            self.equipment_match_label.setText("")
+            return
+        config_count, slot_count = self.engine.count_rewrites(target_configs, rules)
+        self.equipment_match_label.setText(f"匹配: {config_count} 个配置，共 {slot_count} 处")
+
     def execute_function2(self):
         """功能2: 替换其他配置的指定装备配置"""
         if self.source_config_combo.currentIndex() == -1:
@@ -2167,6 +2610,8 @@ class FolderSelectorApp(QMainWindow):
                     if path != self.source_config_combo.currentData():  # 排除源配置
                         target_configs.append((path, name))
             target_name = ", ".join([name for path, name in target_configs])
+        target_configs, target_name = self.scope_targets(
+            target_configs, target_name, self.source_config_combo.currentData())
         
         if not target_configs:
             QMessageBox.warning(self, "警告", "请至少选择一个目标配置!")
@@ -2183,60 +2628,19 @@ class FolderSelectorApp(QMainWindow):
         target_config_name = config_data['name']
         self.log_operation(f"执行: 从配置 {source_name} 复制装备配置 {target_config_name} 的data到{target_name}")
 
-        # 实际替换逻辑
-        try:
-            updated_count = 0
-            
-            for target_path, target_name in target_configs:
-                target_file = os.path.join(target_path, "Config.save")
-                if not os.path.exists(target_file):
-                    continue
-                    
-                # 读取目标文件
-                with open(target_file, 'r', encoding='gb2312') as f:
-                    target_data = json.load(f)
-                
-                # 备份原文件
-                if self.backup_checkbox.isChecked():
-                    self.backup_file(target_file)
-                
-                # 更新diysuit_item中name匹配的data
-                if "diysuit_item" in target_data:
-                    updated = False
-                    for item in target_data["diysuit_item"]:
-                         if item.get("name") == target_config_name:
-                            item["data"] = config_data["data"]
-                            updated = True
-                            break
-                    
-                    if updated:
-                        # 写入更新
-                        with open(target_file, 'w', encoding='gb2312') as f:
-                            json.dump(target_data, f, indent=4, ensure_ascii=False)
-                        updated_count += 1
-                        self.log_operation(f"成功更新配置: {target_name}")
-                    else:
-                        target_data["diysuit_item"].append({
-                            "name": target_config_name,
-                            "data": config_data["data"]
-                        })
-                        with open(target_file, 'w', encoding='gb2312') as f:
-                            json.dump(target_data, f, indent=4, ensure_ascii=False)
-                        updated_count += 1
-                        self.log_operation(f"成功新增配置: {target_name}")
-                        # self.log_operation(f"配置 {target_name} 中未找到名称匹配的装备")
-                else:
-                    self.log_operation(f"配置 {target_name} 中没有diysuit_item数据")
-            
-            QMessageBox.information(self, "成功", 
-                f"已在 {updated_count}/{len(target_configs)} 个配置中更新了 {target_config_name} 的data数据")
-        
-        except json.JSONDecodeError:
-            self.log_operation("错误: 目标文件不是有效的JSON格式")
-            QMessageBox.critical(self, "错误", "目标配置文件不是有效的JSON格式")
-        except Exception as e:
-            self.log_operation(f"替换失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"替换装备配置失败: {str(e)}")
+        def finish(results):
+            updated_count = sum(1 for r in results if r.status == STATUS_UPDATED)
+            self.report_results(
+                results,
+                f"已在 {updated_count}/{len(target_configs)} 个配置中更新了 {target_config_name} 的data数据"
+            )
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.copy_equipment_suit(
+                target_configs, target_config_name, config_data["data"], backup=backup, **kwargs),
+            finish,
+        )
     
     def execute_function3(self):
         """功能3: 复制默认设置到所选配置中"""
@@ -2262,6 +2666,8 @@ class FolderSelectorApp(QMainWindow):
                     if path != self.source_default_combo.currentData():  # 排除源配置
                         target_configs.append((path, name))
             target_name = ", ".join([name for path, name in target_configs])
+        target_configs, target_name = self.scope_targets(
+            target_configs, target_name, self.source_default_combo.currentData())
         
         if not target_configs:
             QMessageBox.warning(self, "警告", "请至少选择一个目标配置!")
@@ -2270,36 +2676,26 @@ class FolderSelectorApp(QMainWindow):
         source_name = self.source_default_combo.currentText()
         self.log_operation(f"执行: 从配置 {source_name} 复制Default.save到 {target_name}")
         
-        try:
-            source_file = os.path.join(self.source_default_combo.currentData(), "Default.save")
-            if not os.path.exists(source_file):
-                QMessageBox.warning(self, "警告", f"源配置 {source_name} 中没有找到Default.save文件!")
-                self.log_operation(f"错误: {source_name} 中没有Default.save文件")
-                return
+        def finish(results):
+            success_count = sum(1 for r in results if r.status == STATUS_UPDATED)
+            skipped_count = sum(r.skip_count for r in results)
+            self.report_results(
+                results,
+                f"已成功复制到 {success_count}/{len(target_configs)} 个目标配置\n"
+                f"{skipped_count} 个目标内容已相同，未改写"
+            )
 
+        source_path = self.source_default_combo.currentData()
+        if not os.path.exists(os.path.join(source_path, "Default.save")):
+            QMessageBox.warning(self, "警告", f"源配置 {source_name} 中没有找到Default.save文件!")
+            self.log_operation(f"错误: {source_name} 中没有Default.save文件")
+            return None
 
-            # 处理每个目标配置
-            success_count = 0
-            for target_path, target_name in target_configs:
-                target_file = os.path.join(target_path, "Default.save")
-                
-                # 备份目标文件
-                if os.path.exists(target_file) and self.backup_checkbox.isChecked():
-                    self.backup_file(target_file)
-                
-                # 复制文件
-                shutil.copy2(source_file, target_file)
-                self.log_operation(f"成功: 已将配置复制到 {target_name}")
-                success_count += 1
-            
-            QMessageBox.information(
-                self, "完成", 
-                f"已成功复制到 {success_count}/{len(target_configs)} 个目标配置"
-            )
-            
-        except Exception as e:
-            self.log_operation(f"复制失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"复制Default.save文件失败: {str(e)}")
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.copy_default_save(source_path, target_configs, backup=backup, **kwargs),
+            finish,
+        )
     
     def execute_function4(self):
         """功能4: 替换指定配置选项"""
@@ -2317,47 +2713,36 @@ class FolderSelectorApp(QMainWindow):
             QMessageBox.warning(self, "警告", "请至少选择一个目标配置!")
             return
         
-        
-        # 获取配置名称
+        # 获取配置名称，有配置名称则使用 [配置名称].json，否则使用 Default.save
         config_name = self.config_name_input.text().strip()
-    
-        # 确定文件名：如果有配置名称则使用 [配置名称].json，否则使用 Default.save
-        if config_name:
-            file_name = f"{config_name}.json"
-        else:
-            file_name = "Default.save"
-        
-        if not (self.item_use_check.isChecked() or 
-               self.item_buff_check.isChecked() or 
-               self.skill_buff_check.isChecked() or
-               self.filter_pick1_check.isChecked() or
-               self.filter_pick2_check.isChecked() or
-               self.filter_throw1_check.isChecked() or
-               self.filter_throw2_check.isChecked() or
-               self.diy_trigger_check.isChecked() or
-               self.pet_build_check.isChecked() or
-               self.item_disassemble_check.isChecked() or
-               self.item_filter_check.isChecked() or
-               self.store_items_check.isChecked()):
+
+        # 确定要复制的字段
+        option_checks = [
+            ('item_use', self.item_use_check),
+            ('item_buff', self.item_buff_check),
+            ('skill_buff', self.skill_buff_check),
+            ('filter_pick1', self.filter_pick1_check),
+            ('filter_pick2', self.filter_pick2_check),
+            ('filter_throw1', self.filter_throw1_check),
+            ('filter_throw2', self.filter_throw2_check),
+            ('diy_trigger', self.diy_trigger_check),
+            ('pet_build', self.pet_build_check),
+            ('item_disassemble', self.item_disassemble_check),
+            ('item_filter', self.item_filter_check),
+            ('store_items', self.store_items_check),
+        ]
+        fields_to_copy = []
+        for option, checkbox in option_checks:
+            if checkbox.isChecked():
+                fields_to_copy.extend(OPTION_FIELDS[option])
+
+        if not fields_to_copy:
             QMessageBox.warning(self, "警告", "请至少选择一个要替换的选项!")
             return
         
         source_path = self.source_option_combo.currentData()
         source_name = self.source_option_combo.currentText()
-        
-        # # 获取目标配置列表
-        # if target_path == "all":  # 所有配置
-        #     target_configs = [(path, name) for path, name in self.folders.items() 
-        #                     if path != source_path]
-        #     target_name = "所有配置"
-        # else:
-        #     if source_path == target_path:
-        #         QMessageBox.warning(self, "警告", "源配置和目标配置不能相同!")
-        #         return
-        #     target_configs = [(target_path, self.target_option_combo.currentText())]
-        #     target_name = self.target_option_combo.currentText()
-
-        # self.log_operation(f"执行: 从配置 {source_name} 复制选定选项到 {target_name}")
+        account = self.current_account
 
         # 获取选中的目标配置
         target_configs = []
@@ -2384,107 +2769,36 @@ class FolderSelectorApp(QMainWindow):
                 return
         
             target_name = ", ".join([name for path, name in target_configs])
+        target_configs, target_name = self.scope_targets(target_configs, target_name, source_path)
         
         self.log_operation(f"执行: 从配置 {source_name} 复制选定选项到 {target_name}")
         
-        current_file = ''
-        try:
-            # 读取源配置文件
-            source_file = os.path.join(source_path, "Default.save")
-            if not os.path.exists(source_file):
-                QMessageBox.warning(self, "警告", f"源配置 {source_name} 中没有找到Default.save文件!")
-                self.log_operation(f"错误: {source_name} 中没有Default.save文件")
-                return
-            
-            # 使用新的读取方法处理编码问题
-            source_data = self.read_default_save(source_file)
-            self.encoding_source = self.encoding_backup
-            
-            # 确定要复制的字段
-            fields_to_copy = []
-            if self.item_use_check.isChecked():
-                fields_to_copy.append(("item_use_data", "吃药"))
-            if self.item_buff_check.isChecked():
-                fields_to_copy.append(("item_buff_data", "buff药"))
-            if self.skill_buff_check.isChecked():
-                fields_to_copy.append(("skill_buff_data", "buff技能"))
-            if self.filter_pick1_check.isChecked():
-                fields_to_copy.append(("item_filter_pick_data_1", "额外模糊拾取"))
-            if self.filter_pick2_check.isChecked():
-                fields_to_copy.append(("item_filter_pick_data_2", "额外模糊过滤"))
-            if self.filter_throw1_check.isChecked():
-                fields_to_copy.append(("item_filter_throw_data_1", "额外模糊丢弃"))
-            if self.filter_throw2_check.isChecked():
-                fields_to_copy.append(("item_filter_throw_data_2", "额外模糊保留"))
-            if self.diy_trigger_check.isChecked():
-                fields_to_copy.append(("diytrigger", "DIY指令"))
-            if self.pet_build_check.isChecked():
-                fields_to_copy.append(("pet_build", "智能联合宠物技能"))
-            if self.item_disassemble_check.isChecked():
-                fields_to_copy.append(("item_filter_disassemble", "物品分解"))
-            if self.item_filter_check.isChecked():
-                fields_to_copy.append(("item_filter_1", "物品设置1"))
-                fields_to_copy.append(("item_filter_2", "物品设置2"))
-                fields_to_copy.append(("item_filter_3", "物品设置3"))
-                fields_to_copy.append(("item_filter_4", "物品设置4"))
-            if self.store_items_check.isChecked():
-                fields_to_copy.append(("store_items", "存取材料"))
-
-            # 处理每个目标配置
-            updated_count = 0
-            for target_path, target_name in target_configs:
-                target_file = os.path.join(target_path, file_name)
-                if config_name:
-                    default_target_file = os.path.join(target_path, "Default.save")
-
-                if not os.path.exists(target_file):
-                    self.log_operation(f"跳过: {target_name} 没有 {file_name} 文件")
-                    continue
-                
-                # 读取目标文件
-                target_data = self.read_default_save(target_file)
-                self.encoding_format = self.encoding_backup
-                
-                # 备份原文件
-                if self.backup_checkbox.isChecked():
-                    current_file = target_file
-                    self.backup_file(target_file)
-                    if config_name:
-                        self.backup_file(default_target_file)
-                
-                # 替换选定字段
-                updated = False
-                for field, field_name in fields_to_copy:
-                    if field in source_data:
-                        target_data[field] = source_data[field]
-                        self.log_operation(f"已更新: {target_name} 的 {field_name} 配置")
-                        updated = True
-                
-                if updated:
-                    # 写入更新后的文件
-                    self.write_default_save(target_file, target_data)
-                    if config_name:
-                        shutil.copy2(target_file, default_target_file)
-                    updated_count += 1
-            
-            QMessageBox.information(
-                self, "完成", 
-                f"已成功更新 {updated_count}/{len(target_configs)} 个配置的选定选项"
+        def finish(results):
+            updated_count = sum(1 for r in results if r.status == STATUS_UPDATED)
+            skipped_fields = sum(r.skip_count for r in results)
+            self.report_results(
+                results,
+                f"已成功更新 {updated_count}/{len(target_configs)} 个配置的选定选项\n"
+                f"{skipped_fields} 个选项与源配置相同，未改写"
             )
 
-            if config_name:
-                self.function4_config_name = config_name
-                self.save_config()
-            
-        except json.JSONDecodeError:
-            self.log_operation("错误: 配置文件不是有效的JSON格式")
-            QMessageBox.critical(self, "错误", "配置文件格式错误，不是有效的JSON")
-        except Exception as e:
-            self.log_operation(f"替换失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"替换配置选项失败: {str(e)}")
-            shutil.copy2(current_file + '.bak', current_file)
-            if config_name:
-                shutil.copy2(default_target_file + '.bak', default_target_file)
+            if config_name and account in self.accounts:
+                self.accounts[account]["function4_config_name"] = config_name
+                if account == self.current_account:
+                    self.function4_config_name = config_name
+                self.save_config('set_function4_config_name', account, config_name)
+
+        if not os.path.exists(os.path.join(source_path, "Default.save")):
+            QMessageBox.warning(self, "警告", f"源配置 {source_name} 中没有找到Default.save文件!")
+            self.log_operation(f"错误: {source_name} 中没有Default.save文件")
+            return None
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.copy_options(
+                source_path, target_configs, fields_to_copy, config_name, backup=backup, **kwargs),
+            finish,
+        )
     
     def execute_function5(self):
         """功能5: 更改难度"""
@@ -2496,9 +2810,9 @@ class FolderSelectorApp(QMainWindow):
             QMessageBox.warning(self, "警告", "请先刷新Lua文件列表!")
             return
             
-        selected_lua_item = self.lua_list_widget.currentItem()
-        if not selected_lua_item:
-            QMessageBox.warning(self, "警告", "请选择一个Lua文件!")
+        selected_lua_items = self.lua_list_widget.selectedItems()
+        if not selected_lua_items:
+            QMessageBox.warning(self, "警告", "请至少选择一个Lua文件!")
             return
             
         selected_difficulty = self.difficulty_combo.currentText()
@@ -2511,58 +2825,32 @@ class FolderSelectorApp(QMainWindow):
             QMessageBox.warning(self, "警告", "请选择探索设置!")
             return
             
-        target_path = self.target_difficulty_combo.currentData()
-        target_name = self.target_difficulty_combo.currentText()
-        lua_file = selected_lua_item.data(Qt.UserRole)
+        # 目标配置加上批量选择的配置（去重）
+        target_configs = [(self.target_difficulty_combo.currentData(), self.target_difficulty_combo.currentText())]
+        for path, name in zip(self.bulk_difficulty_combo.checkedData(), self.bulk_difficulty_combo.checkedItems()):
+            if path != target_configs[0][0]:
+                target_configs.append((path, name))
+        target_configs, target_names = self.scope_targets(
+            target_configs, ", ".join(name for _, name in target_configs))
+        lua_files = [item.data(Qt.UserRole) for item in selected_lua_items]
+        lua_names = ", ".join(lua_files)
         
-        self.log_operation(f"执行: 在配置 {target_name} 中读取Lua文件 {lua_file} 的难度并更改为 {selected_difficulty}，探索设置为 {selected_explore}")
+        self.log_operation(f"执行: 在配置 {target_names} 中将Lua文件 {lua_names} 的难度更改为 {selected_difficulty}，探索设置为 {selected_explore}")
         
-        try:
-            lua_file_path = os.path.join(target_path, lua_file)
-            
-            if not os.path.exists(lua_file_path):
-                QMessageBox.warning(self, "警告", f"Lua文件 {lua_file} 不存在!")
-                return
-            
-            # 备份原文件
-            if self.backup_checkbox.isChecked():
-                self.backup_file(lua_file_path, f"已备份Lua文件: {lua_file}")
-            
-            # 读取Lua文件内容
-            with open(lua_file_path, 'r', encoding='gbk', errors='ignore') as f:
-                lua_content = f.read()
-            
-            # 查找并替换难度设置
-            import re
-            
-            # 查找类似 副本难度=困难 的模式
-            pattern = r'(副本难度\s*=\s*)[^\n\r]+'
-            new_content = re.sub(pattern, f'\\g<1>{selected_difficulty}', lua_content)
-            
-            # 查找并替换探索设置
-            explore_pattern = r'(探索副本\s*=\s*)[^(\n\r)]+'
-            explore_value = "开启" if selected_explore == "开启" else "关闭"
-            new_content = re.sub(explore_pattern, f'\\g<1>{explore_value}', new_content)
-            
-            # 如果没找到探索设置，尝试添加探索设置
-            if not re.search(r'探索副本\s*=', new_content):
-                # 在难度设置后面添加探索设置
-                difficulty_pattern = r'(副本难度\s*=\s*[^\n\r]+)'
-                if re.search(difficulty_pattern, new_content):
-                    new_content = re.sub(difficulty_pattern, f'\\g<1>\n探索副本={explore_value}', new_content)
-            #     else:
-            #         # 如果连难度设置都没找到，在文件开头添加
-            #         new_content = f"探索副本={explore_value}\\n" + new_content
-            
-            # 写入更新后的文件
-            with open(lua_file_path, 'w', encoding='gbk') as f:
-                f.write(new_content)
-            
-            QMessageBox.information(self, "成功", f"已将 {lua_file} 的难度设置为 {selected_difficulty}，探索设置为 {selected_explore}")
-            self.log_operation(f"成功: 已更新 {lua_file} 的难度和探索设置")            
-        except Exception as e:
-            self.log_operation(f"更改难度失败: {str(e)}")
-            QMessageBox.critical(self, "错误", f"更改难度失败: {str(e)}")
+        def finish(results):
+            total_updated = sum(r.count for r in results)
+            self.report_results(
+                results,
+                f"已在 {len(target_configs)} 个配置中更新 {total_updated} 个Lua文件\n"
+                f"难度: {selected_difficulty}，探索设置: {selected_explore}"
+            )
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.set_lua_difficulty(
+                target_configs, lua_files, selected_difficulty, selected_explore, backup=backup, **kwargs),
+            finish,
+        )
     
     def execute_function6(self):
         """功能6: 同步Lua文件"""
@@ -2588,81 +2876,312 @@ class FolderSelectorApp(QMainWindow):
         source_name = self.source_sync_combo.currentText()
         
         # 获取选中的目标配置列表
-        target_paths = selected_target_data
-        target_names = self.target_sync_combo.checkedItems()
+        target_configs, _ = self.scope_targets(
+            zip(selected_target_data, self.target_sync_combo.checkedItems()), "", source_path)
         
         # 获取选中的Lua文件列表
         lua_files = [item.data(Qt.UserRole) for item in selected_lua_items]
         
-        self.log_operation(f"执行: 从配置 {source_name} 同步 {len(lua_files)} 个Lua文件到 {len(target_paths)} 个目标配置")
-        
-        total_success_count = 0
-        total_error_count = 0
-        
-        for i, target_path in enumerate(target_paths):
-            target_name = target_names[i]
-            self.log_operation(f"正在同步到配置: {target_name}")
-            
-            success_count = 0
-            error_count = 0
-            
-            for lua_file in lua_files:
-                try:
-                    source_file_path = os.path.join(source_path, lua_file)
-                    target_file_path = os.path.join(target_path, lua_file)
-                    
-                    if not os.path.exists(source_file_path):
-                        self.log_operation(f"错误: 源文件 {lua_file} 不存在")
-                        error_count += 1
-                        continue
-                    
-                    # 备份目标文件
-                    if self.backup_checkbox.isChecked() and os.path.exists(target_file_path):
-                        self.backup_file(target_file_path, f"已备份目标文件: {lua_file}")
-                    
-                    # 复制文件
-                    shutil.copy2(source_file_path, target_file_path)
-                    
-                    self.log_operation(f"成功: 已同步 {lua_file} 到 {target_name}")
-                    success_count += 1
-                    
-                except Exception as e:
-                    self.log_operation(f"错误: 同步 {lua_file} 到 {target_name} 失败: {str(e)}")
-                    error_count += 1
-            
-            total_success_count += success_count
-            total_error_count += error_count
-            
-            if error_count == 0:
-                self.log_operation(f"完成: 已成功同步 {success_count} 个Lua文件到配置 {target_name}")
-            else:
-                self.log_operation(f"完成: 同步到 {target_name}: {success_count} 个成功, {error_count} 个失败")
+        self.log_operation(f"执行: 从配置 {source_name} 同步 {len(lua_files)} 个Lua文件到 {len(target_configs)} 个目标配置")
         
-        # 显示总体结果
-        if total_error_count == 0:
-            QMessageBox.information(self, "成功", f"已成功同步 {total_success_count} 个Lua文件到 {len(target_paths)} 个目标配置")
-        else:
-            QMessageBox.warning(self, "完成", f"同步完成: {total_success_count} 个成功, {total_error_count} 个失败")
+        def finish(results):
+            total_success_count = sum(r.count for r in results)
+            total_skipped_count = sum(r.skip_count for r in results)
+            total_error_count = sum(r.error_count for r in results)
+            self.report_results(
+                results,
+                f"同步完成: {total_success_count} 个复制, {total_skipped_count} 个内容已相同跳过, "
+                f"{total_error_count} 个失败"
+            )
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.sync_lua_files(source_path, target_configs, lua_files, backup=backup, **kwargs),
+            finish,
+        )
     
-    def backup_file(self, target_file, message=None):
-        """备份文件"""
-        backup_file = target_file + ".bak"
-        shutil.copy2(target_file, backup_file)
-        if message:
+    def execute_function7(self):
+        """功能7: 同步diy.suit中的装备/超越/其他/觉醒配置"""
+        if self.source_suit_combo.currentIndex() == -1:
+            QMessageBox.warning(self, "警告", "请选择源配置!")
+            return
+
+        sections = [label for label, checkbox in self.suit_section_checks.items() if checkbox.isChecked()]
+        if not sections:
+            QMessageBox.warning(self, "警告", "请至少选择一项同步内容!")
+            return
+
+        source_path = self.source_suit_combo.currentData()
+        source_name = self.source_suit_combo.currentText()
+        target_configs, target_name = self.scope_targets(
+            zip(self.target_suit_combo.checkedData(), self.target_suit_combo.checkedItems()),
+            ", ".join(self.target_suit_combo.checkedItems()), source_path)
+        if not target_configs:
+            QMessageBox.warning(self, "警告", "请至少选择一个目标配置!")
+            return
+
+        suit_names = [name.strip() for name in self.suit_names_input.text().replace('，', ',').split(',')
+                      if name.strip()]
+        self.log_operation(f"执行: 从配置 {source_name} 同步diy.suit的 {', '.join(sections)} 到 {target_name}")
+
+        def finish(results):
+            updated_count = sum(1 for r in results if r.status == STATUS_UPDATED)
+            skipped_count = sum(r.skip_count for r in results)
+            self.report_results(
+                results,
+                f"已同步到 {updated_count}/{len(target_configs)} 个配置\n"
+                f"{skipped_count} 项内容与源配置相同，未改写"
+            )
+
+        backup = self.backup_checkbox.isChecked()
+        return self.run_engine(
+            lambda engine, **kwargs: engine.sync_suit_sections(
+                source_path, target_configs, sections, suit_names, backup=backup, **kwargs),
+            finish,
+        )
+
+    def run_engine(self, call, on_done):
+        """执行一次引擎操作
+
+        放到线程池中执行，界面保持响应，完成后在界面线程中调用 on_done(results)。
+        预览模式下同样在线程池中执行，但只计算变更集，完成后把结果交给预览回调。
+        """
+        if self.dry_run:
+            on_changes = self.preview_callback
+            return self.start_job(lambda **kwargs: call(self.engine, **kwargs),
+                                  lambda results: self.finish_preview(results, on_changes), dry_run=True)
+        if self.batch_checkbox.isChecked():
+            description = self.function_combo.currentText()
+            self.operation_queue.add(call, description)
+            self.log_operation(f"已加入队列: {description}（共 {len(self.operation_queue)} 项）")
+            self.update_queue_buttons()
+            return None
+        return self.start_job(lambda **kwargs: call(self.engine, **kwargs), on_done)
+
+    def start_job(self, call, on_done, dry_run=False):
+        """在线程池中执行 call(progress=..., cancel=..., dry_run=dry_run)，完成后调用 on_done(results)"""
+        if self.current_job is not None:
+            QMessageBox.warning(self, "警告", "已有操作正在执行，请等待完成或取消后再试!")
+            return None
+
+        job = EngineJob(call, dry_run)
+        job.signals.target_done.connect(self.on_target_done)
+        job.signals.finished.connect(self.on_job_finished)
+        job.signals.error.connect(self.on_job_error)
+        self.current_job = job
+        self.job_done_callback = on_done
+        self.set_busy(True)
+        if dry_run:
+            self.summary_label.setText("正在预览...")
+        QThreadPool.globalInstance().start(job)
+        return None
+
+    def set_busy(self, busy):
+        """执行期间禁用执行按钮，启用取消按钮"""
+        self.execute_button.setEnabled(not busy)
+        self.preview_button.setEnabled(not busy)
+        self.restore_button.setEnabled(not busy)
+        self.undo_button.setEnabled(not busy)
+        self.redo_button.setEnabled(not busy)
+        self.update_queue_buttons(busy)
+        self.cancel_button.setEnabled(busy)
+        if busy:
+            self.progress_bar.setRange(0, 0)  # 第一个目标完成前显示忙碌状态
+            self.summary_label.setStyleSheet("color: #666;")
+            self.summary_label.setText("正在执行...")
+
+    def cancel_job(self):
+        """请求取消当前操作：尚未开始的目标不再执行，已暂存的修改全部放弃"""
+        if self.current_job is not None:
+            self.current_job.cancel_event.set()
+            self.cancel_button.setEnabled(False)
+            self.log_operation("正在取消操作...")
+
+    def on_job_finished(self, results):
+        callback = self.job_done_callback
+        self.current_job = None
+        self.job_done_callback = None
+        self.set_busy(False)
+        self.progress_bar.setRange(0, max(len(results), 1))
+        self.progress_bar.setValue(len(results))
+        if any(r.status == STATUS_CANCELLED for r in results):
+            self.show_summary("操作已取消，所有目标均未修改", error=True)
+            if len(self.operation_queue):
+                self.log_operation(f"队列中仍有 {len(self.operation_queue)} 项操作")
+            return
+        callback(results)
+
+    def on_job_error(self, message):
+        self.current_job = None
+        self.job_done_callback = None
+        self.set_busy(False)
+        self.progress_bar.setRange(0, 1)
+        self.progress_bar.setValue(0)
+        self.log_operation(f"执行过程中出错: {message}")
+        self.show_summary(f"执行过程中出错: {message}", error=True)
+
+    def on_target_done(self, result, done, total):
+        """引擎完成一个目标后回调：输出该目标的日志并更新进度"""
+        if self.current_job is not None and self.current_job.dry_run:
+            # 预览时的日志描述的是假设执行的结果，只更新进度，完成后输出变更集
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+            return
+        for message in result.messages:
             self.log_operation(message)
+        self.log_operation(f"进度: {done}/{total}")
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+
+    def show_summary(self, text, error=False):
+        """在结果面板中显示汇总信息"""
+        self.summary_label.setStyleSheet("color: #dc3545;" if error else "color: #28a745;")
+        self.summary_label.setText(text)
+
+    def report_results(self, results, summary):
+        """汇总显示引擎返回的结果"""
+        failed = [r for r in results if r.status == STATUS_FAILED]
+        for result in failed:
+            if result.error:
+                self.log_operation(result.error)
+        invalid = [r for r in results if r.status == STATUS_INVALID]
+        if invalid:
+            names = ", ".join(r.name for r in invalid)
+            summary = f"{summary}\n{len(invalid)} 个配置格式无效，已跳过: {names}"
+        if failed:
+            names = ", ".join(r.name for r in failed)
+            self.show_summary(f"{summary}\n{len(failed)} 个配置处理失败: {names}", error=True)
         else:
-            self.log_operation(f"已备份文件: {backup_file}")
+            self.show_summary(summary, error=bool(invalid))
+        self.log_operation(f"完成: {summary}")
+
+        # 记录到操作历史：涉及多个账号时，每个账号各记一条（只统计该账号的配置）
+        accounts = {account: info.get("configurations", {}) for account, info in self.accounts.items()}
+        grouped = results_by_account(results, accounts, self.current_account) or {self.current_account: []}
+        for account, account_results in grouped.items():
+            updated = sum(1 for r in account_results if r.status == STATUS_UPDATED)
+            failed_count = sum(1 for r in account_results if r.status == STATUS_FAILED)
+            backup_id = next((r.backup_id for r in account_results if r.backup_id), None)
+            self.save_config('record_operation', account, summary, updated, failed_count, backup_id)
+
+    def restore_backup(self):
+        """选择一次操作，把它修改过的文件恢复到操作之前"""
+        operations = self.engine.backups.list_operations()
+        if not operations:
+            QMessageBox.information(self, "信息", "还没有任何备份")
+            return
+        
+        labels = [f"{op['time']}  {op['description']}（{len(op['files'])} 个文件）" for op in operations]
+        label, ok = QInputDialog.getItem(self, "恢复备份", "选择要恢复到其之前状态的操作:", labels, 0, False)
+        if not ok:
+            return
+        operation = operations[labels.index(label)]
+        
+        reply = QMessageBox.question(
+            self, "确认",
+            f"确定要把 {len(operation['files'])} 个文件恢复到“{operation['description']}”之前的内容吗?",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if reply != QMessageBox.Yes:
+            return
+        
+        try:
+            count = self.engine.restore(operation['id'])
+        except Exception as e:
+            self.log_operation(f"恢复备份失败: {str(e)}")
+            QMessageBox.critical(self, "错误", f"恢复备份失败: {str(e)}")
+            return
+        self.log_operation(f"已恢复 {count} 个文件到操作“{operation['description']}”之前的内容")
+        QMessageBox.information(self, "完成", f"已恢复 {count} 个文件")
+
+    def update_queue_buttons(self, busy=False):
+        count = len(self.operation_queue)
+        self.run_queue_button.setText(f"执行队列 ({count})")
+        self.run_queue_button.setEnabled(bool(count) and not busy)
+        self.clear_queue_button.setEnabled(bool(count) and not busy)
+
+    def execute_queue(self):
+        """按顺序执行队列中的全部操作：每个文件只读取、备份、写入一次"""
+        descriptions = self.operation_queue.describe()
+        if not descriptions:
+            return
+        reply = QMessageBox.question(
+            self, "确认",
+            f"确定要执行队列中的 {len(descriptions)} 项操作吗?\n" + "\n".join(descriptions),
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if reply != QMessageBox.Yes:
+            return
+        self.log_operation(f"执行: 队列中的 {len(descriptions)} 项操作")
+        backup = self.backup_checkbox.isChecked()
+
+        def call(progress, cancel, dry_run):
+            outcomes = self.operation_queue.execute(backup=backup, progress=progress, cancel=cancel)
+            return [result for _, results in outcomes for result in results]
+
+        def finish(results):
+            updated_count = sum(1 for r in results if r.status == STATUS_UPDATED)
+            self.report_results(results, f"已执行 {len(descriptions)} 项操作，共 {updated_count} 处目标更新")
+            if any(r.status == STATUS_FAILED for r in results):
+                self.log_operation(f"队列中的 {len(self.operation_queue)} 项操作已保留，可修正后重新执行")
+            self.update_queue_buttons()
+
+        self.start_job(call, finish)
+
+    def clear_queue(self):
+        count = len(self.operation_queue)
+        self.operation_queue.clear()
+        self.log_operation(f"已清空队列（{count} 项操作）")
+        self.update_queue_buttons()
+
+    def step_undo_log(self, redo=False):
+        """撤销最近一次操作，或重做最近一次撤销的操作"""
+        action = "重做" if redo else "撤销"
+        operation = self.engine.undo_log.peek('redo' if redo else 'undo')
+        if operation is None:
+            QMessageBox.information(self, "信息", f"没有可{action}的操作")
+            return
+
+        reply = QMessageBox.question(
+            self, "确认",
+            f"确定要{action}“{operation['description']}”吗?（{len(operation['files'])} 个文件）",
+            QMessageBox.Yes | QMessageBox.No,
+            QMessageBox.Yes
+        )
+        if reply != QMessageBox.Yes:
+            return
+
+        try:
+            operation = self.engine.redo() if redo else self.engine.undo()
+        except Exception as e:
+            self.log_operation(f"错误: {action}失败: {str(e)}")
+            QMessageBox.critical(self, "错误", f"{action}失败: {str(e)}")
+            return
+        self.log_operation(f"已{action}“{operation['description']}”，涉及 {len(operation['files'])} 个文件")
+        self.save_config('record_operation', self.current_account, f"{action}: {operation['description']}",
+                         len(operation['files']), 0, None)
+
+    def closeEvent(self, event):
+        """关闭窗口前取消并等待正在执行的操作，避免写入中途退出"""
+        if self.current_job is not None:
+            self.current_job.cancel_event.set()
+            QThreadPool.globalInstance().waitForDone()
+        super().closeEvent(event)
 
     def log_operation(self, message):
-        """记录操作日志"""
-        current_text = self.log_label.text()
-        new_text = f"{message}\n{current_text}"
-        self.log_label.setText(new_text)
-        # 自动滚动到底部
-        self.log_label.adjustSize()
-        scroll_area = self.log_label.parent().parent()
-        if isinstance(scroll_area, QScrollArea):
-            scroll_area.verticalScrollBar().setValue(scroll_area.verticalScrollBar().maximum())
+        """记录操作日志（只写入缓冲区和日志文件，界面由 flush_log 定时刷新）"""
+        self.log_buffer.append(message)
+
+    def flush_log(self):
+        """把缓冲区中的新日志批量显示到日志视图"""
+        records = self.log_buffer.drain()
+        if not records:
+            return
+        self.log_model.prepend([record.format() for record in records])
+        # 最新的日志在最上面
+        self.log_view.scrollToTop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,353 @@
+import re
+import json
+
+from save_codec import encode_value
+
+# 字符串：普通字节 | 转义序列 | GBK/GB18030 双字节（尾字节可能是 '\\' 或 ']' 等）
+# （按“普通字节串 (转义或双字节 普通字节串)*”展开，匹配失败时不会回溯爆炸）
+_STRING = rb'"[^"\\\x81-\xfe]*(?:(?:\\.|[\x81-\xfe].)[^"\\\x81-\xfe]*)*"'
+_STRING_RE = re.compile(_STRING, re.DOTALL)
+# 容器内需要关注的记号：整个字符串或括号（字符串外不会出现高位字节），单独的引号表示字符串没有结束
+_TOKEN_RE = re.compile(_STRING + rb'|[{}\[\]"]', re.DOTALL)
+# 数字、true、false、null
+_SCALAR_RE = re.compile(rb'[^,\]}\s]+')
+_WS = b' \t\r\n'
+
+
+class JsonStyle:
+    """JSON 文本的排版风格：缩进单位、冒号分隔符、换行符"""
+    def __init__(self, indent='\t', colon=':\t', newline='\n'):
+        self.indent = indent
+        self.colon = colon
+        self.newline = newline
+
+
+def skip_ws(buf, i):
+    """跳过空白字符"""
+    n = len(buf)
+    while i < n and buf[i] in _WS:
+        i += 1
+    return i
+
+
+def scan_value(buf, i):
+    """返回从 i 开始的 JSON 值的结束位置（不包含）"""
+    c = buf[i:i + 1]
+    if c == b'"':
+        match = _STRING_RE.match(buf, i)
+        if not match:
+            raise ValueError(f"位置 {i} 的字符串没有结束")
+        return match.end()
+
+    if c in (b'{', b'['):
+        depth = 0
+        for match in _TOKEN_RE.finditer(buf, i):
+            token = buf[match.start()]
+            if token == 0x22:  # '"'
+                if match.end() - match.start() == 1:
+                    raise ValueError(f"位置 {match.start()} 的字符串没有结束")
+                continue
+            if token in (0x7b, 0x5b):  # '{' '['
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        raise ValueError(f"位置 {i} 的对象或数组没有结束")
+
+    match = _SCALAR_RE.match(buf, i)
+    if not match:
+        raise ValueError(f"位置 {i} 不是有效的 JSON 值")
+    return match.end()
+
+
+def iter_members(buf, start, encoding='gb2312'):
+    """依次产生从 start 开始的对象的成员 (键, 键开始, 值开始, 值结束)，值本身不解码"""
+    if buf[start:start + 1] != b'{':
+        raise ValueError(f"位置 {start} 不是对象")
+    i = skip_ws(buf, start + 1)
+    if buf[i:i + 1] == b'}':
+        return
+    while True:
+        key_start = i
+        key_end = scan_value(buf, i)
+        key = json.loads(buf[i:key_end].decode(encoding))
+        i = skip_ws(buf, key_end)
+        if buf[i:i + 1] != b':':
+            raise ValueError(f"位置 {i} 缺少冒号")
+        value_start = skip_ws(buf, i + 1)
+        value_end = scan_value(buf, value_start)
+        yield key, key_start, value_start, value_end
+        i = skip_ws(buf, value_end)
+        if buf[i:i + 1] == b'}':
+            return
+        if buf[i:i + 1] != b',':
+            raise ValueError(f"位置 {i} 缺少逗号")
+        i = skip_ws(buf, i + 1)
+
+
+def object_members(buf, start, encoding='gb2312'):
+    """列出从 start 开始的对象的成员，返回 {键: (值开始, 值结束)}"""
+    return {key: (value_start, value_end) for key, _, value_start, value_end in iter_members(buf, start, encoding)}
+
+
+def _indexed_member_spans(buf, keys, encoding):
+    """按排版直接定位顶层成员：每个顶层键单独一行、缩进为一级
+
+    用字节查找定位 "换行 + 一级缩进 + 键 + 冒号"，只对找到的值做括号匹配。
+    排版不符合预期（同一行、多处匹配、键出现但不在预期位置）时返回 None。
+    """
+    root = skip_ws(buf, 0)
+    if buf[root:root + 1] != b'{':
+        return None
+    first = skip_ws(buf, root + 1)
+    if buf[first:first + 1] != b'"' or buf.rfind(b'\n', root, first) == -1:
+        return None
+    indent = buf[buf.rfind(b'\n', root, first) + 1:first]
+    if not indent:
+        return None
+
+    spans = {}
+    for key in keys:
+        quoted = encode_value(json.dumps(key, ensure_ascii=False), encoding)
+        matches = list(re.finditer(b'\n' + re.escape(indent + quoted) + rb'[ \t]*:', buf))
+        if not matches:
+            if quoted in buf:
+                return None
+            continue  # 文件中没有这个键
+        if len(matches) > 1:
+            return None
+        value_start = skip_ws(buf, matches[0].end())
+        value_end = scan_value(buf, value_start)
+        after = skip_ws(buf, value_end)
+        if buf[after:after + 1] not in (b',', b'}'):
+            return None
+        spans[key] = (value_start, value_end)
+    return spans
+
+
+def member_spans(buf, keys, encoding='gb2312'):
+    """只定位顶层对象中 keys 对应的成员，返回 {键: (值开始, 值结束)}
+
+    只对找到的值做括号匹配，其余成员既不解码也不解析。游戏写出的排版下
+    直接按行定位，开销只与所选成员的大小有关；否则逐个成员跳过，全部找到后提前结束。
+    """
+    spans = _indexed_member_spans(buf, keys, encoding)
+    if spans is not None:
+        return spans
+    wanted = set(keys)
+    spans = {}
+    for key, _, value_start, value_end in iter_members(buf, skip_ws(buf, 0), encoding):
+        if key in wanted and key not in spans:
+            spans[key] = (value_start, value_end)
+            if len(spans) == len(wanted):
+                break
+    return spans
+
+
+def array_elements(buf, start):
+    """列出从 start 开始的数组的元素，返回 [(开始, 结束)]"""
+    if buf[start:start + 1] != b'[':
+        raise ValueError(f"位置 {start} 不是数组")
+    elements = []
+    i = skip_ws(buf, start + 1)
+    if buf[i:i + 1] == b']':
+        return elements
+    while True:
+        end = scan_value(buf, i)
+        elements.append((i, end))
+        i = skip_ws(buf, end)
+        if buf[i:i + 1] == b']':
+            return elements
+        if buf[i:i + 1] != b',':
+            raise ValueError(f"位置 {i} 缺少逗号")
+        i = skip_ws(buf, i + 1)
+
+
+def find_span(buf, path, start=None, encoding='gb2312'):
+    """按路径（键或下标）查找值的字节范围，返回 (开始, 结束)"""
+    pos = skip_ws(buf, 0) if start is None else start
+    end = scan_value(buf, pos)
+    for key in path:
+        if isinstance(key, int):
+            elements = array_elements(buf, pos)
+            if key >= len(elements):
+                raise KeyError(key)
+            pos, end = elements[key]
+        else:
+            pos, end = object_members(buf, pos, encoding)[key]
+    return pos, end
+
+
+def line_indent(buf, pos):
+    """返回 pos 所在行的行首缩进"""
+    line_start = buf.rfind(b'\n', 0, pos) + 1
+    i = line_start
+    while i < pos and buf[i] in b' \t':
+        i += 1
+    return buf[line_start:i].decode('ascii')
+
+
+def detect_style(buf):
+    """从原文件中识别缩进、冒号分隔符和换行符"""
+    style = JsonStyle(indent=None, colon=':', newline='\n')
+    start = skip_ws(buf, 0)
+    newline_pos = buf.find(b'\n', start)
+    if newline_pos != -1:
+        style.newline = '\r\n' if buf[newline_pos - 1:newline_pos] == b'\r' else '\n'
+        i = newline_pos + 1
+        while i < len(buf) and buf[i] in b' \t':
+            i += 1
+        style.indent = buf[newline_pos + 1:i].decode('ascii') or None
+
+    # 取第一个键后面的分隔符
+    if buf[start:start + 1] == b'{':
+        key_start = skip_ws(buf, start + 1)
+        if buf[key_start:key_start + 1] == b'"':
+            key_end = scan_value(buf, key_start)
+            value_start = skip_ws(buf, skip_ws(buf, key_end) + 1)
+            style.colon = buf[key_end:value_start].decode('ascii')
+    return style
+
+
+def dumps_value(value, style, base_indent='', encoding='gb2312'):
+    """按原文件风格序列化一个值，续行前加上 base_indent"""
+    if style.indent is None:
+        text = json.dumps(value, ensure_ascii=False, separators=(',', style.colon))
+    else:
+        text = json.dumps(value, ensure_ascii=False, indent=style.indent, separators=(',', style.colon))
+        text = text.replace('\n', style.newline + base_indent)
+    return encode_value(text, encoding)
+
+
+def append_members(buf, members, style, encoding='gb2312'):
+    """在顶层对象末尾追加 {键: 值}，返回补丁 (开始, 结束, 新字节)"""
+    root = skip_ws(buf, 0)
+    spans = object_members(buf, root, encoding)
+    if not spans:
+        end = scan_value(buf, root)
+        return (root, end, dumps_value(members, style, '', encoding))
+    last_start, last_end = max(spans.values(), key=lambda span: span[1])
+    indent = line_indent(buf, last_start)
+    parts = []
+    for key, value in members.items():
+        parts.append(b',' + (style.newline + indent).encode('ascii'))
+        parts.append(encode_value(json.dumps(key, ensure_ascii=False), encoding) + style.colon.encode('ascii'))
+        parts.append(dumps_value(value, style, indent, encoding))
+    return (last_end, last_end, b''.join(parts))
+
+
+def _same(a, b):
+    """两个 JSON 值是否完全相同（区分 1、1.0 和 true）"""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(map(_same, a, b))
+    return a == b
+
+
+def _separator(buf, container_start, spans, style):
+    """同一容器中两个相邻条目之间的分隔字节（逗号及其后的空白）"""
+    if len(spans) > 1:
+        return buf[spans[0][1]:spans[1][0]]
+    first = spans[0][0]
+    if b'\n' in buf[container_start:first]:
+        return b',' + (style.newline + line_indent(buf, first)).encode('ascii')
+    return b','
+
+
+def _removals(spans, removed):
+    """删除 spans 中下标在 removed 内的条目（连同分隔符），返回补丁；spans 为 [(条目开始, 值结束)]"""
+    patches = []
+    i = 0
+    while i < len(spans):
+        if i not in removed:
+            i += 1
+            continue
+        j = i
+        while j + 1 < len(spans) and j + 1 in removed:
+            j += 1
+        if i > 0:
+            patches.append((spans[i - 1][1], spans[j][1], b''))
+        else:
+            patches.append((spans[0][0], spans[j + 1][0], b''))
+        i = j + 1
+    return patches
+
+
+def _diff(buf, start, end, old, new, style, encoding, patches):
+    if _same(old, new):
+        return
+    base_indent = line_indent(buf, start)
+
+    if isinstance(old, dict) and isinstance(new, dict) and old and new:
+        members = list(iter_members(buf, start, encoding))
+        if len(members) == len(old) and any(key in new for key in old):
+            spans = [(key_start, value_end) for _, key_start, _, value_end in members]
+            removed = set()
+            for index, (key, _, value_start, value_end) in enumerate(members):
+                if key in new:
+                    _diff(buf, value_start, value_end, old[key], new[key], style, encoding, patches)
+                else:
+                    removed.add(index)
+            patches.extend(_removals(spans, removed))
+            added = [key for key in new if key not in old]
+            if added:
+                _, key_start, value_start, _ = members[0]
+                colon = buf[scan_value(buf, key_start):value_start]
+                separator = _separator(buf, start, spans, style)
+                indent = line_indent(buf, key_start)
+                data = b''.join(separator + encode_value(json.dumps(key, ensure_ascii=False), encoding) + colon
+                                + dumps_value(new[key], style, indent, encoding) for key in added)
+                patches.append((spans[-1][1], spans[-1][1], data))
+            return
+
+    if isinstance(old, list) and isinstance(new, list) and old and new:
+        elements = array_elements(buf, start)
+        if len(elements) == len(old):
+            count = min(len(old), len(new))
+            for index in range(count):
+                _diff(buf, elements[index][0], elements[index][1], old[index], new[index], style, encoding, patches)
+            if len(new) > count:
+                separator = _separator(buf, start, elements, style)
+                indent = line_indent(buf, elements[0][0])
+                data = b''.join(separator + dumps_value(value, style, indent, encoding) for value in new[count:])
+                patches.append((elements[-1][1], elements[-1][1], data))
+            elif len(old) > count:
+                patches.append((elements[count - 1][1], elements[-1][1], b''))
+            return
+
+    patches.append((start, end, dumps_value(new, style, base_indent, encoding)))
+
+
+def diff_patches(buf, start, end, old, new, style, encoding='gb2312'):
+    """返回把 buf[start:end]（解析结果为 old）改写为 new 的补丁列表，内容相同时为空
+
+    完全相同的子树保留原字节；对象按原有键顺序逐个成员比较，新键追加在末尾，
+    删除的键连同分隔符一起去掉；数组逐个元素比较，多出的元素追加、缺少的从末尾删除；
+    其余情况按原文件风格重新序列化该值。
+    """
+    patches = []
+    _diff(buf, start, end, old, new, style, encoding, patches)
+    return patches
+
+
+def dumps_preserving(buf, old, new, encoding='gb2312'):
+    """按原文件的键顺序、缩进和换行符写出 new，未改动的部分与 buf 逐字节相同"""
+    start = skip_ws(buf, 0)
+    end = scan_value(buf, start)
+    return apply_patches(buf, diff_patches(buf, start, end, old, new, detect_style(buf), encoding))
+
+
+def apply_patches(buf, patches):
+    """在内存中应用 [(开始, 结束, 新字节)] 补丁"""
+    parts = []
+    pos = 0
+    for start, end, data in sorted(patches, key=lambda p: p[0]):
+        parts.append(buf[pos:start])
+        parts.append(data)
+        pos = end
+    parts.append(buf[pos:])
+    return b''.join(parts)
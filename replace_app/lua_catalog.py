@@ -0,0 +1,72 @@
+import os
+import threading
+
+
+def _folder_key(folder):
+    return os.path.normcase(os.path.abspath(folder))
+
+
+def same_folder(a, b):
+    """两个路径是否指向同一目录"""
+    return bool(a) and bool(b) and _folder_key(a) == _folder_key(b)
+
+
+def scan_lua_files(folder):
+    """列出目录下的全部 .lua 文件名（一次 scandir，不逐个 stat）"""
+    with os.scandir(folder) as entries:
+        return [entry.name for entry in entries
+                if entry.name.endswith('.lua') and entry.is_file()]
+
+
+def catalog_entries(lua_files, filename_mapping):
+    """排序并生成显示名称，返回 [(文件名, 显示名称)]
+
+    有映射关系的文件排在前面，没有映射关系的文件排在后面，分别按文件名排序。
+    """
+    mapped_files = []
+    unmapped_files = []
+    for lua_file in lua_files:
+        if lua_file[:-len('.lua')] in filename_mapping:
+            mapped_files.append(lua_file)
+        else:
+            unmapped_files.append(lua_file)
+
+    entries = []
+    for lua_file in sorted(mapped_files) + sorted(unmapped_files):
+        # 使用映射关系解码文件名
+        stem = lua_file[:-len('.lua')]
+        decoded_name = filename_mapping.get(stem)
+        entries.append((lua_file, f"{decoded_name} ({lua_file})" if decoded_name else lua_file))
+    return entries
+
+
+class LuaCatalog:
+    """按配置目录缓存的 .lua 文件目录
+
+    第一次访问某个目录时扫描一次，之后直接返回缓存；目录内容变化时
+    由调用方（文件系统监视）调用 invalidate 使其失效。
+    """
+    def __init__(self, filename_mapping):
+        self.filename_mapping = filename_mapping
+        self._entries = {}  # {目录: [(文件名, 显示名称)]}
+        self._lock = threading.Lock()
+
+    def entries(self, folder):
+        """返回目录下的 [(文件名, 显示名称)]，目录不存在时抛出 OSError"""
+        key = _folder_key(folder)
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached is not None:
+            return cached
+        entries = catalog_entries(scan_lua_files(folder), self.filename_mapping)
+        with self._lock:
+            self._entries[key] = entries
+        return entries
+
+    def invalidate(self, folder=None):
+        """使指定目录（不指定则全部）的缓存失效"""
+        with self._lock:
+            if folder is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(_folder_key(folder), None)
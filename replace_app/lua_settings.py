@@ -0,0 +1,207 @@
+import os
+import re
+
+from save_codec import decode_text, encode_text
+
+# 副本 Lua 设置文件中的键
+KEY_DIFFICULTY = '副本难度'
+KEY_EXPLORE = '探索副本'
+
+_TOKEN_RE = re.compile(r'''
+    (?P<comment>--\[(?P<level>=*)\[.*?\](?P=level)\]|--[^\r\n]*)
+  | (?P<string>"(?:[^"\\\r\n]|\\.)*"|'(?:[^'\\\r\n]|\\.)*')
+  | (?P<newline>\r\n|\r|\n)
+  | (?P<space>[ \t\f\v]+)
+  | (?P<word>[^\s,;(){}\[\]="'-]+)
+  | (?P<assign>=(?!=))
+  | (?P<other>==|.)
+''', re.VERBOSE | re.DOTALL)
+
+
+class Token:
+    """词法单元：类型、文本和在原文中的位置"""
+    def __init__(self, kind, text, start):
+        self.kind = kind
+        self.text = text
+        self.start = start
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+
+class Assignment:
+    """一条顶层赋值语句 `键 = 值`，记录值在原文中的范围"""
+    def __init__(self, key, value, start, end, quote, line_end):
+        self.key = key
+        self.value = value  # 去掉引号后的值
+        self.start = start  # 值（含引号）的开始位置
+        self.end = end
+        self.quote = quote  # 原值使用的引号，没有则为空
+        self.line_end = line_end  # 该行换行符之前的位置
+
+
+def tokenize(text):
+    """把 Lua 文本切分为 Token 列表（覆盖全部字符，拼接后与原文相同）"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        kind = match.lastgroup
+        if kind == 'level':
+            kind = 'comment'
+        tokens.append(Token(kind, match.group(), match.start()))
+    return tokens
+
+
+def _parse_value(tokens, i):
+    """解析从 i 开始的值，返回 (值, 开始, 结束, 引号, 下一个位置)"""
+    token = tokens[i]
+    if token.kind == 'string':
+        return token.text[1:-1], token.start, token.end, token.text[0], i + 1
+    start = i
+    if token.kind == 'other' and token.text == '-' and i + 1 < len(tokens) and tokens[i + 1].kind == 'word':
+        i += 1  # 负数
+    if tokens[i].kind != 'word':
+        return None
+    return ''.join(t.text for t in tokens[start:i + 1]), tokens[start].start, tokens[i].end, '', i + 1
+
+
+def _starts_statement(prev):
+    """prev（上一个有意义的词法单元）之后的名称是否开始一条新语句
+
+    Lua 中表达式之后紧跟的名称总是新语句的开始，如 `a=1 副本难度=5`、`local 副本难度 = 3`；
+    `,` `{` 之后是多重赋值或表构造中的字段，`for` 之后是循环变量，都不算设置项。
+    """
+    if prev is None:
+        return True
+    if prev.kind == 'word':
+        return prev.text != 'for'
+    return prev.kind == 'string' or prev.text in (';', ')', ']', '}')
+
+
+def parse(text):
+    """解析顶层赋值语句，返回 {键: Assignment}（同名键以第一次出现为准）
+
+    键可以位于行首、`;` 或其他语句之后，也可以带 `local`；括号内的内容不算顶层。
+    """
+    tokens = tokenize(text)
+    settings = {}
+    i = 0
+    n = len(tokens)
+    depth = 0  # 括号嵌套层数
+    prev = None
+    while i < n:
+        token = tokens[i]
+        if token.kind in ('newline', 'space', 'comment'):
+            i += 1
+            continue
+        if token.kind == 'other':
+            if token.text in '({[':
+                depth += 1
+            elif token.text in ')}]':
+                depth = max(depth - 1, 0)
+        if token.kind != 'word' or depth or not _starts_statement(prev):
+            prev = token
+            i += 1
+            continue
+
+        # 键 [空白] = [空白] 值
+        j = i + 1
+        while j < n and tokens[j].kind in ('space', 'newline'):
+            j += 1
+        if j >= n or tokens[j].kind != 'assign':
+            prev = token
+            i += 1
+            continue
+        j += 1
+        while j < n and tokens[j].kind in ('space', 'newline'):
+            j += 1
+        value = _parse_value(tokens, j) if j < n else None
+        if value is None:
+            prev = tokens[j - 1]
+            i = j
+            continue
+        value, start, end, quote, j = value
+        line_end = j
+        while line_end < n and tokens[line_end].kind != 'newline':
+            line_end += 1
+        line_end = tokens[line_end].start if line_end < n else len(text)
+        settings.setdefault(token.text, Assignment(token.text, value, start, end, quote, line_end))
+        prev = tokens[j - 1]
+        i = j
+    return settings
+
+
+def detect_newline(text):
+    """识别文件使用的换行符，没有换行时使用系统默认值"""
+    match = re.search(r'\r\n|\r|\n', text)
+    return match.group() if match else os.linesep
+
+
+class LuaSettings:
+    """副本 Lua 设置文件：一次解析，按键读取或批量修改，未修改的内容保持原样"""
+    def __init__(self, text, encoding='gb2312'):
+        self.text = text
+        self.encoding = encoding
+        self.settings = parse(text)
+
+    @classmethod
+    def from_bytes(cls, raw):
+        text, encoding = decode_text(raw)
+        return cls(text, encoding)
+
+    @classmethod
+    def load(cls, file_path):
+        with open(file_path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def get(self, key, default=None):
+        assignment = self.settings.get(key)
+        return assignment.value if assignment else default
+
+    def update(self, values, insert_after=None):
+        """一次写入多个键，返回 (新文本, 修改的键列表, 未找到的键列表)
+
+        insert_after 为 {键: 锚点键}：键不存在时插入到锚点键所在行之后，值使用与锚点相同的引号；
+        锚点也不存在的键不做修改，列入未找到的键。
+        """
+        insert_after = insert_after or {}
+        newline = detect_newline(self.text)
+        patches = []  # [(开始, 结束, 新文本)]
+        inserts = {}  # {插入位置: [行]}
+        changed = []
+        missing = []
+        for key, value in values.items():
+            assignment = self.settings.get(key)
+            if assignment is not None:
+                if assignment.value != value:
+                    quote = assignment.quote
+                    patches.append((assignment.start, assignment.end, f"{quote}{value}{quote}"))
+                    changed.append(key)
+                continue
+            anchor = self.settings.get(insert_after.get(key))
+            if anchor is None:
+                missing.append(key)
+                continue
+            quote = anchor.quote
+            inserts.setdefault(anchor.line_end, []).append(f"{newline}{key}={quote}{value}{quote}")
+            changed.append(key)
+
+        for pos, lines in inserts.items():
+            patches.append((pos, pos, ''.join(lines)))
+        parts = []
+        pos = 0
+        for start, end, data in sorted(patches, key=lambda p: (p[0], p[1])):
+            parts.append(self.text[pos:start])
+            parts.append(data)
+            pos = end
+        parts.append(self.text[pos:])
+        return ''.join(parts), changed, missing
+
+    def encode(self, text):
+        return encode_text(text, self.encoding)
+
+
+def read_dungeon_settings(file_path):
+    """读取副本难度和探索设置，返回 (难度, 探索)，不存在的键为 None"""
+    settings = LuaSettings.load(file_path)
+    return settings.get(KEY_DIFFICULTY), settings.get(KEY_EXPLORE)
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+
+from app_paths import app_path
+
+DEFAULT_LOG_FILE = app_path("logs", "operations.log")
+DEFAULT_CAPACITY = 5000  # 内存中最多保留的日志条数
+LOG_FILE_MAX_BYTES = 1024 * 1024
+LOG_FILE_BACKUPS = 5
+
+
+def message_level(message):
+    """根据消息前缀判断日志级别"""
+    if message.startswith(("错误", "执行过程中出错", "已回滚")):
+        return logging.ERROR
+    if message.startswith("警告"):
+        return logging.WARNING
+    return logging.INFO
+
+
+class LogRecord:
+    """一条操作日志"""
+    __slots__ = ('time', 'level', 'message')
+
+    def __init__(self, message, level=None, timestamp=None):
+        message = str(message)
+        self.time = time.time() if timestamp is None else timestamp
+        self.level = message_level(message) if level is None else level
+        self.message = message
+
+    def format(self):
+        return f"{time.strftime('%H:%M:%S', time.localtime(self.time))} {self.message}"
+
+
+class _JsonFormatter(logging.Formatter):
+    """每条日志写成一行 JSON"""
+    def format(self, record):
+        return json.dumps({
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.created)),
+            'level': record.levelname,
+            'message': record.getMessage(),
+        }, ensure_ascii=False)
+
+
+def open_log_file(log_file=DEFAULT_LOG_FILE, max_bytes=LOG_FILE_MAX_BYTES, backups=LOG_FILE_BACKUPS):
+    """创建按大小轮转的结构化日志文件，返回 logging.Logger"""
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    logger = logging.getLogger('replace_app.operations')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+    handler.setFormatter(_JsonFormatter())
+    logger.addHandler(handler)
+    return logger
+
+
+class LogBuffer:
+    """固定容量的日志环形缓冲区
+
+    append 可在任意线程调用，只做一次入队；界面按固定频率调用 drain 取出
+    新增的日志批量刷新，单条日志的开销与会话长度无关。
+    """
+    def __init__(self, capacity=DEFAULT_CAPACITY, logger=None):
+        self.capacity = capacity
+        self.logger = logger
+        self._records = deque(maxlen=capacity)
+        self._pending = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def append(self, message, level=None):
+        record = LogRecord(message, level)
+        with self._lock:
+            self._records.append(record)
+            self._pending.append(record)
+        if self.logger is not None:
+            self.logger.log(record.level, record.message)
+        return record
+
+    def drain(self):
+        """取出上次 drain 之后新增的日志（按时间顺序）"""
+        with self._lock:
+            pending = list(self._pending)
+            self._pending.clear()
+        return pending
+
+    def records(self):
+        """返回缓冲区中的全部日志（按时间顺序）"""
+        with self._lock:
+            return list(self._records)
@@ -0,0 +1,198 @@
+"""批量模式：把多项操作排入队列，一次执行、一次提交
+
+队列中的操作按顺序执行，每项操作的各个目标仍在线程池中并行处理；操作暂存的
+新内容只保存在内存中，后面的操作读取同一文件时直接看到前面操作的结果。全部
+操作完成后，每个被修改的文件只备份一次、写入一次（同一个事务、同一份备份清单、
+同一条撤销记录）。任一操作中有目标失败时整批放弃，所有文件保持不变。
+"""
+import os
+import threading
+
+from doc_cache import Document, PartialDocument
+from save_codec import parse_save
+from json_span import member_spans
+from file_sync import content_digest, file_digest
+from changeset import Change, FIELD_FILE
+from transaction import Transaction
+from engine import BatchEngine, TargetResult, STATUS_FAILED, STATUS_CANCELLED, unique_targets
+
+
+class StagingArea:
+    """批量执行期间的暂存区：任务通过 StagedTransaction 写入，对读取来说是文档缓存
+
+    已暂存的文件从内存中的新内容读取和解析，其余文件交给底层缓存。
+    """
+    def __init__(self, cache):
+        self.cache = cache
+        self.files = {}  # {绝对路径: 新内容}
+        self.hunks = {}  # {绝对路径: 改动}，只被一项操作修改过的文件才有
+        self.owners = {}  # {绝对路径: 最后修改该文件的 TargetResult}
+        self._docs = {}  # {绝对路径: 由新内容解析得到的 Document}
+        self._lock = threading.Lock()
+
+    # 写入
+
+    def stage(self, target, data, hunks=None, owner=None):
+        path = os.path.abspath(target)
+        with self._lock:
+            if path in self.files:
+                self.hunks.pop(path, None)  # 多项操作叠加的改动，提交时重新比较
+            elif hunks is not None:
+                self.hunks[path] = hunks
+            self.files[path] = data
+            self.owners[path] = owner
+            self._docs.pop(path, None)
+
+    # 缓存接口
+
+    def staged(self, file_path):
+        with self._lock:
+            return self.files.get(os.path.abspath(file_path))
+
+    def read(self, file_path):
+        data = self.staged(file_path)
+        if data is not None:
+            return data
+        with open(file_path, 'rb') as f:
+            return f.read()
+
+    def load(self, file_path):
+        path = os.path.abspath(file_path)
+        with self._lock:
+            raw = self.files.get(path)
+            doc = self._docs.get(path)
+        if raw is None:
+            return self.cache.load(path)
+        if doc is None:
+            data, encoding = parse_save(raw)
+            doc = Document(path, None, raw, data, encoding)
+            with self._lock:
+                if self.files.get(path) is raw:
+                    self._docs[path] = doc
+        return doc
+
+    def load_sections(self, file_path, keys):
+        if self.staged(file_path) is None:
+            return self.cache.load_sections(file_path, keys)
+        doc = self.load(file_path)
+        spans = member_spans(doc.raw, keys, doc.encoding)
+        data = {key: doc.data[key] for key in spans}
+        return PartialDocument(doc.path, None, doc.raw, data, doc.encoding, spans)
+
+    def invalidate(self, file_path):
+        self.cache.invalidate(file_path)
+
+
+class StagedTransaction:
+    """与 Transaction 接口相同、写入暂存区的事务，每个目标一个（记录是哪个目标修改了文件）"""
+    def __init__(self, staging, result):
+        self.staging = staging
+        self.result = result
+
+    def stage(self, target, data, hunks=None):
+        self.staging.stage(target, data, hunks, self.result)
+
+    def stage_copy(self, target, source):
+        self.staging.stage(target, self.staging.read(source), owner=self.result)
+
+
+class _StageEngine(BatchEngine):
+    """在暂存区上执行操作方法中的任务：不单独提交，结果由队列统一处理"""
+    def __init__(self, engine, staging, cancel=None, progress=None):
+        super().__init__(engine.max_workers, staging, engine.journal_dir, engine.backups, engine.index,
+                         engine.undo_log)
+        self.staging = staging
+        self.stage_cancel = cancel
+        self.stage_progress = progress
+        self.descriptions = []
+
+    def run(self, task, targets, progress=None, backup=True, description='', dry_run=False, cancel=None):
+        # 只执行任务，写入暂存区；备份、提交和撤销记录由 OperationQueue.execute 统一处理
+        results = [TargetResult(path, name) for path, name in unique_targets(targets)]
+        if not results:
+            return results
+        self.run_tasks(task, results, lambda result: StagedTransaction(self.staging, result),
+                       self.stage_progress, self.stage_cancel)
+        if description:
+            self.descriptions.append(description)
+        return results
+
+    def _read_bytes(self, file_path):
+        return self.staging.read(file_path)
+
+    def _same_content(self, source, target):
+        if self.staging.staged(source) is None and self.staging.staged(target) is None:
+            return super()._same_content(source, target)
+        try:
+            return self.staging.read(source) == self.staging.read(target)
+        except OSError:
+            return False
+
+    def _indexed(self, config_file):
+        # 已暂存的 Config.save 内容与索引不一致，交给任务自己读取
+        return self.staging.staged(config_file) is None and super()._indexed(config_file)
+
+
+class OperationQueue:
+    """待执行的操作队列
+
+    add(call, description) 中的 call(engine, progress=..., dry_run=..., cancel=...)
+    调用 engine 上的一个操作方法（如 engine.copy_options(...)）并返回结果列表；
+    execute 时 engine 为共用暂存区的批量引擎。
+    """
+    def __init__(self, engine):
+        self.engine = engine
+        self.operations = []  # [(call, 显示名称)]
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add(self, call, description=''):
+        self.operations.append((call, description))
+
+    def clear(self):
+        self.operations = []
+
+    def describe(self):
+        return [description for _, description in self.operations]
+
+    def execute(self, backup=True, progress=None, dry_run=False, cancel=None):
+        """按顺序执行队列中的全部操作并一次提交，返回 [(显示名称, 结果列表)]
+
+        只有提交成功后才把已执行的操作移出队列；取消、失败或出错时队列保持不变，
+        可以修正后重新执行。源配置在该操作开始时读取，因此也能看到前面操作的结果。
+        dry_run 为真时只在结果中记录变更，不写入、不备份任何文件，队列保持不变。
+        """
+        operations = list(self.operations)
+        staging = StagingArea(self.engine.cache)
+        stage_engine = _StageEngine(self.engine, staging, cancel, progress)
+
+        outcomes = []
+        for call, description in operations:
+            results = call(stage_engine, progress=None, dry_run=False, cancel=cancel)
+            outcomes.append((description, results))
+            if any(r.status == STATUS_FAILED for r in results) or (cancel is not None and cancel.is_set()):
+                break  # 后面的操作不再执行，整批放弃
+        all_results = [result for _, results in outcomes for result in results]
+
+        if dry_run:
+            for path, data in staging.files.items():
+                owner = staging.owners.get(path)
+                if owner is not None:
+                    old_hash = file_digest(path) if os.path.exists(path) else None
+                    owner.changes.append(Change(path, FIELD_FILE, old_hash, content_digest(data), len(data)))
+            return outcomes
+
+        txn = Transaction(self.engine.journal_dir, keep_backup=False)
+        try:
+            for path, data in staging.files.items():
+                txn.stage(path, data, staging.hunks.get(path))
+        except OSError:
+            txn.abort()
+            raise
+        # 有失败或已取消时 commit 会放弃事务并标记各目标
+        self.engine.commit(all_results, txn, backup, f"批量操作: {'; '.join(stage_engine.descriptions)}", cancel)
+        if not any(r.status in (STATUS_FAILED, STATUS_CANCELLED) for r in all_results):
+            # 执行期间加入的操作排在后面，保留在队列中
+            self.operations = self.operations[len(operations):]
+        return outcomes
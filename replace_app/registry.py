@@ -0,0 +1,262 @@
+"""账号和配置目录的 SQLite 注册表
+
+accounts_config.json 每次修改都要整体重写，配置目录多了以后很慢；这里改用
+标准库 sqlite3，每次增删改只写一行。表结构:
+
+    accounts     账号（按添加顺序排列）
+    folders      账号下的配置目录 {路径: 名称}
+    file_hashes  文件最近一次计算的内容哈希（按文件标识判断是否仍然有效）
+    operations   操作历史
+
+import_json / export_json 与原来的 accounts_config.json 格式互相转换:
+    python registry.py export accounts_config.json
+    python registry.py import accounts_config.json
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+from app_paths import app_path
+
+DEFAULT_REGISTRY_FILE = app_path("accounts.db")
+LEGACY_CONFIG_FILE = app_path("accounts_config.json")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS accounts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL,
+    function4_config_name TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS folders (
+    id INTEGER PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts(id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    UNIQUE (account_id, path)
+);
+CREATE INDEX IF NOT EXISTS folders_path ON folders(path);
+CREATE TABLE IF NOT EXISTS file_hashes (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY,
+    time REAL NOT NULL,
+    account TEXT,
+    description TEXT NOT NULL,
+    updated INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    backup_id TEXT
+);
+CREATE INDEX IF NOT EXISTS operations_time ON operations(time);
+"""
+
+
+class Registry:
+    """账号、配置目录、文件哈希和操作历史的注册表（可在多个线程中使用）
+
+    首次创建数据库时，如果存在 legacy_file（旧的 accounts_config.json）则自动导入。
+    """
+    def __init__(self, db_file=DEFAULT_REGISTRY_FILE, legacy_file=None):
+        self.db_file = db_file
+        created = db_file == ':memory:' or not os.path.exists(db_file)
+        if db_file != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_file)), exist_ok=True)
+        self._conn = sqlite3.connect(db_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA foreign_keys = ON")
+            if db_file != ':memory:':
+                self._conn.execute("PRAGMA journal_mode = WAL")
+                # WAL 模式下 NORMAL 只在检查点时刷盘，断电最多丢失最近的提交，不会损坏数据库
+                self._conn.execute("PRAGMA synchronous = NORMAL")
+            self._conn.executescript(_SCHEMA)
+        self.imported = False  # 本次是否从旧的 JSON 配置导入
+        if created and legacy_file and os.path.exists(legacy_file):
+            self.import_json(legacy_file)
+            self.imported = True
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _account_id(self, account):
+        rows = self._conn.execute("SELECT id FROM accounts WHERE name = ?", (account,)).fetchall()
+        if not rows:
+            raise ValueError(f"找不到账号: {account}")
+        return rows[0][0]
+
+    # 账号和配置目录
+
+    def accounts(self):
+        """返回与 accounts_config.json 中 accounts 相同结构的字典（按添加顺序）"""
+        with self._lock:
+            accounts = {}
+            ids = {}
+            for account_id, name, config_name in self._conn.execute(
+                    "SELECT id, name, function4_config_name FROM accounts ORDER BY position, id"):
+                accounts[name] = {"configurations": {}, "count": 0, "function4_config_name": config_name}
+                ids[account_id] = accounts[name]
+            for account_id, path, name in self._conn.execute(
+                    "SELECT account_id, path, name FROM folders ORDER BY position, id"):
+                account = ids[account_id]
+                account["configurations"][path] = name
+                account["count"] += 1
+        return accounts
+
+    def add_account(self, account, function4_config_name=''):
+        """添加账号，已存在时不做修改"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO accounts (name, position, function4_config_name) "
+                "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM accounts), ?)",
+                (account, function4_config_name),
+            )
+
+    def remove_account(self, account):
+        """删除账号及其下的全部配置目录"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM accounts WHERE name = ?", (account,))
+
+    def set_function4_config_name(self, account, config_name):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE accounts SET function4_config_name = ? WHERE name = ?",
+                               (config_name, account))
+
+    def add_folder(self, account, path, name):
+        """添加配置目录，已存在时更新名称"""
+        with self._lock, self._conn:
+            account_id = self._account_id(account)
+            self._conn.execute(
+                "INSERT INTO folders (account_id, path, name, position) "
+                "VALUES (?, ?, ?, (SELECT COALESCE(MAX(position), -1) + 1 FROM folders WHERE account_id = ?)) "
+                "ON CONFLICT (account_id, path) DO UPDATE SET name = excluded.name",
+                (account_id, path, name, account_id),
+            )
+
+    def rename_folder(self, account, path, name):
+        with self._lock, self._conn:
+            account_id = self._account_id(account)
+            self._conn.execute("UPDATE folders SET name = ? WHERE account_id = ? AND path = ?",
+                               (name, account_id, path))
+
+    def remove_folder(self, account, path):
+        with self._lock, self._conn:
+            account_id = self._account_id(account)
+            self._conn.execute("DELETE FROM folders WHERE account_id = ? AND path = ?", (account_id, path))
+
+    def folder_accounts(self, path):
+        """返回包含该配置目录的账号名称列表"""
+        rows = self._execute(
+            "SELECT accounts.name FROM folders JOIN accounts ON accounts.id = folders.account_id "
+            "WHERE folders.path = ? ORDER BY accounts.position", (path,))
+        return [name for name, in rows]
+
+    # 文件哈希
+
+    def get_digest(self, path):
+        """返回 (文件标识, 哈希)，没有记录时返回 None"""
+        try:
+            rows = self._execute("SELECT mtime_ns, size, inode, digest FROM file_hashes WHERE path = ?", (path,))
+        except sqlite3.Error:
+            return None  # 哈希记录只是缓存，读写失败时重新计算即可
+        if not rows:
+            return None
+        mtime_ns, size, inode, digest = rows[0]
+        return (mtime_ns, size, inode), digest
+
+    def put_digests(self, items):
+        """在一个事务中写入多条 (路径, 文件标识, 哈希)"""
+        rows = [(path, mtime_ns, size, inode, digest) for path, (mtime_ns, size, inode), digest in items]
+        try:
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO file_hashes (path, mtime_ns, size, inode, digest) VALUES (?, ?, ?, ?, ?)",
+                    rows)
+        except sqlite3.Error:
+            pass
+
+    # 操作历史
+
+    def record_operation(self, account, description, updated=0, failed=0, backup_id=None):
+        self._execute(
+            "INSERT INTO operations (time, account, description, updated, failed, backup_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (time.time(), account, description, updated, failed, backup_id))
+
+    def operations(self, limit=100):
+        """返回最近的操作记录（新的在前）"""
+        rows = self._execute(
+            "SELECT time, account, description, updated, failed, backup_id FROM operations "
+            "ORDER BY time DESC, id DESC LIMIT ?", (limit,))
+        keys = ('time', 'account', 'description', 'updated', 'failed', 'backup_id')
+        return [dict(zip(keys, row)) for row in rows]
+
+    # JSON 导入导出
+
+    def import_json(self, json_file):
+        """从 accounts_config.json 格式导入（合并到现有数据，同名账号的目录会被更新），返回导入的账号数"""
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        accounts = data.get("accounts", {})
+        with self._lock, self._conn:
+            for account, info in accounts.items():
+                self._conn.execute(
+                    "INSERT INTO accounts (name, position, function4_config_name) "
+                    "VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM accounts), ?) "
+                    "ON CONFLICT (name) DO UPDATE SET function4_config_name = excluded.function4_config_name",
+                    (account, info.get("function4_config_name", '')),
+                )
+                account_id = self._account_id(account)
+                for position, (path, name) in enumerate(info.get("configurations", {}).items()):
+                    self._conn.execute(
+                        "INSERT INTO folders (account_id, path, name, position) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT (account_id, path) DO UPDATE SET name = excluded.name",
+                        (account_id, path, name, position),
+                    )
+        return len(accounts)
+
+    def export_json(self, json_file):
+        """导出为 accounts_config.json 格式（LF 换行）"""
+        json_str = json.dumps({"accounts": self.accounts()}, indent=4, ensure_ascii=False)
+        temp_file = f"{json_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(json_str)
+        os.replace(temp_file, json_file)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="账号注册表与 accounts_config.json 互相转换")
+    parser.add_argument('action', choices=['import', 'export'])
+    parser.add_argument('json_file')
+    parser.add_argument('--db', default=DEFAULT_REGISTRY_FILE, help="注册表文件（默认为程序目录下的 accounts.db）")
+    args = parser.parse_args(argv)
+
+    registry = Registry(args.db)
+    try:
+        if args.action == 'import':
+            count = registry.import_json(args.json_file)
+            print(f"已导入 {count} 个账号")
+        else:
+            registry.export_json(args.json_file)
+            print(f"已导出到 {args.json_file}")
+    finally:
+        registry.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
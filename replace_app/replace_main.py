@@ -1,28 +1,40 @@
 import os
+import sys
 import json
+import argparse
+
+from equip_rules import load_rules
+from save_codec import parse_save
+from json_span import dumps_preserving
+from transaction import Transaction, TransactionError, DEFAULT_JOURNAL_DIR
+from transaction import recover as recover_transactions
 
 class ReplaceConfig:
-    def __init__(self, directory, encoding='gb2312'):
+    def __init__(self, directory, encoding='gb2312', journal_dir=DEFAULT_JOURNAL_DIR):
         """
         初始化文件处理器。
         :param file_path: 文件路径
         :param encoding: 文件编码，默认为 gb2312
+        :param journal_dir: 保存时使用的事务日志目录
         """
         self.filename = 'diy.suit'
         self.file_path = os.path.join(directory, self.filename)
         self.diy_name = 'diysuit_item'
         print('self.file_path', self.file_path)
         self.encoding = encoding
+        self.raw = None  # 原始字节，保存时按原排版只改写变化的部分
         self.data = None
+        self.count = 0  # 替换的装备数，为 0 时不写入文件
+        self.journal_dir = journal_dir
 
     def read_file(self):
         """
         读取文件并解析为 JSON 数据。
         """
         try:
-            with open(self.file_path, 'r', encoding=self.encoding) as file:
-                content = file.read()
-            self.data = json.loads(content)
+            with open(self.file_path, 'rb') as file:
+                self.raw = file.read()
+            self.data, self.encoding = parse_save(self.raw)
             print("文件读取并解析成功")
         except FileNotFoundError:
             print(f"文件未找到: {self.file_path}")
@@ -31,47 +43,66 @@ class ReplaceConfig:
         except json.JSONDecodeError as e:
             print(f"JSON 解析失败: {e}")
 
-    def replace_content(self, old_value, new_value):
+    def replace_content(self, rules):
         """
-        替换 JSON 数据中的内容。
+        按规则集替换 JSON 数据中的装备名称，一遍遍历应用所有规则。
 
-        :param old_value: 需要替换的值
-        :param new_value: 替换后的值
+        :param rules: equip_rules.RuleSet
         """
         data = self.data['diysuit_item']
         if data and isinstance(data, list):  # 确保 data 是列表
             for item in data:  # 遍历列表中的每个字典
-                if isinstance(item['data'], dict):  # 确保每个元素是字典
+                if isinstance(item.get('data'), dict):  # 确保每个元素是字典
                     for key, value in item['data'].items():  # 遍历字典的键值对
-                        if value == old_value:  # 如果值等于需要替换的值
-                            item['data'][key] = new_value  # 替换为新的值
-                            print(f"替换成功: {old_value} -> {new_value}")
+                        new_value = rules.rewrite(value)
+                        if new_value is not None:  # 有规则匹配时替换为新的值
+                            item['data'][key] = new_value
+                            self.count += 1
+                            print(f"替换成功: {value} -> {new_value}")
         else:
             print("数据格式不正确，无法替换")
 
     def save_to_file(self):
-        if self.data:
-            try:
-                with open(self.file_path, 'w', encoding='gb2312') as file:
-                    json.dump(self.data, file, ensure_ascii=False, indent=4)
-                print(f"文件已保存到: {self.file_path}")
-            except IOError as e:
-                print(f"文件保存失败: {e}")
-        else:
+        """通过事务写入：先写临时文件再替换，中途出错或退出时原文件保持不变"""
+        if not self.data:
             print("没有可保存的数据")
+            return
+        if not self.count:
+            print("没有需要替换的装备，文件保持不变")
+            return
+        # 重新解析原始字节作为比较基准（self.data 已被原地修改）
+        original, _ = parse_save(self.raw)
+        txn = Transaction(self.journal_dir, keep_backup=False)
+        try:
+            txn.stage(self.file_path, dumps_preserving(self.raw, original, self.data, self.encoding))
+        except OSError as e:
+            txn.abort()
+            print(f"文件保存失败: {e}")
+            return
+        try:
+            txn.commit()
+        except TransactionError as e:
+            print(f"文件保存失败: {e}")
+            return
+        print(f"文件已保存到: {self.file_path}")
 
-    def run(self, old_value, new_value):
+    def run(self, rules):
         self.read_file()
-        self.replace_content(old_value, new_value)
+        if self.data is None:
+            return
+        self.replace_content(rules)
         self.save_to_file()
 
-def main():
-    main_file = 'C:/Users/guweimo/Desktop/心月狐/data/Config/C7E3C1E3D8BCD2BBD2B6'
-    config = ReplaceConfig(main_file)
-    old_value = '清醒者的奥丁勋章+4'
-    new_value = '清醒者的奥丁勋章+5'
-    config.run(old_value, new_value)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="按规则文件替换 diy.suit 中的装备名称")
+    parser.add_argument('directory', help="配置目录")
+    parser.add_argument('rules', help="JSON 规则文件（格式见 equip_rules.load_rules）")
+    args = parser.parse_args(argv)
+
+    recover_transactions()
+    config = ReplaceConfig(args.directory)
+    config.run(load_rules(args.rules))
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
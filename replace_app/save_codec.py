@@ -0,0 +1,79 @@
+import json
+
+# 依次尝试的编码；gb18030 是 gb2312/GBK 的超集，能解码游戏写出的任何有效字节
+ENCODINGS = ('gb2312', 'gb18030')
+# 仍无法解码的字节用 surrogateescape 保留，写回时原样还原，读取时不再改写文件
+FALLBACK_ERRORS = 'surrogateescape'
+
+# gb2312 与 GBK/GB18030 对同一字节解码出不同字符（A1A4、A1AA）。整个文件的文本
+# 不做转换，保证解码再编码后字节不变；只在比较和拼接新值时统一这两个字符
+_TO_GB2312 = str.maketrans({'·': '・', '—': '―'})
+_FROM_GB2312 = str.maketrans({'・': '·', '―': '—'})
+
+
+def decode_text(raw):
+    """一次解码存档字节，返回 (文本, 编码)；encode_text(文本, 编码) 还原为相同的字节"""
+    try:
+        return raw.decode('gb2312'), 'gb2312'
+    except UnicodeDecodeError:
+        pass
+    try:
+        return raw.decode('gb18030'), 'gb18030'
+    except UnicodeDecodeError:
+        return raw.decode('gb18030', errors=FALLBACK_ERRORS), 'gb18030'
+
+
+def detect_encoding(raw):
+    """只判断存档字节的编码（结果与 decode_text 相同），不保留解码得到的文本"""
+    if raw.isascii():
+        return 'gb2312'
+    try:
+        raw.decode('gb2312')
+    except UnicodeDecodeError:
+        return 'gb18030'
+    return 'gb2312'
+
+
+def decode_value(raw, encoding='gb2312'):
+    """按整个文件检测到的编码解码其中一段字节（如一个顶层值）"""
+    if encoding == 'gb2312':
+        return raw.decode('gb2312')
+    return raw.decode('gb18030', errors=FALLBACK_ERRORS)
+
+
+def encode_text(text, encoding='gb2312'):
+    """按读取时检测到的编码把文本编码为字节
+
+    gb2312 无法表示新写入的字符时改用其超集 gb18030，原有字节不受影响。
+    """
+    if encoding == 'gb2312':
+        try:
+            return text.encode('gb2312')
+        except UnicodeEncodeError:
+            encoding = 'gb18030'
+    return text.encode(encoding, errors=FALLBACK_ERRORS)
+
+
+def encode_value(text, encoding='gb2312'):
+    """编码要拼接进文件的新值（可能来自另一种编码的文件）
+
+    写入 gb18030 文件时把 gb2312 形式的 ・ ― 换回 A1A4、A1AA 对应的字符，
+    与游戏写出的字节一致，而不是编码为 gb18030 的四字节序列。
+    """
+    if encoding == 'gb2312':
+        try:
+            return text.encode('gb2312')
+        except UnicodeEncodeError:
+            pass
+    return text.translate(_FROM_GB2312).encode('gb18030', errors=FALLBACK_ERRORS)
+
+
+def to_gb2312(text):
+    """把 GBK/GB18030 解码得到的 · — 换成 gb2312 对应字节的字符，用于跨文件比较"""
+    return text.translate(_TO_GB2312)
+
+
+def parse_save(raw):
+    """解析 Config.save / Default.save，返回 (数据, 编码)"""
+    text, encoding = decode_text(raw)
+    return json.loads(text), encoding
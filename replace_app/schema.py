@@ -0,0 +1,137 @@
+MAX_ERRORS = 10  # 每个文件最多报告的错误数
+
+# 类型名 -> Python 类型（JSON Schema 的子集）
+_TYPES = {
+    'object': (dict,),
+    'array': (list,),
+    'string': (str,),
+    'number': (int, float),
+    'integer': (int,),
+    'boolean': (bool,),
+    'null': (type(None),),
+}
+
+_TYPE_NAMES = {dict: 'object', list: 'array', str: 'string', int: 'integer', float: 'number',
+               bool: 'boolean', type(None): 'null'}
+
+
+def _format_path(path):
+    """把 (父路径, 键) 链表格式化为 diysuit_item[0].data 形式"""
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    text = ''.join(reversed(parts)).lstrip('.')
+    return text or '<根>'
+
+
+def _compile(spec):
+    """把一个节点的声明编译为 check(value, path, errors) 闭包"""
+    check_type = None
+    types = spec.get('type')
+    if types is not None:
+        names = [types] if isinstance(types, str) else list(types)
+        for name in names:
+            if name not in _TYPES:
+                raise ValueError(f"未知类型: {name}")
+        py_types = tuple(t for name in names for t in _TYPES[name])
+        allow_bool = 'boolean' in names  # bool 是 int 的子类，需单独排除
+        label = '/'.join(names)
+
+        def check_type(value, path, errors):
+            if isinstance(value, py_types) and (allow_bool or not isinstance(value, bool)):
+                return True
+            errors.append(f"{_format_path(path)}: 应为 {label}，实际为 {_TYPE_NAMES.get(type(value), type(value).__name__)}")
+            return False
+
+    properties = {key: _compile(sub) for key, sub in spec.get('properties', {}).items()}
+    required = tuple(spec.get('required', ()))
+    extra = spec.get('additionalProperties')
+    extra = _compile(extra) if isinstance(extra, dict) else None
+    items = _compile(spec['items']) if 'items' in spec else None
+
+    def check(value, path, errors):
+        if check_type is not None and not check_type(value, path, errors):
+            return
+        if isinstance(value, dict):
+            for key in required:
+                if key not in value:
+                    errors.append(f"{_format_path(path)}: 缺少 {key}")
+            if properties or extra is not None:
+                for key, child in value.items():
+                    child_check = properties.get(key, extra)
+                    if child_check is not None:
+                        child_check(child, (path, key), errors)
+        elif isinstance(value, list) and items is not None:
+            for index, child in enumerate(value):
+                items(child, (path, index), errors)
+    return check
+
+
+class Schema:
+    """由声明式结构描述（JSON Schema 的子集）预先编译得到的校验器
+
+    支持 type、properties、required、additionalProperties、items；
+    编译后每次校验只遍历一次文档中结构描述涉及的部分。
+    """
+    def __init__(self, name, spec):
+        self.name = name
+        self.spec = spec
+        self._check = _compile(spec)
+
+    def errors(self, value, limit=MAX_ERRORS):
+        """返回不符合结构描述之处的错误信息列表（最多 limit 条），符合时返回空列表"""
+        errors = []
+        self._check(value, None, errors)
+        if len(errors) > limit:
+            errors = errors[:limit] + [f"……另有 {len(errors) - limit} 处错误"]
+        return errors
+
+    def __repr__(self):
+        return f"Schema({self.name!r})"
+
+
+# 装备配置：{"name": 名称, "data": {槽位: 装备名}}
+SUIT_SPEC = {
+    'type': 'object',
+    'required': ['name'],
+    'properties': {
+        'name': {'type': 'string'},
+        'data': {'type': 'object', 'additionalProperties': {'type': 'string'}},
+    },
+}
+
+CONFIG_SCHEMA = Schema('Config.save', {
+    'type': 'object',
+    'properties': {
+        'diysuit_item': {'type': 'array', 'items': SUIT_SPEC},
+    },
+})
+
+# 列表或对象形式的一组设置（整体复制，内部结构由游戏决定）
+SETTINGS_SPEC = {'type': ['object', 'array']}
+
+# Default.save 中功能4可复制的顶层字段（engine.OPTION_FIELDS）
+OPTION_SECTIONS = (
+    'item_use_data', 'item_buff_data', 'skill_buff_data',
+    'item_filter_pick_data_1', 'item_filter_pick_data_2',
+    'item_filter_throw_data_1', 'item_filter_throw_data_2',
+    'diytrigger', 'pet_build', 'item_filter_disassemble',
+    'item_filter_1', 'item_filter_2', 'item_filter_3', 'item_filter_4',
+    'store_items',
+)
+
+DEFAULT_SCHEMA = Schema('Default.save', {
+    'type': 'object',
+    'properties': {section: SETTINGS_SPEC for section in OPTION_SECTIONS},
+})
+
+DIY_SUIT_SCHEMA = Schema('diy.suit', {
+    'type': 'object',
+    'properties': {
+        'diysuit_item': {'type': 'array', 'items': SUIT_SPEC},
+        'diysuit_property': SETTINGS_SPEC,
+        'diysuit_other': SETTINGS_SPEC,
+        'diysuit_awaken': SETTINGS_SPEC,
+    },
+})
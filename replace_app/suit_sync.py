@@ -0,0 +1,149 @@
+from doc_cache import value_digest
+from json_span import (array_elements, object_members, find_span, line_indent, detect_style,
+                       dumps_value, diff_patches, append_members)
+
+DIY_SUIT_FILE = 'diy.suit'
+
+SECTION_ITEM = 'diysuit_item'
+# 显示名称 -> diy.suit 中的顶层键
+SECTIONS = {
+    "装备": SECTION_ITEM,
+    "超越": 'diysuit_property',
+    "其他": 'diysuit_other',
+    "觉醒": 'diysuit_awaken',
+}
+# 装备部分默认只同步这些装备配置的 data，其余部分整体同步
+DEFAULT_ITEM_SUITS = ('存仓',)
+
+
+def section_key(section):
+    """接受显示名称或顶层键，返回顶层键"""
+    if section in SECTIONS:
+        return SECTIONS[section]
+    if section in SECTIONS.values():
+        return section
+    raise ValueError(f"不存在【{section}】")
+
+
+def suit_positions(suits):
+    """{装备配置名: 下标}，同名时取第一个"""
+    positions = {}
+    for index, item in enumerate(suits):
+        if isinstance(item, dict):
+            positions.setdefault(item.get('name'), index)
+    return positions
+
+
+def _append_elements(raw, start, values, style, encoding):
+    """在从 start 开始的数组末尾追加 values，返回补丁"""
+    elements = array_elements(raw, start)
+    if not elements:
+        end = find_span(raw, [], start=start)[1]
+        return (start, end, dumps_value(values, style, line_indent(raw, start), encoding))
+    last_start, last_end = elements[-1]
+    indent = line_indent(raw, last_start)
+    data = b''.join(b',' + (style.newline + indent).encode('ascii') + dumps_value(value, style, indent, encoding)
+                    for value in values)
+    return (last_end, last_end, data)
+
+
+class SectionSync:
+    """diy.suit 分区同步计划：源文件只解析一次，可并行应用到多个目标
+
+    sections 为顶层键列表；装备部分（diysuit_item）在 suit_names 非空时
+    只同步这些装备配置的 data（目标中没有时追加），否则整个部分替换。
+    与源内容结构相同的部分不改写，不同的部分只改写有差异的子树。
+    """
+    def __init__(self, source_doc, sections, suit_names=None):
+        self.source_doc = source_doc
+        self.sections = [section_key(section) for section in sections]
+        source_data = source_doc.data
+        for section in self.sections:
+            if section not in source_data:
+                raise ValueError(f"源文件中没有 {section}")
+
+        self.suits = {}  # {装备配置名: 源 data}
+        self.suit_hashes = {}
+        if suit_names and SECTION_ITEM in self.sections:
+            suits = source_data[SECTION_ITEM]
+            positions = suit_positions(suits)
+            for name in suit_names:
+                if name not in positions:
+                    raise ValueError(f"源文件中没有名为 '{name}' 的装备配置")
+                self.suits[name] = suits[positions[name]].get('data')
+                self.suit_hashes[name] = value_digest(self.suits[name])
+
+    def describe(self):
+        names = []
+        for section in self.sections:
+            if section == SECTION_ITEM and self.suits:
+                names.append(f"{section}（{', '.join(self.suits)}）")
+            else:
+                names.append(section)
+        return ", ".join(names)
+
+    def patches(self, doc, result):
+        """计算目标文档需要的补丁，变更记录到 result 中，返回 [(开始, 结束, 新字节)]"""
+        raw, data, encoding = doc.raw, doc.data, doc.encoding
+        style = detect_style(raw)
+        patches = []
+        missing = {}  # 目标中没有的顶层键，统一追加
+
+        for section in self.sections:
+            source_value = self.source_doc.data[section]
+            if section == SECTION_ITEM and self.suits:
+                if section not in data:
+                    missing[section] = [{'name': name, 'data': value} for name, value in self.suits.items()]
+                    for name, value in self.suits.items():
+                        result.change(doc.path, f"{section}/{name}", None, value)
+                    continue
+                patches.extend(self._suit_patches(doc, style, result))
+                continue
+
+            if doc.section_hash(section) == self.source_doc.section_hash(section):
+                result.skip_count += 1
+                continue
+            result.change(doc.path, section, data.get(section), source_value)
+            if section in data:
+                start, end = find_span(raw, [section], encoding=encoding)
+                patches.extend(diff_patches(raw, start, end, data[section], source_value, style, encoding))
+            else:
+                missing[section] = source_value
+
+        if missing:
+            patches.append(append_members(raw, missing, style, encoding))
+        return patches
+
+    def _suit_patches(self, doc, style, result):
+        raw, encoding = doc.raw, doc.encoding
+        suits = doc.data[SECTION_ITEM]
+        positions = suit_positions(suits)
+        suits_start = find_span(raw, [SECTION_ITEM], encoding=encoding)[0]
+        suit_spans = None
+        patches = []
+        new_suits = []
+        for name, value in self.suits.items():
+            index = positions.get(name)
+            if index is None:
+                new_suits.append({'name': name, 'data': value})
+                result.change(doc.path, f"{SECTION_ITEM}/{name}", None, value)
+                continue
+            old_value = suits[index].get('data')
+            if value_digest(old_value) == self.suit_hashes[name]:
+                result.skip_count += 1
+                continue
+            if suit_spans is None:
+                suit_spans = array_elements(raw, suits_start)
+            members = object_members(raw, suit_spans[index][0], encoding)
+            if 'data' in members:
+                start, end = members['data']
+                patches.extend(diff_patches(raw, start, end, old_value, value, style, encoding))
+            else:
+                # 没有 data 的装备配置整体替换
+                start, end = suit_spans[index]
+                suit = dict(suits[index], data=value)
+                patches.append((start, end, dumps_value(suit, style, line_indent(raw, start), encoding)))
+            result.change(doc.path, f"{SECTION_ITEM}/{name}", old_value, value)
+        if new_suits:
+            patches.append(_append_elements(raw, suits_start, new_suits, style, encoding))
+        return patches
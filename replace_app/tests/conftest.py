@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+# replace_app 中的模块按顶层模块互相导入（与直接运行脚本时一致）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from doc_cache import DocumentCache
+from backup_store import BackupStore
+from equip_index import EquipmentIndex
+from undo_log import UndoLog
+from engine import BatchEngine
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """所有状态（日志、备份、撤销记录、缓存、索引）都放在临时目录中的引擎"""
+    journal = str(tmp_path / 'journal')
+    cache = DocumentCache()
+    return BatchEngine(2, cache, journal, BackupStore(str(tmp_path / 'backups')),
+                       EquipmentIndex(None, cache), UndoLog(str(tmp_path / 'undo'), journal_dir=journal))
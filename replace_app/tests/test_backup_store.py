@@ -0,0 +1,90 @@
+import os
+
+import pytest
+
+import backup_store
+from backup_store import BackupStore
+from conftest import write, read
+
+
+@pytest.fixture
+def files(tmp_path):
+    a, b = str(tmp_path / 'a.save'), str(tmp_path / 'b.save')
+    write(a, b'old a')
+    write(b, b'old b')
+    return a, b, str(tmp_path / 'new.lua')
+
+
+def test_snapshot_deduplicates_content(tmp_path, files):
+    a, b, new = files
+    store = BackupStore(str(tmp_path / 'backups'))
+    write(b, b'old a')
+    op_id = store.snapshot([a, b, new], '操作')
+    manifest = store.load_manifest(op_id)
+    assert [item['hash'] is None for item in manifest['files']] == [False, False, True]
+    assert manifest['files'][0]['hash'] == manifest['files'][1]['hash']
+    assert store.get(manifest['files'][0]['hash']) == b'old a'
+    assert [op['id'] for op in store.list_operations()] == [op_id]
+
+
+def test_restore_replaces_and_deletes_in_one_transaction(tmp_path, files):
+    a, b, new = files
+    journal = str(tmp_path / 'journal')
+    store = BackupStore(str(tmp_path / 'backups'))
+    op_id = store.snapshot([a, new], '操作')
+    write(a, b'new a')
+    write(new, b'created')
+
+    assert store.restore(op_id, journal) == 2
+    assert read(a) == b'old a' and not os.path.exists(new) and read(b) == b'old b'
+    assert os.listdir(journal) == []
+    assert [name for name in os.listdir(tmp_path) if '.txn-' in name] == []
+    # 恢复前的内容也已备份
+    latest = store.list_operations()[0]
+    assert latest['id'] != op_id and {item['path'] for item in latest['files']} == {a, new}
+
+
+def test_engine_restore_can_be_undone_and_refreshes_cache(engine, files):
+    a, b, new = files
+    op_id = engine.backups.snapshot([a, new], '操作')
+    write(a, b'{"x": 1}')
+    write(new, b'created')
+    assert engine.cache.load(a).data == {"x": 1}
+
+    assert engine.restore(op_id) == 2
+    assert read(a) == b'old a' and not os.path.exists(new)
+    assert engine.undo_log.peek()['description'] == '恢复备份: 操作'
+
+    engine.undo()
+    assert read(a) == b'{"x": 1}' and read(new) == b'created'
+    assert engine.cache.load(a).data == {"x": 1}
+    engine.redo()
+    assert read(a) == b'old a' and not os.path.exists(new)
+
+
+def test_failed_restore_leaves_files_unchanged(tmp_path, files):
+    a, b, new = files
+    store = BackupStore(str(tmp_path / 'backups'))
+    op_id = store.snapshot([a, b], '操作')
+    manifest = store.load_manifest(op_id)
+    os.remove(store._object_path(manifest['files'][1]['hash']))
+    write(a, b'new a')
+    write(b, b'new b')
+    with pytest.raises(OSError):
+        store.restore(op_id, str(tmp_path / 'journal'))
+    assert read(a) == b'new a' and read(b) == b'new b'
+    assert [name for name in os.listdir(tmp_path) if '.txn-' in name] == []
+
+
+def test_prune_keeps_recent_operations_and_their_objects(tmp_path, files, monkeypatch):
+    a, b, new = files
+    clock = iter([1000.0, 1001.0])
+    monkeypatch.setattr(backup_store.time, 'time', lambda: next(clock))  # 两次操作 ID 按时间排序
+    store = BackupStore(str(tmp_path / 'backups'))
+    first = store.snapshot([a], '第一次')
+    write(a, b'newer a')
+    second = store.snapshot([a], '第二次')
+    assert store.prune(keep=1) == 1
+    assert [op['id'] for op in store.list_operations()] == [second]
+    assert store.get(store.load_manifest(second)['files'][0]['hash']) == b'newer a'
+    assert first != second
@@ -0,0 +1,172 @@
+import io
+import json
+import os
+
+import pytest
+
+import cli
+from cli import JobRunner, JobError, iter_jobs
+from registry import Registry
+from engine import TargetResult, results_by_account
+from conftest import write, read
+
+LUA_FILE = 'settings.lua'
+DIFFICULTY = '副本难度=普通\n探索副本=关闭\n'
+
+
+@pytest.fixture
+def accounts(tmp_path):
+    """两个账号，共用配置 shared：{账号: {路径: 名称}}"""
+    configs = {}
+    for name in ('a', 'b', 'shared'):
+        config = tmp_path / name
+        config.mkdir()
+        write(str(config / LUA_FILE), DIFFICULTY.encode('gb2312'))
+        configs[name] = str(config)
+    return {
+        '大号': {configs['a']: '角色A', configs['shared']: '共用'},
+        '小号': {configs['b']: '角色B', configs['shared']: '共用'},
+    }
+
+
+@pytest.fixture
+def run_cli(tmp_path, engine, monkeypatch, capsys):
+    """以 engine（状态都在临时目录中）运行 cli.main，返回 (退出码, 输出的记录列表)"""
+    monkeypatch.setattr(cli, 'BatchEngine', lambda: engine)
+    monkeypatch.setattr(cli, 'recover_transactions', lambda: 0)
+
+    def run(*args, jobs=None):
+        argv = list(args)
+        if jobs is not None:
+            jobs_file = str(tmp_path / 'jobs.jsonl')
+            write(jobs_file, '\n'.join(json.dumps(job, ensure_ascii=False) for job in jobs).encode('utf-8'))
+            argv.insert(0, jobs_file)
+        code = cli.main(argv)
+        return code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    return run
+
+
+@pytest.fixture
+def config_file(tmp_path, accounts):
+    path = str(tmp_path / 'accounts_config.json')
+    write(path, json.dumps({'accounts': {name: {'configurations': folders} for name, folders in accounts.items()}},
+                           ensure_ascii=False).encode('utf-8'))
+    return path
+
+
+def difficulty(config):
+    return read(os.path.join(config, LUA_FILE)).decode('gb2312')
+
+
+def set_difficulty(value, **job):
+    return dict({'op': 'set_difficulty', 'account': '大号', 'lua_files': [LUA_FILE], 'difficulty': value}, **job)
+
+
+def test_iter_jobs_skips_comments_and_reports_bad_lines():
+    stream = io.StringIO('# 注释\n\n{"op": "x"}\nnot json\n[1]\n')
+    jobs = list(iter_jobs(stream))
+    assert [line_no for line_no, _ in jobs] == [3, 4, 5]
+    assert jobs[0][1] == {"op": "x"}
+    assert isinstance(jobs[1][1], JobError) and isinstance(jobs[2][1], JobError)
+
+
+def test_runner_scope_and_targets(accounts):
+    runner = JobRunner(accounts, engine=object())
+    assert runner.scope({'account': '大号', 'accounts': '*'}) == ['大号', '小号']
+    targets = runner.targets({'account': '大号', 'accounts': ['小号']})
+    assert [name for _, name in targets] == ['角色A', '共用', '角色B']  # 共用的目录只处理一次
+    assert runner.targets({'account': '大号', 'targets': ['共用']})[0][1] == '共用'
+    with pytest.raises(JobError, match='找不到账号'):
+        runner.scope({'account': '没有'})
+    with pytest.raises(JobError, match='找不到配置'):
+        runner.targets({'account': '大号', 'targets': ['角色B']})
+    with pytest.raises(JobError, match='缺少 account'):
+        runner.scope({})
+
+
+def test_jobs_run_in_order_and_report_each_line(run_cli, config_file, accounts):
+    (a, shared), (b, _) = list(accounts['大号']), list(accounts['小号'])
+    code, records = run_cli('--config', config_file, '--no-backup', jobs=[
+        set_difficulty('困难'),
+        {'op': 'unknown', 'account': '大号'},
+        set_difficulty('地狱', account='小号', targets=['角色B']),
+    ])
+    assert code == 1
+    assert [record['line'] for record in records] == [1, 2, 3]
+    assert records[0]['updated'] == 2 and records[1]['error'] == '未知操作: unknown'
+    assert '副本难度=困难' in difficulty(a) and '副本难度=困难' in difficulty(shared)
+    assert '副本难度=地狱' in difficulty(b)
+
+
+def test_dry_run_outputs_changes_only(run_cli, config_file, accounts):
+    a = next(iter(accounts['大号']))
+    code, records = run_cli('--config', config_file, '--dry-run', jobs=[set_difficulty('困难')])
+    assert code == 0
+    changes = [change for result in records[0]['results'] for change in result['changes']]
+    assert {change['file'] for change in changes} == {os.path.join(path, LUA_FILE) for path in accounts['大号']}
+    assert difficulty(a) == DIFFICULTY
+
+
+def test_batch_commits_once_and_undoes_in_one_step(run_cli, config_file, accounts):
+    a = next(iter(accounts['大号']))
+    code, records = run_cli('--config', config_file, '--batch', jobs=[
+        set_difficulty('困难'),
+        {'op': 'sync_lua', 'account': '大号', 'source': '角色A', 'lua_files': [LUA_FILE], 'accounts': ['小号']},
+    ])
+    assert code == 0 and [record['line'] for record in records] == [1, 2]
+    assert all('副本难度=困难' in difficulty(path) for folders in accounts.values() for path in folders)
+
+    code, records = run_cli('--undo')
+    assert code == 0 and records[0]['op'] == 'undo'
+    assert all(difficulty(path) == DIFFICULTY for folders in accounts.values() for path in folders)
+    code, records = run_cli('--undo')
+    assert code == 1 and 'error' in records[0]
+    assert difficulty(a) == DIFFICULTY
+
+
+def test_batch_with_invalid_job_runs_nothing(run_cli, config_file, accounts):
+    a = next(iter(accounts['大号']))
+    code, records = run_cli('--config', config_file, '--batch', jobs=[set_difficulty('困难'), {'op': 'nope'}])
+    assert code == 1 and records[-1]['error'] == "任务文件有误，未执行任何任务"
+    assert difficulty(a) == DIFFICULTY
+
+
+@pytest.fixture
+def registry_file(tmp_path, accounts):
+    db = str(tmp_path / 'accounts.db')
+    registry = Registry(db)
+    for account, folders in accounts.items():
+        registry.add_account(account)
+        for path, name in folders.items():
+            registry.add_folder(account, path, name)
+    registry.close()
+    return db
+
+
+def recorded(db):
+    registry = Registry(db)
+    try:
+        return {op['account']: op['updated'] for op in registry.operations()}
+    finally:
+        registry.close()
+
+
+def test_registry_records_operations(run_cli, registry_file):
+    code, _ = run_cli('--registry', registry_file, '--no-backup', jobs=[set_difficulty('困难')])
+    assert code == 0 and recorded(registry_file) == {'大号': 2}
+
+
+@pytest.mark.parametrize('batch', [False, True])
+def test_operations_are_recorded_for_each_account(run_cli, registry_file, batch):
+    args = ['--registry', registry_file, '--no-backup'] + (['--batch'] if batch else [])
+    code, _ = run_cli(*args, jobs=[set_difficulty('困难', accounts='*')])
+    assert code == 0
+    assert recorded(registry_file) == {'大号': 2, '小号': 2}  # 共用的目录计入两个账号
+
+
+def test_results_by_account(accounts):
+    (a, shared), (b, _) = list(accounts['大号']), list(accounts['小号'])
+    results = [TargetResult(path, name) for path, name in [(b, 'B'), (shared, '共用'), ('/elsewhere', '其他')]]
+    grouped = results_by_account(results, accounts, '默认')
+    assert list(grouped) == ['大号', '小号', '默认']
+    assert [[r.name for r in group] for group in grouped.values()] == [['共用'], ['B', '共用'], ['其他']]
@@ -0,0 +1,152 @@
+import json
+import os
+
+import pytest
+
+import doc_cache
+from doc_cache import DocumentCache, PartialDocument
+from save_codec import detect_encoding, decode_text
+from conftest import write
+
+
+@pytest.mark.parametrize('raw', [b'{"a": 1}', '{"a": "中文・"}'.encode('gb2312'),
+                                 '{"a": "𠀀·"}'.encode('gb18030'), b'{"a": "\xff"}'])
+def test_detect_encoding_matches_decode_text(raw):
+    assert detect_encoding(raw) == decode_text(raw)[1]
+
+
+def test_sections_use_encoding_of_whole_file(tmp_path):
+    # 'a' 本身可按 gb2312 解码，但整个文件是 gb18030：A1A4 应解码为 ·，与完整解析一致
+    path = str(tmp_path / 'Default.save')
+    text = json.dumps({"a": "奥丁·勋章", "键𠀀": [1, 2], "b": {"c": "𠀀"}}, ensure_ascii=False, indent=4)
+    write(path, text.encode('gb18030'))
+
+    partial = DocumentCache().load_sections(path, ['a', '键𠀀'])
+    full = DocumentCache().load(path)
+    assert partial.encoding == full.encoding == 'gb18030'
+    assert partial.data == {"a": full.data["a"], "键𠀀": [1, 2]}
+
+
+def save(path, data):
+    write(str(path), json.dumps(data).encode('gb2312'))
+    return str(path)
+
+
+class CountingParse:
+    """记录实际解析次数的 parse 函数"""
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, raw):
+        self.calls += 1
+        return doc_cache.parse_save(raw)
+
+
+def test_reuses_document_until_file_changes(tmp_path):
+    path = save(tmp_path / 'a.save', {"x": 1})
+    cache = DocumentCache()
+    doc = cache.load(path)
+    assert cache.load(path) is doc and (cache.hits, cache.misses) == (1, 1)
+
+    save(path, {"x": 22})  # 大小变化
+    assert cache.load(path).data == {"x": 22}
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # 只有 mtime 变化
+    assert cache.load(path).data == {"x": 22} and cache.misses == 3
+
+
+def test_replaced_file_with_same_size_and_mtime_is_reloaded(tmp_path):
+    path = save(tmp_path / 'a.save', {"x": 1})
+    cache = DocumentCache()
+    cache.load(path)
+    other = save(tmp_path / 'b.save', {"x": 2})
+    stat = os.stat(path)
+    os.utime(other, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(other, path)  # 同大小、同 mtime，只有 inode 不同
+    assert cache.load(path).data == {"x": 2}
+
+
+def test_invalidate_and_clear(tmp_path):
+    path = save(tmp_path / 'a.save', {"x": 1})
+    cache = DocumentCache()
+    cache.load(path)
+    cache.invalidate(path)
+    cache.load(path)
+    cache.clear()
+    cache.load(path)
+    assert cache.misses == 3 and cache.hits == 0
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    paths = [save(tmp_path / f'{name}.save', {"x": "0123456789"}) for name in 'abc']
+    size = os.path.getsize(paths[0])
+    cache = DocumentCache(max_bytes=size * 2)
+    a, b, c = paths
+    cache.load(a)
+    cache.load(b)
+    cache.load(a)  # a 最近使用过，淘汰 b
+    cache.load(c)
+    assert cache.misses == 3
+    cache.load(a)
+    cache.load(c)
+    assert cache.hits == 3
+    cache.load(b)
+    assert cache.misses == 4
+
+
+def test_documents_larger_than_cache_are_not_kept(tmp_path):
+    path = save(tmp_path / 'a.save', {"x": "0123456789"})
+    cache = DocumentCache(max_bytes=4)
+    cache.load(path)
+    cache.load(path)
+    assert cache.misses == 2
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = save(tmp_path / 'a.save', {"x": [1, 2]})
+    disk = str(tmp_path / 'disk')
+    parse = CountingParse()
+    DocumentCache(disk_dir=disk, parse=parse).load(path)
+
+    cache = DocumentCache(disk_dir=disk, parse=parse)
+    doc = cache.load(path)
+    assert doc.data == {"x": [1, 2]} and doc.encoding == 'gb2312'
+    assert (cache.disk_hits, parse.calls) == (1, 1)
+
+    save(path, {"x": [3]})  # 文件变化后磁盘缓存失效
+    assert DocumentCache(disk_dir=disk, parse=parse).load(path).data == {"x": [3]} and parse.calls == 2
+
+
+def test_disk_tier_ignores_other_versions(tmp_path, monkeypatch):
+    path = save(tmp_path / 'a.save', {"x": 1})
+    disk = str(tmp_path / 'disk')
+    parse = CountingParse()
+    DocumentCache(disk_dir=disk, parse=parse).load(path)
+    monkeypatch.setattr(doc_cache, 'DISK_CACHE_VERSION', doc_cache.DISK_CACHE_VERSION + 1)
+    cache = DocumentCache(disk_dir=disk, parse=parse)
+    cache.load(path)
+    assert cache.disk_hits == 0 and parse.calls == 2
+
+
+def test_partial_documents_merge_keys(tmp_path):
+    path = save(tmp_path / 'a.save', {"a": 1, "b": [2], "c": {"d": 3}})
+    cache = DocumentCache()
+    first = cache.load_sections(path, ['a', 'zzz'])
+    assert isinstance(first, PartialDocument) and first.data == {"a": 1} and 'zzz' in first.absent
+    second = cache.load_sections(path, ['b'])
+    assert second.data == {"a": 1, "b": [2]} and cache.misses == 2
+    assert cache.load_sections(path, ['a', 'b', 'zzz']) is second and cache.hits == 1
+    assert second.raw[slice(*second.spans['b'])] == b'[2]'
+
+
+def test_full_document_replaces_partial(tmp_path):
+    path = save(tmp_path / 'a.save', {"a": 1, "b": [2]})
+    cache = DocumentCache()
+    cache.load_sections(path, ['a'])
+    full = cache.load(path)
+    assert not isinstance(full, PartialDocument) and full.data == {"a": 1, "b": [2]}
+    partial = cache.load_sections(path, ['b'])
+    start = full.raw.find(b'[2]')
+    assert partial.data == {"b": [2]} and partial.spans == {"b": (start, start + 3)}
+    # 之后请求部分键不会用部分结果覆盖完整结果
+    assert cache.load(path) is full
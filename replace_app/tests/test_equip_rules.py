@@ -0,0 +1,114 @@
+import json
+import os
+
+import pytest
+
+from equip_rules import Rule, RuleSet, parse_rules, load_rules, RULE_EXACT, RULE_PREFIX, RULE_REGEX
+from engine import STATUS_UPDATED, STATUS_UNCHANGED
+from conftest import write, read
+
+
+def test_parse_rules_defaults_to_exact():
+    rules = parse_rules([{"match": "旧剑", "replace": "新剑"}])
+    assert len(rules) == 1 and rules.rules[0].kind == RULE_EXACT
+    assert rules.rewrite("旧剑") == "新剑"
+
+
+@pytest.mark.parametrize('items, message', [
+    ({"match": "a", "replace": "b"}, "JSON 数组"),
+    ([{"match": "a"}], "第 1 条规则应包含字符串 match 和 replace"),
+    ([{"match": "a", "replace": "b"}, {"type": "glob", "match": "a", "replace": "b"}], "第 2 条规则无效: 未知规则类型"),
+    ([{"match": "", "replace": "b"}], "缺少 match"),
+    ([{"type": "regex", "match": "(", "replace": "b"}], "正则表达式无效"),
+    ([{"type": "regex", "match": "^(a)$", "replace": "{2}"}], "不存在的分组 2"),
+    ([{"type": "regex", "match": "^(?P<x>a)$", "replace": "{y}"}], "不存在的分组 y"),
+])
+def test_parse_rules_rejects_invalid_rules(items, message):
+    with pytest.raises(ValueError, match=message):
+        parse_rules(items)
+
+
+def test_load_rules(tmp_path):
+    path = str(tmp_path / 'rules.json')
+    write(path, json.dumps([{"type": "prefix", "match": "旧套装・", "replace": "新套装・"}]).encode('utf-8'))
+    assert load_rules(path).rewrite("旧套装・头盔") == "新套装・头盔"
+
+
+def test_priority_exact_then_longest_prefix_then_regex():
+    rules = RuleSet([
+        Rule(RULE_REGEX, r'^(.+)$', '正则{1}'),
+        Rule(RULE_PREFIX, '旧', '短'),
+        Rule(RULE_PREFIX, '旧套装', '长'),
+        Rule(RULE_EXACT, '旧套装头盔', '精确'),
+    ])
+    assert rules.rewrite('旧套装头盔') == '精确'
+    assert rules.rewrite('旧套装鞋') == '长鞋'
+    assert rules.rewrite('旧剑') == '短剑'
+    assert rules.rewrite('剑') == '正则剑'
+    assert rules.describe() == '4 条规则'
+
+
+def test_rewrite_applies_once_and_returns_none_when_unchanged():
+    rules = RuleSet([Rule(RULE_EXACT, 'a', 'b'), Rule(RULE_EXACT, 'b', 'c'), Rule(RULE_EXACT, 'x', 'x')])
+    assert rules.rewrite('a') == 'b'  # 不会继续套用 b -> c
+    assert rules.rewrite('x') is None
+    assert rules.rewrite('y') is None
+    assert rules.rewrite(None) is None
+
+
+def test_names_are_normalized():
+    rules = RuleSet([Rule(RULE_EXACT, '奥丁·勋章', '新勋章')])
+    assert rules.rewrite('奥丁・勋章') == '新勋章'
+
+
+@pytest.mark.parametrize('template, name, expected', [
+    ('{1}+{2+1}', '勋章+4', '勋章+5'),
+    ('{1}+{2-1}', '勋章+10', '勋章+9'),
+    ('{1}+{2+10}', '勋章+0', '勋章+10'),
+    ('{{{1}}}+{2}', '勋章+4', '{勋章}+4'),
+    ('{name}:{level+2}', '勋章+4', '勋章:6'),
+])
+def test_template_expansion(template, name, expected):
+    rules = RuleSet([Rule(RULE_REGEX, r'^(?P<name>.+)\+(?P<level>\d+)$', template)])
+    assert rules.rewrite(name) == expected
+
+
+def test_arithmetic_on_non_digit_group_is_reported_not_raised():
+    rules = parse_rules([
+        {"type": "regex", "match": r"^(.+)\+(\w+)$", "replace": "{1}+{2+1}"},
+        {"type": "regex", "match": r"^(.+)\+x$", "replace": "{1}+y"},
+    ])
+    assert rules.rewrite('剑+4') == '剑+5' and rules.error('剑+4') is None
+    # 第一条规则无法展开时继续尝试后面的规则
+    assert rules.rewrite('剑+x') == '剑+y' and rules.error('剑+x') is None
+    assert rules.rewrite('剑+z') is None
+    assert "不是数字" in rules.error('剑+z')
+
+
+@pytest.fixture
+def config(tmp_path):
+    config = tmp_path / 'config'
+    config.mkdir()
+    suits = {"diysuit_item": [{"name": "套装", "data": {"1": "剑+4", "2": "剑+z"}}]}
+    write(str(config / 'Config.save'), json.dumps(suits, ensure_ascii=False).encode('gb2312'))
+    return str(config)
+
+
+def suit_data(config):
+    return json.loads(read(os.path.join(config, 'Config.save')).decode('gb2312'))["diysuit_item"][0]["data"]
+
+
+def test_rewrite_equipment_reports_rules_that_cannot_apply(engine, config):
+    rules = parse_rules([{"type": "regex", "match": r"^(.+)\+(\w+)$", "replace": "{1}+{2+1}"}])
+    result, = engine.rewrite_equipment([(config, '配置')], rules, backup=False)
+    assert result.status == STATUS_UPDATED and result.count == 1
+    assert any('套装/2 未改写' in message for message in result.messages)
+    assert suit_data(config) == {"1": "剑+5", "2": "剑+z"}
+
+
+def test_config_with_only_unapplicable_rules_is_still_reported(engine, config):
+    rules = parse_rules([{"type": "regex", "match": r"^剑\+(z)$", "replace": "剑+{1+1}"}])
+    result, = engine.rewrite_equipment([(config, '配置')], rules, backup=False)
+    assert result.status == STATUS_UNCHANGED
+    assert any('套装/2 未改写' in message for message in result.messages)
+    assert suit_data(config) == {"1": "剑+4", "2": "剑+z"}
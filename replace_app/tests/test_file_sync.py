@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+import file_sync
+from file_sync import content_digest, file_digest, same_content, copy_file, set_digest_store, flush_digests
+from engine import STATUS_UPDATED, STATUS_UNCHANGED
+from conftest import write, read
+
+
+class MemoryStore:
+    """提供 get_digest / put_digests 的持久化哈希记录"""
+    def __init__(self, saved=None):
+        self.saved = dict(saved or {})
+        self.batches = []
+
+    def get_digest(self, path):
+        return self.saved.get(path)
+
+    def put_digests(self, items):
+        self.batches.append(items)
+        for path, key, digest in items:
+            self.saved[path] = (key, digest)
+
+
+@pytest.fixture(autouse=True)
+def fresh_digests():
+    file_sync._digests.clear()
+    yield
+    set_digest_store(None)
+    file_sync._digests.clear()
+
+
+def test_file_digest_matches_content_digest(tmp_path):
+    path = str(tmp_path / 'a.lua')
+    write(path, b'x' * 3000000)
+    assert file_digest(path) == content_digest(b'x' * 3000000)
+
+
+def test_digests_are_reused_from_store_and_flushed_in_one_batch(tmp_path):
+    a, b = str(tmp_path / 'a.lua'), str(tmp_path / 'b.lua')
+    write(a, b'a')
+    write(b, b'b')
+    store = MemoryStore({os.path.abspath(a): (file_sync.file_key(a), 'stored')})
+    set_digest_store(store)
+    assert file_digest(a) == 'stored'  # 文件标识未变，不重新计算
+    assert file_digest(b) == content_digest(b'b')
+    assert store.batches == []
+    flush_digests()
+    assert [[path for path, _, _ in batch] for batch in store.batches] == [[os.path.abspath(b)]]
+    flush_digests()
+    assert len(store.batches) == 1
+
+
+def test_changed_file_is_rehashed(tmp_path):
+    path = str(tmp_path / 'a.lua')
+    write(path, b'old')
+    file_digest(path)
+    write(path, b'newer')
+    assert file_digest(path) == content_digest(b'newer')
+
+
+def test_same_content(tmp_path):
+    a, b, c = (str(tmp_path / name) for name in ('a', 'b', 'c'))
+    write(a, b'same')
+    write(b, b'same')
+    write(c, b'diff')
+    assert same_content(a, b)
+    assert not same_content(a, c)
+    assert not same_content(a, str(tmp_path / 'missing'))
+
+
+@pytest.mark.parametrize('kernel', [True, False])
+def test_copy_file_copies_content_and_mtime(tmp_path, monkeypatch, kernel):
+    if not kernel:
+        def unsupported(*args):
+            raise OSError("不支持")
+        monkeypatch.setattr(os, 'copy_file_range', unsupported, raising=False)
+        monkeypatch.setattr(os, 'sendfile', unsupported, raising=False)
+    source, target = str(tmp_path / 'source'), str(tmp_path / 'target')
+    write(source, os.urandom(100000))
+    os.utime(source, (1000, 1000))
+    copy_file(source, target)
+    assert read(target) == read(source) and os.path.getmtime(target) == 1000
+
+
+def test_sync_lua_files_copies_only_changed_files(engine, tmp_path):
+    source, target = tmp_path / 'source', tmp_path / 'target'
+    source.mkdir()
+    target.mkdir()
+    write(str(source / 'same.lua'), b'same')
+    write(str(target / 'same.lua'), b'same')
+    write(str(source / 'new.lua'), b'new')
+    write(str(source / 'changed.lua'), b'changed')
+    write(str(target / 'changed.lua'), b'old')
+
+    result, = engine.sync_lua_files(str(source), [(str(target), '目标')],
+                                    ['same.lua', 'new.lua', 'changed.lua', 'missing.lua'], backup=False)
+    assert result.status == STATUS_UPDATED
+    assert (result.count, result.skip_count, result.error_count) == (2, 1, 1)
+    assert read(str(target / 'new.lua')) == b'new' and read(str(target / 'changed.lua')) == b'changed'
+
+    result, = engine.sync_lua_files(str(source), [(str(target), '目标')], ['same.lua', 'new.lua'], backup=False)
+    assert result.status == STATUS_UNCHANGED and result.skip_count == 2
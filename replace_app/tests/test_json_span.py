@@ -0,0 +1,118 @@
+import json
+
+import pytest
+
+from json_span import find_span, array_elements, object_members, member_spans, apply_patches
+from save_codec import encode_text, parse_save
+
+CONFIG = {
+    "diysuit_item": [
+        {"name": "存仓", "data": {"1": "清醒者的奥丁勋章+4", "2": "剑・一"}},
+        {"name": "打怪", "data": {"3": "帽子"}},
+    ],
+    "other": [1, 2.5, True, None, "a\"b"],
+}
+
+
+def dump(value, indent='\t', colon=': ', newline='\n'):
+    text = json.dumps(value, ensure_ascii=False, indent=indent, separators=(',', colon))
+    return encode_text(text.replace('\n', newline))
+
+
+@pytest.mark.parametrize('indent, colon, newline', [
+    ('\t', ':\t', '\n'),
+    (4, ': ', '\n'),
+    (2, ':', '\r\n'),
+    (None, ':', '\n'),
+])
+def test_find_span_locates_values(indent, colon, newline):
+    raw = dump(CONFIG, indent, colon, newline)
+    start, end = find_span(raw, ["diysuit_item"])
+    assert parse_save(raw[start:end])[0] == CONFIG["diysuit_item"]
+    suits = array_elements(raw, start)
+    assert len(suits) == 2
+    data_start, data_end = object_members(raw, suits[0][0])["data"]
+    slots = object_members(raw, data_start)
+    assert parse_save(raw[slots["2"][0]:slots["2"][1]])[0] == "剑・一"
+    assert set(member_spans(raw, ["other", "missing"])) == {"other"}
+
+
+def test_patching_a_span_keeps_other_bytes():
+    raw = dump(CONFIG)
+    suits_start = find_span(raw, ["diysuit_item"])[0]
+    data_start = object_members(raw, array_elements(raw, suits_start)[0][0])["data"][0]
+    start, end = object_members(raw, data_start)["1"]
+    new_value = encode_text(json.dumps("清醒者的奥丁勋章+5", ensure_ascii=False))
+    patched = apply_patches(raw, [(start, end, new_value)])
+    assert patched[:start] == raw[:start] and patched[start + len(new_value):] == raw[end:]
+    assert parse_save(patched)[0]["diysuit_item"][0]["data"]["1"] == "清醒者的奥丁勋章+5"
+
+
+STYLES = [
+    ('\t', ':\t', '\n'),
+    ('\t', ': ', '\r\n'),
+    (4, ': ', '\n'),
+    (2, ':', '\n'),
+    (None, ':', '\n'),
+    (None, ': ', '\n'),
+]
+
+EDITS = [
+    lambda d: d,
+    lambda d: d["diysuit_item"][0]["data"].update({"1": "清醒者的奥丁勋章+5"}),
+    lambda d: d["diysuit_item"][0]["data"].update({"9": "新装备"}),
+    lambda d: d["diysuit_item"][0]["data"].pop("1"),
+    lambda d: d["diysuit_item"][1]["data"].pop("3"),
+    lambda d: d["diysuit_item"].append({"name": "新配置", "data": {}}),
+    lambda d: d["diysuit_item"].pop(),
+    lambda d: d.update({"other": [], "added": {"k": [1, {"x": None}]}}),
+    lambda d: d["other"].__setitem__(1, 2),
+    lambda d: d.pop("other"),
+]
+
+
+@pytest.mark.parametrize('indent, colon, newline', STYLES)
+@pytest.mark.parametrize('edit', range(len(EDITS)))
+def test_dumps_preserving_round_trip(indent, colon, newline, edit):
+    from json_span import dumps_preserving
+    raw = dump(CONFIG, indent, colon, newline)
+    new = json.loads(json.dumps(CONFIG))
+    EDITS[edit](new)
+    out = dumps_preserving(raw, CONFIG, new)
+    assert parse_save(out)[0] == new
+    # 再写回原内容得到原来的字节
+    back = dumps_preserving(out, new, CONFIG)
+    if edit == 3:
+        # 删除后重新加入的键排在末尾，只比较内容
+        assert parse_save(back)[0] == CONFIG
+    else:
+        assert back == raw
+    if newline == '\r\n':
+        assert b'\n' not in out.replace(b'\r\n', b'')
+
+
+@pytest.mark.parametrize('indent, colon, newline', STYLES)
+def test_unchanged_value_keeps_bytes(indent, colon, newline):
+    from json_span import dumps_preserving
+    raw = dump(CONFIG, indent, colon, newline)
+    assert dumps_preserving(raw, CONFIG, json.loads(json.dumps(CONFIG))) == raw
+
+
+def test_diff_patches_only_touch_changed_subtree():
+    from json_span import diff_patches, detect_style
+    raw = dump(CONFIG)
+    start, end = find_span(raw, ["diysuit_item"])
+    new = json.loads(json.dumps(CONFIG["diysuit_item"]))
+    new[1]["data"]["3"] = "头盔"
+    patches = diff_patches(raw, start, end, CONFIG["diysuit_item"], new, detect_style(raw))
+    assert len(patches) == 1
+    patch_start, patch_end, data = patches[0]
+    assert parse_save(raw[patch_start:patch_end])[0] == "帽子"
+    assert data == encode_text('"头盔"')
+
+
+def test_same_distinguishes_number_types():
+    from json_span import dumps_preserving
+    raw = b'{"a": 1, "b": true}'
+    assert parse_save(dumps_preserving(raw, {"a": 1, "b": True}, {"a": 1.0, "b": 1}))[0] == {"a": 1.0, "b": 1}
+    assert dumps_preserving(raw, {"a": 1, "b": True}, {"a": 1.0, "b": 1}) == b'{"a": 1.0, "b": 1}'
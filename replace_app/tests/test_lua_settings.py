@@ -0,0 +1,50 @@
+import pytest
+
+from lua_settings import LuaSettings, parse, KEY_DIFFICULTY, KEY_EXPLORE
+
+
+@pytest.mark.parametrize('text, value', [
+    ('副本难度=普通\n探索副本=关闭\n', '普通'),
+    ('local 副本难度 = 3', '3'),
+    ('a=1 副本难度=5', '5'),
+    ('a=1; 副本难度="困难"', '困难'),
+    ('-- 副本难度=9\n副本难度=2', '2'),
+    ('x = "s" 副本难度 = -1', '-1'),
+])
+def test_finds_top_level_keys(text, value):
+    assert parse(text)[KEY_DIFFICULTY].value == value
+
+
+@pytest.mark.parametrize('text', [
+    't = {副本难度=1}',
+    't.副本难度 = 4',
+    'for 副本难度 = 1, 2 do end',
+    'a, 副本难度 = 1, 2',
+])
+def test_ignores_nested_and_non_setting_names(text):
+    assert KEY_DIFFICULTY not in parse(text)
+
+
+def test_update_keeps_other_text():
+    settings = LuaSettings('local 副本难度 = "普通" -- 注释\n其他=1\n')
+    text, changed, missing = settings.update({KEY_DIFFICULTY: '困难'})
+    assert text == 'local 副本难度 = "困难" -- 注释\n其他=1\n'
+    assert changed == [KEY_DIFFICULTY] and missing == []
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('副本难度="普通"\r\n其他=1', '副本难度="普通"\r\n探索副本="开启"\r\n其他=1'),
+    ("副本难度='普通' -- 注释\n", "副本难度='普通' -- 注释\n探索副本='开启'\n"),
+    ('副本难度=3\n', '副本难度=3\n探索副本=开启\n'),
+])
+def test_inserted_key_uses_anchor_quote(text, expected):
+    settings = LuaSettings(text)
+    new_text, changed, missing = settings.update({KEY_EXPLORE: '开启'}, {KEY_EXPLORE: KEY_DIFFICULTY})
+    assert new_text == expected and changed == [KEY_EXPLORE]
+    assert LuaSettings(new_text).get(KEY_EXPLORE) == '开启'
+
+
+def test_missing_key_without_anchor_is_reported():
+    settings = LuaSettings('其他=1\n')
+    text, changed, missing = settings.update({KEY_EXPLORE: '开启'}, {KEY_EXPLORE: KEY_DIFFICULTY})
+    assert text == '其他=1\n' and changed == [] and missing == [KEY_EXPLORE]
@@ -0,0 +1,86 @@
+import os
+import threading
+
+import pytest
+
+from op_queue import OperationQueue
+from engine import STATUS_FAILED, STATUS_CANCELLED
+from conftest import write, read
+
+LUA_FILE = 'settings.lua'
+
+
+def set_values(targets, values, lua_file=LUA_FILE):
+    """把 values 写入各目标配置中 lua_file 的队列操作（文件不存在时失败）"""
+    return lambda engine, **kwargs: engine.set_lua_settings(
+        targets, [lua_file], values, missing_ok=False, description=f"设置 {values}", **kwargs)
+
+
+def lua(config):
+    return read(os.path.join(config, LUA_FILE))
+
+
+@pytest.fixture
+def targets(tmp_path):
+    configs = []
+    for name in ('a', 'b'):
+        config = tmp_path / name
+        config.mkdir()
+        write(str(config / LUA_FILE), b'x=1\ny=1\n')
+        configs.append((str(config), name))
+    return configs
+
+
+def test_operations_see_earlier_results_and_commit_once(engine, targets):
+    (a, _), (b, _) = targets
+    queue = OperationQueue(engine)
+    queue.add(set_values(targets, {'x': '2'}), '第一项')
+    queue.add(set_values(targets[:1], {'y': '3'}), '第二项')
+    outcomes = queue.execute(backup=True)
+    assert [description for description, _ in outcomes] == ['第一项', '第二项']
+    assert lua(a) == b'x=2\ny=3\n' and lua(b) == b'x=2\ny=1\n'
+    assert len(queue) == 0
+    # 一次提交只有一条撤销记录，撤销后回到执行前
+    engine.undo()
+    assert lua(a) == lua(b) == b'x=1\ny=1\n'
+
+
+def test_dry_run_keeps_queue_and_files(engine, targets):
+    queue = OperationQueue(engine)
+    queue.add(set_values(targets, {'x': '2'}), '设置')
+    outcomes = queue.execute(dry_run=True)
+    paths = {change.path for _, results in outcomes for result in results for change in result.changes}
+    assert paths == {os.path.join(config, LUA_FILE) for config, _ in targets}
+    assert lua(targets[0][0]) == b'x=1\ny=1\n' and len(queue) == 1
+
+
+def test_failure_keeps_operations_queued(engine, targets):
+    queue = OperationQueue(engine)
+    queue.add(set_values(targets, {'x': '2'}), '第一项')
+    queue.add(set_values(targets, {'y': '2'}, 'missing.lua'), '第二项')
+    outcomes = queue.execute()
+    assert any(r.status == STATUS_FAILED for _, results in outcomes for r in results)
+    assert lua(targets[0][0]) == b'x=1\ny=1\n'
+    assert queue.describe() == ['第一项', '第二项']
+
+
+def test_cancel_keeps_operations_queued(engine, targets):
+    queue = OperationQueue(engine)
+    cancel = threading.Event()
+    cancel.set()
+    queue.add(set_values(targets, {'x': '2'}), '设置')
+    outcomes = queue.execute(cancel=cancel)
+    assert all(r.status == STATUS_CANCELLED for _, results in outcomes for r in results)
+    assert lua(targets[0][0]) == b'x=1\ny=1\n' and queue.describe() == ['设置']
+
+
+def test_error_keeps_operations_queued(engine, targets):
+    def broken(engine, **kwargs):
+        raise RuntimeError("出错")
+
+    queue = OperationQueue(engine)
+    queue.add(set_values(targets, {'x': '2'}), '设置')
+    queue.add(broken, '出错')
+    with pytest.raises(RuntimeError):
+        queue.execute()
+    assert lua(targets[0][0]) == b'x=1\ny=1\n' and len(queue) == 2
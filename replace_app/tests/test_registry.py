@@ -0,0 +1,98 @@
+import json
+import os
+
+import pytest
+
+import registry as registry_module
+from registry import Registry
+from conftest import write, read
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = Registry(str(tmp_path / 'accounts.db'))
+    yield registry
+    registry.close()
+
+
+def test_accounts_and_folders_keep_insertion_order(registry):
+    registry.add_account('大号', 'fav')
+    registry.add_account('小号')
+    registry.add_account('大号')  # 已存在时不修改
+    registry.add_folder('大号', '/c2', '角色2')
+    registry.add_folder('大号', '/c1', '角色1')
+    registry.add_folder('小号', '/c1', '角色1')
+    registry.add_folder('大号', '/c2', '改名')  # 已存在时更新名称
+    accounts = registry.accounts()
+    assert list(accounts) == ['大号', '小号']
+    assert accounts['大号'] == {'configurations': {'/c2': '改名', '/c1': '角色1'}, 'count': 2,
+                               'function4_config_name': 'fav'}
+    assert registry.folder_accounts('/c1') == ['大号', '小号']
+
+
+def test_rename_remove_and_cascade(registry):
+    registry.add_account('大号')
+    registry.add_folder('大号', '/c1', '角色1')
+    registry.add_folder('大号', '/c2', '角色2')
+    registry.rename_folder('大号', '/c1', '主号')
+    registry.remove_folder('大号', '/c2')
+    registry.set_function4_config_name('大号', 'cfg')
+    assert registry.accounts()['大号']['configurations'] == {'/c1': '主号'}
+    assert registry.accounts()['大号']['function4_config_name'] == 'cfg'
+    registry.remove_account('大号')
+    assert registry.accounts() == {} and registry.folder_accounts('/c1') == []
+    with pytest.raises(ValueError, match='找不到账号'):
+        registry.add_folder('大号', '/c1', '角色1')
+
+
+def test_digests_are_stored_per_file_key(registry):
+    assert registry.get_digest('/a') is None
+    registry.put_digests([('/a', (1, 2, 3), 'x'), ('/b', (4, 5, 6), 'y')])
+    registry.put_digests([('/a', (7, 8, 9), 'z')])
+    assert registry.get_digest('/a') == ((7, 8, 9), 'z')
+    assert registry.get_digest('/b') == ((4, 5, 6), 'y')
+
+
+def test_operations_newest_first(registry):
+    registry.record_operation('大号', '第一次', 2, 0, 'b1')
+    registry.record_operation(None, '第二次', failed=1)
+    operations = registry.operations()
+    assert [op['description'] for op in operations] == ['第二次', '第一次']
+    assert operations[1]['account'] == '大号' and operations[1]['updated'] == 2 and operations[1]['backup_id'] == 'b1'
+    assert len(registry.operations(limit=1)) == 1
+
+
+def test_json_round_trip_and_legacy_import(tmp_path, registry):
+    registry.add_account('大号', 'fav')
+    registry.add_folder('大号', '/c1', '角色1')
+    exported = str(tmp_path / 'accounts_config.json')
+    registry.export_json(exported)
+    assert json.loads(read(exported).decode('utf-8'))['accounts'] == registry.accounts()
+    assert b'\r\n' not in read(exported)
+
+    # 新建数据库时自动导入旧的 JSON 配置，之后不再导入
+    db = str(tmp_path / 'new.db')
+    imported = Registry(db, legacy_file=exported)
+    try:
+        assert imported.imported and imported.accounts() == registry.accounts()
+    finally:
+        imported.close()
+    write(exported, json.dumps({'accounts': {'其他': {'configurations': {}}}}).encode('utf-8'))
+    reopened = Registry(db, legacy_file=exported)
+    try:
+        assert not reopened.imported and list(reopened.accounts()) == ['大号']
+        assert reopened.import_json(exported) == 1  # 手动导入时与现有账号合并
+        assert list(reopened.accounts()) == ['大号', '其他']
+    finally:
+        reopened.close()
+
+
+def test_main_imports_and_exports(tmp_path, capsys):
+    source = str(tmp_path / 'in.json')
+    write(source, json.dumps({'accounts': {'大号': {'configurations': {'/c1': '角色1'}}}}).encode('utf-8'))
+    db = str(tmp_path / 'cli.db')
+    assert registry_module.main(['import', source, '--db', db]) == 0
+    target = str(tmp_path / 'out.json')
+    assert registry_module.main(['export', target, '--db', db]) == 0
+    assert json.loads(read(target).decode('utf-8'))['accounts']['大号']['configurations'] == {'/c1': '角色1'}
+    assert os.path.exists(db)
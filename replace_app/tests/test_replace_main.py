@@ -0,0 +1,32 @@
+import os
+
+from equip_rules import parse_rules
+from replace_main import ReplaceConfig
+from conftest import write, read
+
+SUIT = '{\r\n  "diysuit_item": [ {"name": "套装", "data": {"1": "旧剑", "2": "盾"}} ]\r\n}'.encode('gb2312')
+
+
+def run(tmp_path, rules):
+    write(str(tmp_path / 'diy.suit'), SUIT)
+    config = ReplaceConfig(str(tmp_path), journal_dir=str(tmp_path / 'journal'))
+    config.run(parse_rules(rules))
+    return config
+
+
+def test_replaces_names_keeping_layout(tmp_path):
+    config = run(tmp_path, [{"match": "旧剑", "replace": "新剑"}])
+    assert config.count == 1
+    assert read(config.file_path) == SUIT.replace('旧剑'.encode('gb2312'), '新剑'.encode('gb2312'))
+    assert os.listdir(tmp_path / 'journal') == []
+    assert [name for name in os.listdir(tmp_path) if '.txn-' in name] == []
+
+
+def test_unchanged_file_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'diy.suit')
+    write(path, SUIT)
+    os.utime(path, (1, 1))
+    config = ReplaceConfig(str(tmp_path), journal_dir=str(tmp_path / 'journal'))
+    config.run(parse_rules([{"match": "不存在", "replace": "新剑"}]))
+    assert config.count == 0
+    assert read(path) == SUIT and os.stat(path).st_mtime == 1
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from save_codec import decode_text, encode_text, encode_value, parse_save, to_gb2312
+from doc_cache import value_digest
+from lua_settings import LuaSettings
+
+
+@pytest.mark.parametrize('raw', [
+    b'A\xa8DB\xff',  # A844（―）与无法解码的字节
+    b'\x819\xa79',  # U+30FB 的四字节形式
+    b'\xa1\xa4\xa1\xaa\x819\xa79\xa8D',  # A1A4、A1AA 与它们在 gb2312 中对应字符的 GB18030 编码
+    '剑・一'.encode('gb2312'),
+])
+def test_decode_encode_round_trip(raw):
+    text, encoding = decode_text(raw)
+    assert encode_text(text, encoding) == raw
+
+
+def test_lua_settings_keeps_unrelated_bytes():
+    raw = '副本难度=普通\n名称="剑'.encode('gb2312') + b'\x819\xa79\xa8D"\n'
+    settings = LuaSettings.from_bytes(raw)
+    text, changed, _ = settings.update({'副本难度': '困难'})
+    assert changed == ['副本难度']
+    assert settings.encode(text) == raw.replace('普通'.encode('gb2312'), '困难'.encode('gb2312'))
+
+
+def test_values_compare_across_encodings():
+    gb2312_data, _ = parse_save(json.dumps({'a': '剑・一―'}, ensure_ascii=False).encode('gb2312'))
+    gbk_data, encoding = parse_save(b'{"a": "\xbd\xa3\xa1\xa4\xd2\xbb\xa1\xaa", "b": "\x819\xa79"}')
+    assert encoding == 'gb18030'
+    assert value_digest(gb2312_data['a']) == value_digest(gbk_data['a'])
+    assert to_gb2312(gbk_data['a']) == gb2312_data['a']
+
+
+def test_encode_value_uses_game_bytes_in_gb18030_files():
+    assert encode_value('"剑・一"', 'gb18030') == '"剑・一"'.encode('gb2312')
+    assert encode_value('"剑・一"', 'gb2312') == '"剑・一"'.encode('gb2312')
@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from schema import Schema, CONFIG_SCHEMA, DEFAULT_SCHEMA, DIY_SUIT_SCHEMA, OPTION_SECTIONS
+from engine import OPTION_FIELDS, STATUS_INVALID, STATUS_UPDATED
+from conftest import write, read
+
+
+def test_type_required_properties_and_items():
+    schema = Schema('测试', {
+        'type': 'object',
+        'required': ['name'],
+        'properties': {
+            'name': {'type': 'string'},
+            'level': {'type': 'integer'},
+            'tags': {'type': 'array', 'items': {'type': 'string'}},
+            'extra': {'type': 'object', 'additionalProperties': {'type': ['number', 'null']}},
+        },
+    })
+    assert schema.errors({'name': 'a', 'level': 1, 'tags': ['x'], 'extra': {'a': 1.5, 'b': None}, 'other': 1}) == []
+    assert schema.errors({'level': True, 'tags': ['x', 2], 'extra': {'a': 'x'}}) == [
+        '<根>: 缺少 name',
+        'level: 应为 integer，实际为 boolean',
+        'tags[1]: 应为 string，实际为 integer',
+        'extra.a: 应为 number/null，实际为 string',
+    ]
+    assert schema.errors([]) == ['<根>: 应为 object，实际为 array']
+
+
+def test_errors_are_limited():
+    schema = Schema('测试', {'type': 'array', 'items': {'type': 'string'}})
+    errors = schema.errors(list(range(15)), limit=3)
+    assert len(errors) == 4 and errors[-1] == '……另有 12 处错误'
+
+
+def test_unknown_type_is_rejected_when_compiling():
+    with pytest.raises(ValueError, match='未知类型'):
+        Schema('测试', {'type': 'text'})
+
+
+def test_config_schema_checks_suits():
+    assert CONFIG_SCHEMA.errors({'diysuit_item': [{'name': '套装', 'data': {'1': '剑'}}]}) == []
+    assert CONFIG_SCHEMA.errors({'diysuit_item': [{'data': {'1': 2}}]}) == [
+        'diysuit_item[0]: 缺少 name', 'diysuit_item[0].data.1: 应为 string，实际为 integer']
+
+
+def test_default_schema_describes_every_copied_option():
+    fields = {field for options in OPTION_FIELDS.values() for field, _ in options}
+    assert fields == set(OPTION_SECTIONS)
+    assert DEFAULT_SCHEMA.errors({'item_use_data': [{'name': '药'}], 'store_items': {}, 'other': 1}) == []
+    assert DEFAULT_SCHEMA.errors({'item_use_data': '药', 'item_filter_1': None}) == [
+        'item_use_data: 应为 object/array，实际为 string', 'item_filter_1: 应为 object/array，实际为 null']
+    assert DIY_SUIT_SCHEMA.errors({'diysuit_other': 1}) == ['diysuit_other: 应为 object/array，实际为 integer']
+
+
+def default_save(config, data):
+    os.makedirs(config, exist_ok=True)
+    path = os.path.join(config, 'Default.save')
+    write(path, json.dumps(data, ensure_ascii=False, indent=4).encode('gb2312'))
+    return path
+
+
+def test_copy_options_rejects_malformed_source(engine, tmp_path):
+    source = str(tmp_path / 'source')
+    default_save(source, {'item_use_data': '坏数据'})
+    default_save(str(tmp_path / 'target'), {'item_use_data': []})
+    with pytest.raises(ValueError, match='item_use_data: 应为 object/array'):
+        engine.copy_options(source, [(str(tmp_path / 'target'), '目标')], OPTION_FIELDS['item_use'], backup=False)
+
+
+def test_copy_options_excludes_malformed_targets(engine, tmp_path):
+    source = str(tmp_path / 'source')
+    default_save(source, {'item_use_data': [{'name': '药'}]})
+    good = default_save(str(tmp_path / 'good'), {'item_use_data': []})
+    bad = default_save(str(tmp_path / 'bad'), {'item_use_data': 1})
+    before = read(bad)
+    results = engine.copy_options(source, [(str(tmp_path / 'good'), '好'), (str(tmp_path / 'bad'), '坏')],
+                                  OPTION_FIELDS['item_use'], backup=False)
+    assert [r.status for r in results] == [STATUS_UPDATED, STATUS_INVALID]
+    assert json.loads(read(good).decode('gb2312'))['item_use_data'] == [{'name': '药'}]
+    assert read(bad) == before
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from suit_sync import section_key, SECTION_ITEM, DIY_SUIT_FILE
+from engine import STATUS_UPDATED, STATUS_UNCHANGED, STATUS_SKIPPED
+from conftest import write, read
+
+
+def diy_suit(config, data, indent=4):
+    os.makedirs(config, exist_ok=True)
+    path = os.path.join(config, DIY_SUIT_FILE)
+    write(path, json.dumps(data, ensure_ascii=False, indent=indent).encode('gb2312'))
+    return path
+
+
+def load(path):
+    return json.loads(read(path).decode('gb2312'))
+
+
+SOURCE = {
+    'diysuit_item': [{'name': '存仓', 'data': {'1': '新剑'}}, {'name': '打怪', 'data': {'1': '源盾'}}],
+    'diysuit_property': {'a': 2},
+    'diysuit_other': [1, 2],
+}
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = str(tmp_path / 'source')
+    diy_suit(path, SOURCE)
+    return path
+
+
+def sync(engine, source, targets, sections, suits=None):
+    return engine.sync_suit_sections(source, targets, sections, suits, backup=False)
+
+
+def test_section_key_accepts_labels_and_keys():
+    assert section_key('装备') == SECTION_ITEM
+    assert section_key('diysuit_awaken') == 'diysuit_awaken'
+    with pytest.raises(ValueError, match='不存在'):
+        section_key('外观')
+
+
+def test_whole_sections_are_replaced_and_identical_ones_skipped(engine, source, tmp_path):
+    target = str(tmp_path / 'target')
+    path = diy_suit(target, {'diysuit_item': [], 'diysuit_property': {'a': 1}, 'diysuit_other': [1, 2],
+                             'extra': '保持不变'}, indent=2)
+    result, = sync(engine, source, [(target, '目标')], ['超越', '其他'])
+    assert result.status == STATUS_UPDATED and result.count == 1 and result.skip_count == 1
+    data = load(path)
+    assert data['diysuit_property'] == {'a': 2} and data['extra'] == '保持不变'
+    assert read(path).startswith(b'{\n  "diysuit_item": []')  # 其余内容保留原排版
+
+    result, = sync(engine, source, [(target, '目标')], ['超越', '其他'])
+    assert result.status == STATUS_UNCHANGED
+
+
+def test_selected_suits_replace_data_and_append_missing(engine, source, tmp_path):
+    target = str(tmp_path / 'target')
+    path = diy_suit(target, {'diysuit_item': [{'name': '打怪', 'data': {'1': '旧盾'}},
+                                              {'name': '存仓', 'data': {'1': '旧剑', '2': '旧甲'}}]})
+    result, = sync(engine, source, [(target, '目标')], ['装备'], ['存仓'])
+    assert result.status == STATUS_UPDATED
+    suits = load(path)['diysuit_item']
+    assert suits == [{'name': '打怪', 'data': {'1': '旧盾'}}, {'name': '存仓', 'data': {'1': '新剑'}}]
+
+    other = str(tmp_path / 'other')
+    path = diy_suit(other, {'diysuit_item': [{'name': '打怪', 'data': {}}]})
+    empty = str(tmp_path / 'empty')
+    empty_path = diy_suit(empty, {'diysuit_property': {}})
+    sync(engine, source, [(other, '其他'), (empty, '空')], ['装备'], ['存仓', '打怪'])
+    assert load(path)['diysuit_item'] == SOURCE['diysuit_item'][::-1]
+    assert load(empty_path)['diysuit_item'] == SOURCE['diysuit_item']
+
+
+def test_whole_item_section_without_suit_names(engine, source, tmp_path):
+    target = str(tmp_path / 'target')
+    path = diy_suit(target, {'diysuit_item': [{'name': '打怪', 'data': {}}]})
+    sync(engine, source, [(target, '目标')], ['装备'])
+    assert load(path)['diysuit_item'] == SOURCE['diysuit_item']
+
+
+def test_targets_without_file_are_skipped_and_source_excluded(engine, source, tmp_path):
+    missing = str(tmp_path / 'missing')
+    os.makedirs(missing)
+    results = sync(engine, source, [(source, '源'), (missing, '缺少')], ['超越'])
+    assert [(r.name, r.status) for r in results] == [('缺少', STATUS_SKIPPED)]
+
+
+@pytest.mark.parametrize('sections, suits, message', [
+    (['觉醒'], None, '源文件中没有 diysuit_awaken'),
+    (['装备'], ['不存在'], "没有名为 '不存在' 的装备配置"),
+])
+def test_invalid_plan_is_rejected(engine, source, tmp_path, sections, suits, message):
+    with pytest.raises(ValueError, match=message):
+        sync(engine, source, [(str(tmp_path), '目标')], sections, suits)
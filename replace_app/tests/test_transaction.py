@@ -0,0 +1,174 @@
+import os
+
+import pytest
+
+import transaction
+from transaction import Transaction, TransactionError, recover
+from conftest import write, read
+
+
+class Crash(BaseException):
+    """模拟进程在提交中途退出（不经过 except Exception 的回滚）"""
+
+
+@pytest.fixture
+def files(tmp_path):
+    a, b = tmp_path / 'a.save', tmp_path / 'b.save'
+    write(a, b'old a')
+    write(b, b'old b')
+    return str(a), str(b), str(tmp_path / 'new.lua'), str(tmp_path / 'journal')
+
+
+def leftovers(directory):
+    return [name for name in os.listdir(directory) if '.txn-' in name]
+
+
+def test_commit_replaces_all_files(files):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage(a, b'new a')
+    txn.stage(b, b'new b')
+    txn.stage(new, b'created')
+    txn.commit()
+    assert (read(a), read(b), read(new)) == (b'new a', b'new b', b'created')
+    assert leftovers(os.path.dirname(a)) == [] and os.listdir(journal) == []
+
+
+def test_failed_commit_rolls_back(files, monkeypatch):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage(a, b'new a')
+    txn.stage(new, b'created')
+    txn.stage(b, b'new b')
+    real_replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        if src.endswith('.json.tmp'):
+            return real_replace(src, dst)  # 写预写日志
+        calls.append(src)
+        if len(calls) == 4:  # a 已替换、new 已创建，b 改名时失败
+            raise OSError("磁盘已满")
+        real_replace(src, dst)
+    monkeypatch.setattr(transaction.os, 'replace', failing_replace)
+    with pytest.raises(TransactionError):
+        txn.commit()
+    monkeypatch.undo()
+    assert (read(a), read(b)) == (b'old a', b'old b')
+    assert not os.path.exists(new)
+    assert leftovers(os.path.dirname(a)) == []
+
+
+@pytest.mark.parametrize('crash_after', [1, 2, 3, 4])
+def test_recover_rolls_back_uncommitted(files, monkeypatch, crash_after):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage(a, b'new a')
+    txn.stage(new, b'created')
+    txn.stage(b, b'new b')
+    real_replace = os.replace
+    calls = []
+
+    def crashing_replace(src, dst):
+        if src.endswith('.json.tmp'):
+            return real_replace(src, dst)  # 写预写日志
+        calls.append(src)
+        if len(calls) > crash_after:
+            raise Crash()
+        real_replace(src, dst)
+    monkeypatch.setattr(transaction.os, 'replace', crashing_replace)
+    with pytest.raises(Crash):
+        txn.commit()
+    monkeypatch.undo()
+
+    assert recover(journal) == 1
+    assert (read(a), read(b)) == (b'old a', b'old b')
+    assert not os.path.exists(new)
+    assert leftovers(os.path.dirname(a)) == [] and os.listdir(journal) == []
+    assert recover(journal) == 0
+
+
+def test_recover_finishes_committed(files, monkeypatch):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=True)
+    txn.stage(a, b'new a')
+    txn.stage(b, b'new b')
+
+    def crash(entries, keep_backup):
+        raise Crash()
+    monkeypatch.setattr(transaction, '_finish_entries', crash)
+    with pytest.raises(Crash):
+        txn.commit()
+    monkeypatch.undo()
+
+    assert recover(journal) == 1
+    assert (read(a), read(b)) == (b'new a', b'new b')
+    assert (read(a + '.bak'), read(b + '.bak')) == (b'old a', b'old b')
+    assert leftovers(os.path.dirname(a)) == []
+
+
+def test_stage_delete(files):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage_delete(a)
+    txn.stage(b, b'new b')
+    txn.commit()
+    assert not os.path.exists(a) and read(b) == b'new b'
+    assert leftovers(os.path.dirname(a)) == []
+
+
+def test_abort_removes_staged_files(files):
+    a, b, new, journal = files
+    txn = Transaction(journal)
+    txn.stage(a, b'new a')
+    txn.stage_copy(new, b)
+    txn.abort()
+    assert read(a) == b'old a' and not os.path.exists(new)
+    assert leftovers(os.path.dirname(a)) == []
+
+
+def test_finish_failure_is_completed_by_recover(files, monkeypatch):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=True)
+    txn.stage(a, b'new a')
+
+    def fail(entries, keep_backup):
+        raise OSError("无法改名")
+    monkeypatch.setattr(transaction, '_finish_entries', fail)
+    assert txn.commit() == []  # 新内容已就位，不算失败
+    monkeypatch.undo()
+    assert read(a) == b'new a'
+    assert recover(journal) == 1
+    assert read(a + '.bak') == b'old a' and leftovers(os.path.dirname(a)) == []
+
+
+def test_journal_write_failure_raises_transaction_error(files, monkeypatch):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage(a, b'new a')
+
+    def fail(file_path, data):
+        raise OSError("磁盘已满")
+    monkeypatch.setattr(transaction, '_write_json_durable', fail)
+    with pytest.raises(TransactionError):
+        txn.commit()
+    monkeypatch.undo()
+    assert read(a) == b'old a' and leftovers(os.path.dirname(a)) == []
+
+
+def test_commit_flag_failure_rolls_back(files, monkeypatch):
+    a, b, new, journal = files
+    txn = Transaction(journal, keep_backup=False)
+    txn.stage(a, b'new a')
+    real_write = transaction._write_json_durable
+
+    def fail_on_commit_flag(file_path, data):
+        if data['committed']:
+            raise OSError("磁盘已满")
+        real_write(file_path, data)
+    monkeypatch.setattr(transaction, '_write_json_durable', fail_on_commit_flag)
+    with pytest.raises(TransactionError):
+        txn.commit()
+    monkeypatch.undo()
+    assert read(a) == b'old a' and leftovers(os.path.dirname(a)) == []
+    assert recover(journal) == 0
@@ -0,0 +1,127 @@
+import os
+
+import pytest
+
+import transaction
+from transaction import Transaction
+from undo_log import UndoLog, UndoError, patch_hunks, diff_hunks
+from json_span import apply_patches
+from conftest import write, read
+
+
+@pytest.fixture
+def log(tmp_path):
+    return UndoLog(str(tmp_path / 'undo'), journal_dir=str(tmp_path / 'journal'))
+
+
+def commit(log, changes, description='操作'):
+    """changes: {路径: 新内容 或 (补丁列表)}，像 BatchEngine.commit 一样提交并记录"""
+    txn = Transaction(log.journal_dir, keep_backup=False)
+    for path, change in changes.items():
+        if isinstance(change, list):
+            buf = read(path)
+            txn.stage(path, apply_patches(buf, change), patch_hunks(buf, change))
+        else:
+            txn.stage(path, change)
+    files = log.prepare(txn)
+    txn.commit()
+    return log.record(description, files)
+
+
+@pytest.fixture
+def files(tmp_path):
+    a = str(tmp_path / 'a.save')
+    b = str(tmp_path / 'b.save')
+    write(a, b'{"x": "short", "y": [1, 2, 3], "z": "tail"}')
+    write(b, b'0123456789' * 1000)
+    return a, b, str(tmp_path / 'new.lua')
+
+
+def test_undo_redo_modified_and_created_files(log, files):
+    a, b, new = files
+    originals = read(a), read(b)
+    commit(log, {
+        a: [(6, 13, b'"a much longer value"'), (20, 29, b'[]')],  # 长度变化的补丁
+        b: originals[1][:5000] + b'inserted' + originals[1][5100:],  # 无补丁信息，按前后缀比较
+        new: b'created',
+    })
+    changed = read(a), read(b), read(new)
+    assert changed[0] == b'{"x": "a much longer value", "y": [], "z": "tail"}'
+
+    op = log.undo()
+    assert {item['path'] for item in op['files']} == {a, b, new}
+    assert (read(a), read(b)) == originals and not os.path.exists(new)
+
+    log.redo()
+    assert (read(a), read(b), read(new)) == changed
+
+    log.undo()
+    assert (read(a), read(b)) == originals and not os.path.exists(new)
+    with pytest.raises(UndoError):
+        log.undo()
+
+
+def test_undo_stack_order_and_new_operation_clears_redo(log, files):
+    a, _, _ = files
+    v0 = read(a)
+    commit(log, {a: [(6, 13, b'"one"')]})
+    v1 = read(a)
+    commit(log, {a: [(6, 11, b'"two, longer"')]})
+    log.undo()
+    assert read(a) == v1
+    log.undo()
+    assert read(a) == v0
+    log.redo()
+    assert read(a) == v1
+    commit(log, {a: [(6, 11, b'"three"')]})
+    assert log.peek('redo') is None
+    with pytest.raises(UndoError):
+        log.redo()
+
+
+def test_refuses_when_file_changed_afterwards(log, files):
+    a, b, _ = files
+    commit(log, {a: [(6, 13, b'"x"')], b: b'new b'})
+    write(b, b'edited elsewhere')
+    before = read(a)
+    with pytest.raises(UndoError):
+        log.undo()
+    assert read(a) == before  # 检查在改写之前完成，其他文件也不改动
+    assert log.peek('undo') is not None
+
+
+def test_failed_undo_leaves_files_and_state(log, files, monkeypatch):
+    a, b, _ = files
+    commit(log, {a: [(6, 13, b'"x"')], b: b'new b'})
+    changed = read(a), read(b)
+    real_replace = os.replace
+    calls = []
+
+    def failing_replace(src, dst):
+        if src.endswith('.json.tmp'):
+            return real_replace(src, dst)
+        calls.append(src)
+        if len(calls) == 3:  # 第一个文件已替换，第二个文件改名时失败
+            raise OSError("磁盘已满")
+        real_replace(src, dst)
+    monkeypatch.setattr(transaction.os, 'replace', failing_replace)
+    with pytest.raises(UndoError):
+        log.undo()
+    monkeypatch.undo()
+
+    assert (read(a), read(b)) == changed
+    log.undo()  # 文件标识未变，之后仍可撤销
+    assert read(b) == b'0123456789' * 1000
+
+
+@pytest.mark.parametrize('old, new', [
+    (b'abcdef', b'abXYZdef'),
+    (b'abcdef', b'abf'),
+    (b'', b'abc'),
+    (b'abc', b'abc'),
+    (b'a' * 200000 + b'b', b'a' * 200000 + b'cc'),
+])
+def test_diff_hunks(old, new):
+    hunks = diff_hunks(old, new)
+    assert apply_patches(old, [(start, start + len(o), n) for start, o, _, n in hunks]) == new
+    assert apply_patches(new, [(start, start + len(n), o) for _, o, start, n in hunks]) == old
@@ -0,0 +1,197 @@
+import os
+import json
+import uuid
+import threading
+
+from file_sync import copy_file
+from app_paths import app_path
+
+# 预写日志放在程序数据目录，与启动时的工作目录无关，保证下次启动一定能找到
+DEFAULT_JOURNAL_DIR = app_path(".journal")
+
+
+class TransactionError(Exception):
+    """事务提交失败（已回滚）；commit 只抛出这一种异常"""
+
+
+def _fsync_file(file_path):
+    with open(file_path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _write_json_durable(file_path, data):
+    """写入 JSON 并刷盘，先写临时文件再原子替换"""
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, file_path)
+
+
+class Transaction:
+    """多文件事务
+
+    先把所有新内容写入目标旁边的临时文件并刷盘，记录预写日志，
+    再逐个用重命名原子替换；任何一步失败都会把已替换的文件全部还原。
+    原文件通过重命名保留，提交成功后可直接改名为 .bak 作为备份。
+    """
+    def __init__(self, journal_dir=DEFAULT_JOURNAL_DIR, keep_backup=True):
+        self.id = uuid.uuid4().hex[:12]
+        self.journal_dir = journal_dir
+        self.keep_backup = keep_backup
+        self.entries = []  # [{target, staged, original}]
+        self.hunks = {}  # {target: [(原开始, 原字节, 新开始, 新字节)]}，供撤销日志使用
+        self._targets = set()
+        self._lock = threading.Lock()
+
+    def _entry(self, target):
+        target = os.path.abspath(target)
+        with self._lock:
+            if target in self._targets:
+                raise ValueError(f"事务中重复写入同一文件: {target}")
+            self._targets.add(target)
+        return {
+            'target': target,
+            'staged': f"{target}.txn-{self.id}.new",
+            'original': f"{target}.txn-{self.id}.old",
+        }
+
+    def _add(self, entry):
+        with self._lock:
+            self.entries.append(entry)
+
+    def stage(self, target, data, hunks=None):
+        """暂存目标文件的新内容（bytes）；hunks 为相对当前内容的改动（见 undo_log.patch_hunks）"""
+        entry = self._entry(target)
+        with open(entry['staged'], 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if hunks is not None:
+            with self._lock:
+                self.hunks[entry['target']] = hunks
+        self._add(entry)
+
+    def stage_delete(self, target):
+        """暂存：删除 target（提交时改名保留原文件，回滚时还原）"""
+        entry = self._entry(target)
+        entry['delete'] = True
+        self._add(entry)
+
+    def stage_copy(self, target, source):
+        """暂存：用 source 文件的内容覆盖 target（保留修改时间等元数据）"""
+        entry = self._entry(target)
+        copy_file(source, entry['staged'])
+        _fsync_file(entry['staged'])
+        self._add(entry)
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.journal_dir, f"{self.id}.json")
+
+    def commit(self):
+        """提交全部暂存文件，失败时回滚并抛出 TransactionError"""
+        if not self.entries:
+            return []
+        for entry in self.entries:
+            entry['existed'] = os.path.exists(entry['target'])
+        journal = {'id': self.id, 'committed': False, 'keep_backup': self.keep_backup, 'entries': self.entries}
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            _write_json_durable(self.journal_path, journal)
+        except OSError as e:
+            self.abort()
+            raise TransactionError(f"提交失败，无法写入事务日志，所有文件未做修改: {str(e)}")
+
+        done = []
+        try:
+            for entry in self.entries:
+                if entry['existed']:
+                    os.replace(entry['target'], entry['original'])
+                done.append(entry)
+                if not entry.get('delete'):
+                    os.replace(entry['staged'], entry['target'])
+            # 全部替换成功：记录已提交之后才算提交完成
+            journal['committed'] = True
+            _write_json_durable(self.journal_path, journal)
+        except Exception as e:
+            _rollback_entries(done, self.entries)
+            self._remove_journal()
+            raise TransactionError(f"提交失败，已回滚 {len(done)} 个文件: {str(e)}")
+
+        try:
+            backups = _finish_entries(self.entries, self.keep_backup)
+        except OSError:
+            # 新内容已全部就位；收尾（处理原文件）失败时保留已提交的日志，下次启动由 recover 完成
+            return []
+        self._remove_journal()
+        return backups
+
+    def abort(self):
+        """放弃事务，删除所有暂存文件"""
+        for entry in self.entries:
+            if os.path.exists(entry['staged']):
+                os.remove(entry['staged'])
+        self.entries = []
+        self.hunks = {}
+
+    def _remove_journal(self):
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+
+def _finish_entries(entries, keep_backup):
+    """提交完成后把原文件改名为 .bak 或删除，返回备份文件列表"""
+    backups = []
+    for entry in entries:
+        if not os.path.exists(entry['original']):
+            continue
+        if keep_backup:
+            backup = entry['target'] + '.bak'
+            os.replace(entry['original'], backup)
+            backups.append(backup)
+        else:
+            os.remove(entry['original'])
+    return backups
+
+
+def _rollback_entries(done, entries):
+    """还原已替换的文件并清理暂存文件"""
+    for entry in reversed(done):
+        if os.path.exists(entry['original']):
+            os.replace(entry['original'], entry['target'])
+        elif not entry['existed'] and os.path.exists(entry['target']) \
+                and not os.path.exists(entry['staged']):
+            # 新建的文件：暂存文件已被改名为目标，删除即可
+            os.remove(entry['target'])
+    for entry in entries:
+        if os.path.exists(entry['staged']):
+            os.remove(entry['staged'])
+
+
+def recover(journal_dir=DEFAULT_JOURNAL_DIR):
+    """启动时处理上次异常退出遗留的事务日志，返回处理的事务数
+
+    已提交的事务补完收尾工作，未提交的事务全部回滚。
+    """
+    if not os.path.isdir(journal_dir):
+        return 0
+    count = 0
+    for name in os.listdir(journal_dir):
+        if not name.endswith('.json'):
+            continue
+        journal_path = os.path.join(journal_dir, name)
+        try:
+            with open(journal_path, 'r', encoding='utf-8') as f:
+                journal = json.load(f)
+        except (OSError, ValueError):
+            continue
+        entries = journal.get('entries', [])
+        if journal.get('committed'):
+            _finish_entries(entries, journal.get('keep_backup', True))
+        else:
+            _rollback_entries(entries, entries)
+        os.remove(journal_path)
+        count += 1
+    return count
@@ -0,0 +1,284 @@
+"""撤销/重做日志
+
+每次操作提交后，为每个改写的文件记录改动处的原字节和新字节（逆补丁），
+以及提交后文件的标识 (mtime_ns, 大小, inode) 和内容哈希。撤销时确认文件在此之后
+没有被修改（标识相同，或被撤销/重做改写过但内容哈希相同），再把这些字节范围换回，日志大小只与改动的大小有关，不需要复制整个备份文件。
+撤销和重做的写入与普通操作一样经由事务（transaction.Transaction）一次提交。
+
+    .undo/ops/<操作ID>.json   一次操作的逆补丁
+    .undo/state.json          {"undo": [操作ID], "redo": [操作ID]}（后进先出）
+
+新的操作会清空重做栈；只保留最近 limit 次可撤销的操作。
+"""
+import os
+import json
+import time
+import uuid
+import base64
+import threading
+
+from json_span import apply_patches
+from file_sync import content_digest
+from app_paths import app_path
+from transaction import Transaction, TransactionError, DEFAULT_JOURNAL_DIR
+
+DEFAULT_UNDO_DIR = app_path(".undo")
+DEFAULT_UNDO_LIMIT = 100
+
+_BLOCK = 64 * 1024  # 比较公共前缀/后缀时每次比较的字节数
+
+
+class UndoError(ValueError):
+    """无法撤销或重做（没有记录，或文件在此之后被修改过）"""
+
+
+def file_key(file_path):
+    st = os.stat(file_path)
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
+def _read_digest(file_path):
+    with open(file_path, 'rb') as f:
+        return content_digest(f.read())
+
+
+def patch_hunks(buf, patches):
+    """把相对于 buf 的 [(开始, 结束, 新字节)] 补丁转为 [(原开始, 原字节, 新开始, 新字节)]"""
+    hunks = []
+    shift = 0
+    for start, end, data in sorted(patches, key=lambda p: p[0]):
+        old = buf[start:end]
+        if old != data:
+            hunks.append((start, old, start + shift, data))
+        shift += len(data) - (end - start)
+    return hunks
+
+
+def _common_prefix(a, b, limit):
+    """a、b 公共前缀的长度（不超过 limit），整块比较后只在第一块不同的块内逐字节查找"""
+    i = 0
+    while i + _BLOCK <= limit and a[i:i + _BLOCK] == b[i:i + _BLOCK]:
+        i += _BLOCK
+    while i < limit and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def _common_suffix(a, b, limit):
+    """a、b 公共后缀的长度（不超过 limit）"""
+    i = 0
+    while i + _BLOCK <= limit and a[len(a) - i - _BLOCK:len(a) - i] == b[len(b) - i - _BLOCK:len(b) - i]:
+        i += _BLOCK
+    while i < limit and a[len(a) - i - 1] == b[len(b) - i - 1]:
+        i += 1
+    return i
+
+
+def diff_hunks(old, new):
+    """没有补丁信息时按公共前缀、后缀求出一处改动，返回 hunks 列表"""
+    if old == new:
+        return []
+    prefix = _common_prefix(old, new, min(len(old), len(new)))
+    suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+    return [(prefix, old[prefix:len(old) - suffix], prefix, new[prefix:len(new) - suffix])]
+
+
+def _encode_hunks(hunks):
+    return [[old_start, base64.b64encode(old).decode('ascii'), new_start, base64.b64encode(new).decode('ascii')]
+            for old_start, old, new_start, new in hunks]
+
+
+def _decode_hunks(items):
+    return [(old_start, base64.b64decode(old), new_start, base64.b64decode(new))
+            for old_start, old, new_start, new in items]
+
+
+class UndoLog:
+    """按操作记录逆补丁的撤销/重做日志（可在多个线程中使用）"""
+    def __init__(self, root=DEFAULT_UNDO_DIR, limit=DEFAULT_UNDO_LIMIT, journal_dir=DEFAULT_JOURNAL_DIR):
+        self.root = root
+        self.limit = limit
+        self.journal_dir = journal_dir
+        self.ops_dir = os.path.join(root, 'ops')
+        self._lock = threading.Lock()
+
+    # 记录
+
+    def prepare(self, txn):
+        """提交前收集事务中各文件的改动，返回交给 record 的文件列表
+
+        暂存时给出补丁的文件直接使用补丁；其余文件比较原内容和暂存内容。
+        删除的文件（如恢复备份时删除操作中新建的文件）记录其全部原内容。
+        """
+        files = []
+        hunks = getattr(txn, 'hunks', {})
+        for entry in txn.entries:
+            target = entry['target']
+            if entry.get('delete'):
+                if os.path.exists(target):
+                    with open(target, 'rb') as f:
+                        files.append({'path': target, 'created': False, 'deleted': True,
+                                      'hunks': [(0, f.read(), 0, b'')]})
+                continue
+            if not os.path.exists(target):
+                with open(entry['staged'], 'rb') as f:
+                    files.append({'path': target, 'created': True, 'hunks': [(0, b'', 0, f.read())]})
+                continue
+            if target in hunks:
+                file_hunks = hunks[target]
+            else:
+                with open(target, 'rb') as f:
+                    old = f.read()
+                with open(entry['staged'], 'rb') as f:
+                    new = f.read()
+                file_hunks = diff_hunks(old, new)
+            files.append({'path': target, 'created': False, 'hunks': file_hunks})
+        return files
+
+    def record(self, description, files):
+        """提交成功后记录一次操作，返回操作 ID；新的操作会清空重做栈"""
+        files = [item for item in files if item['hunks']]
+        if not files:
+            return None
+        now = time.time()
+        op_id = time.strftime('%Y%m%d-%H%M%S', time.localtime(now)) + f"-{uuid.uuid4().hex[:6]}"
+        op = {
+            'id': op_id,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'description': description,
+            'files': [
+                {'path': item['path'], 'created': item['created'], 'deleted': item.get('deleted', False),
+                 'key': None if item.get('deleted') else file_key(item['path']),
+                 'digest': None if item.get('deleted') else _read_digest(item['path']),
+                 'hunks': _encode_hunks(item['hunks'])}
+                for item in files
+            ],
+        }
+        with self._lock:
+            self._write_op(op)
+            state = self._load_state()
+            for old_id in state['redo']:
+                self._remove_op(old_id)
+            state['redo'] = []
+            state['undo'].append(op_id)
+            while len(state['undo']) > self.limit:
+                self._remove_op(state['undo'].pop(0))
+            self._save_state(state)
+        return op_id
+
+    # 撤销、重做
+
+    def peek(self, stack='undo'):
+        """返回下一次撤销（stack='undo'）或重做（stack='redo'）的操作，没有时返回 None"""
+        with self._lock:
+            ids = self._load_state()[stack]
+            return self._load_op(ids[-1]) if ids else None
+
+    def undo(self):
+        """撤销最近一次操作，返回该操作（dict）"""
+        return self._step('undo', 'redo', forward=False)
+
+    def redo(self):
+        """重做最近一次撤销的操作，返回该操作（dict）"""
+        return self._step('redo', 'undo', forward=True)
+
+    def _step(self, source, target, forward):
+        action = "重做" if forward else "撤销"
+        with self._lock:
+            state = self._load_state()
+            if not state[source]:
+                raise UndoError(f"没有可{action}的操作")
+            op = self._load_op(state[source][-1])
+
+            # 先确认全部文件都没有被修改过，再开始改写；连续撤销同一文件时
+            # 文件标识已被上一次撤销改变，此时按内容哈希判断
+            for item in op['files']:
+                exists = os.path.exists(item['path'])
+                if (item['created'] if forward else item.get('deleted')):
+                    ok = not exists
+                else:
+                    ok = exists and (file_key(item['path']) == item['key']
+                                     or item.get('digest') == _read_digest(item['path']))
+                if not ok:
+                    raise UndoError(f"文件 {item['path']} 在“{op['description']}”之后已被修改，无法{action}")
+
+            # 所有文件在同一个事务中替换：任一文件失败时全部还原，日志状态保持不变
+            txn = Transaction(self.journal_dir, keep_backup=False)
+            try:
+                for item in op['files']:
+                    path = item['path']
+                    hunks = _decode_hunks(item['hunks'])
+                    if item['created']:
+                        if forward:
+                            txn.stage(path, hunks[0][3])
+                            item['digest'] = content_digest(hunks[0][3])
+                        else:
+                            txn.stage_delete(path)
+                        continue
+                    if item.get('deleted'):
+                        if forward:
+                            txn.stage_delete(path)
+                        else:
+                            txn.stage(path, hunks[0][1])
+                            item['digest'] = content_digest(hunks[0][1])
+                        continue
+                    with open(path, 'rb') as f:
+                        buf = f.read()
+                    if forward:
+                        patches = [(old_start, old_start + len(old), new) for old_start, old, _, new in hunks]
+                    else:
+                        patches = [(new_start, new_start + len(new), old) for _, old, new_start, new in hunks]
+                    data = apply_patches(buf, patches)
+                    txn.stage(path, data)
+                    item['digest'] = content_digest(data)
+                txn.commit()
+            except TransactionError as e:
+                raise UndoError(f"{action}“{op['description']}”失败: {str(e)}")
+            except BaseException:
+                txn.abort()
+                raise
+
+            for item in op['files']:
+                if os.path.exists(item['path']):
+                    item['key'] = file_key(item['path'])
+
+            self._write_op(op)
+            state[source].pop()
+            state[target].append(op['id'])
+            self._save_state(state)
+        return op
+
+    # 存储
+
+    def _op_path(self, op_id):
+        return os.path.join(self.ops_dir, op_id + '.json')
+
+    def _write_op(self, op):
+        os.makedirs(self.ops_dir, exist_ok=True)
+        temp_path = self._op_path(op['id']) + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(op, f, ensure_ascii=False)
+        os.replace(temp_path, self._op_path(op['id']))
+
+    def _load_op(self, op_id):
+        with open(self._op_path(op_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _remove_op(self, op_id):
+        if os.path.exists(self._op_path(op_id)):
+            os.remove(self._op_path(op_id))
+
+    def _load_state(self):
+        try:
+            with open(os.path.join(self.root, 'state.json'), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return {'undo': [], 'redo': []}
+        return {'undo': state.get('undo', []), 'redo': state.get('redo', [])}
+
+    def _save_state(self, state):
+        os.makedirs(self.root, exist_ok=True)
+        state_path = os.path.join(self.root, 'state.json')
+        with open(state_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(state_path + '.tmp', state_path)